@@ -1,4 +1,13 @@
-from algosdk import account, mnemonic
+import base64
+
+from algosdk import account, constants, encoding, mnemonic
+from algosdk.future import transaction
+from nacl.signing import SigningKey
+
+
+def bytes_to_sign(txn: transaction.Transaction) -> bytes:
+    """The "TX" prefixed canonical msgpack of a transaction, what its signature covers."""
+    return constants.txid_prefix + base64.b64decode(encoding.msgpack_encode(txn))
 
 
 class Account:
@@ -7,6 +16,8 @@ class Account:
     def __init__(self, private_key: str) -> None:
         self.sk = private_key
         self.adr = account.address_from_private_key(private_key)
+        # decoded once, `txn.sign(private_key)` decodes the key and derives its address on every call
+        self.signing_key = SigningKey(base64.b64decode(private_key)[:constants.key_len_bytes])
 
     def get_address(self) -> str:
         return self.adr
@@ -17,6 +28,13 @@ class Account:
     def get_mnemonic(self) -> str:
         return mnemonic.from_private_key(self.sk)
 
+    def sign(self, txn: transaction.Transaction) -> transaction.SignedTransaction:
+        """Same as `txn.sign(self.get_private_key())`, with the key decoded once for the account."""
+        signature = self.signing_key.sign(bytes_to_sign(txn)).signature
+        # a transaction of a rekeyed address names the account that signed it
+        authorizing_address = self.adr if txn.sender != self.adr else None
+        return transaction.SignedTransaction(txn, base64.b64encode(signature).decode(), authorizing_address)
+
     @classmethod
     def from_mnemonic(cls, m: str) -> "Account":
         return cls(mnemonic.to_private_key(m))
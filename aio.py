@@ -0,0 +1,350 @@
+import asyncio
+import base64
+import contextvars
+import functools
+import inspect
+import json
+import time
+from typing import Any, Awaitable, Callable, Dict, List, TypeVar, Union
+from urllib import parse
+
+from algosdk import constants, error
+from algosdk.future import transaction
+from algosdk.v2client.algod import AlgodClient, api_version_path_prefix
+
+import slots
+import utils
+from account import Account
+from hooks import emit
+from slots import slot_index
+from utils import (
+    PendingTxnResponse,
+    decode_state,
+    get_account_cache,
+    get_params_provider,
+)
+
+T = TypeVar("T")
+
+
+class AsyncAlgodClient(AlgodClient):
+    """An algod client whose request methods return coroutines.
+
+    Every `AlgodClient` method that simply returns `algod_request(...)` is
+    inherited unchanged, so `await client.account_info(address)` and friends
+    work out of the box. The few methods that post-process the response are
+    overridden below. Requests share one aiohttp session (keep-alive pool).
+
+    `blocking` is a regular `AlgodClient` of the same node, for the few cold
+    paths that still run on a worker thread (see `offload`).
+    """
+
+    def __init__(self, algod_token, algod_address, headers=None, pool_size: int = 100, timeout: float = 30) -> None:
+        super().__init__(algod_token, algod_address, headers)
+        self.pool_size = pool_size
+        self.timeout = timeout
+        self.session = None
+        self.blocking = AlgodClient(algod_token, algod_address, headers)
+
+    def get_session(self):
+        if self.session is None:
+            # optional dependency, only needed by the async layer
+            import aiohttp
+
+            self.session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(limit=self.pool_size),
+                timeout=aiohttp.ClientTimeout(total=self.timeout),
+            )
+        return self.session
+
+    async def algod_request(
+        self,
+        method,
+        requrl,
+        params=None,
+        data=None,
+        headers=None,
+        response_format="json",
+    ):
+        header = {"User-Agent": "py-algorand-sdk"}
+
+        if self.headers:
+            header.update(self.headers)
+
+        if headers:
+            header.update(headers)
+
+        if requrl not in constants.no_auth:
+            header.update({constants.algod_auth_header: self.algod_token})
+
+        if requrl not in constants.unversioned_paths:
+            requrl = api_version_path_prefix + requrl
+        if params:
+            requrl = requrl + "?" + parse.urlencode(params)
+
+        async with self.get_session().request(method, self.algod_address + requrl, headers=header, data=data) as resp:
+            body = await resp.read()
+            if resp.status >= 400:
+                message = body.decode("utf-8")
+                try:
+                    message = json.loads(message)["message"]
+                finally:
+                    raise error.AlgodHTTPError(message, resp.status)
+
+        if response_format == "json":
+            try:
+                return json.loads(body)
+            except Exception as e:
+                raise error.AlgodResponseError(
+                    "Failed to parse JSON response from algod"
+                ) from e
+        return body
+
+    async def send_raw_transaction(self, txn, **kwargs):
+        txn = base64.b64decode(txn)
+        headers = dict(kwargs.pop("headers", None) or {})
+        headers["Content-Type"] = "application/x-binary"
+        response = await self.algod_request("POST", "/transactions", data=txn, headers=headers, **kwargs)
+        return response["txId"]
+
+    async def suggested_params(self, **kwargs):
+        res = await self.algod_request("GET", "/transactions/params", **kwargs)
+
+        return transaction.SuggestedParams(
+            res["fee"],
+            res["last-round"],
+            res["last-round"] + 1000,
+            res["genesis-hash"],
+            res["genesis-id"],
+            False,
+            res["consensus-version"],
+            res["min-fee"],
+        )
+
+    async def close(self) -> None:
+        if self.session is not None:
+            await self.session.close()
+            self.session = None
+
+
+# Operations (see `hooks.operation`) await the helpers below, which take either client: an
+# `AsyncAlgodClient` is awaited on the event loop, a regular `AlgodClient` runs the sync helper
+# of `utils` instead and never suspends, that is how the sync API runs the same operations.
+def is_async(client: AlgodClient) -> bool:
+    return isinstance(client, AsyncAlgodClient)
+
+
+def blocking_client(client: AlgodClient) -> AlgodClient:
+    """A regular client of the node `client` talks to."""
+    return client.blocking if is_async(client) else client
+
+
+async def call(response: Union[T, Awaitable[T]]) -> T:
+    """Await what a client method returned: a coroutine for an `AsyncAlgodClient`, the response itself otherwise.
+
+    `await call(client.send_transactions(signed_txns))` works with either client.
+    """
+    if inspect.isawaitable(response):
+        return await response
+    return response
+
+
+async def offload(fn: Callable[..., T], client: AlgodClient, *args, **kwargs) -> T:
+    """Run a blocking `fn(client, ...)` off the event loop, with the blocking twin of an `AsyncAlgodClient`.
+
+    Only for the cold paths operations share with the rest of the package:
+    slot setup (and its registry), contract compilation, the confirmation
+    tracker registration and the preflight of a guarded client. Given a
+    regular client `fn` simply runs.
+    """
+    if not is_async(client):
+        return fn(client, *args, **kwargs)
+    loop = asyncio.get_running_loop()
+    run = functools.partial(contextvars.copy_context().run, fn, client.blocking, *args, **kwargs)
+    return await loop.run_in_executor(None, run)
+
+
+def blocking_variant(blocking_fn: Callable) -> Callable[[Callable], Callable]:
+    """Let a helper coroutine function take either client: given a regular client it runs `blocking_fn` instead."""
+    def decorator(fn: Callable) -> Callable:
+        @functools.wraps(fn)
+        async def wrapper(client, *args, **kwargs):
+            if not is_async(client):
+                return blocking_fn(client, *args, **kwargs)
+            return await fn(client, *args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+@blocking_variant(utils.wait_for_confirmation)
+async def wait_for_confirmation(
+        client: AsyncAlgodClient, tx_id: str
+) -> PendingTxnResponse:
+    tracker = utils.confirmation_tracker
+    if tracker is not None:
+        # the tracker's own thread follows the blocks, only the registration is a blocking call
+        loop = asyncio.get_running_loop()
+        future = await loop.run_in_executor(None, tracker.register, tx_id)
+        return await asyncio.wrap_future(future)
+
+    start = time.perf_counter()
+    last_status = await client.status()
+    last_round = last_status.get("last-round")
+    pending_txn = await client.pending_transaction_info(tx_id)
+    while not (pending_txn.get("confirmed-round") and pending_txn.get("confirmed-round") > 0):
+        emit("round_waited", tx_id=tx_id, round=last_round, elapsed=time.perf_counter() - start)
+        last_round += 1
+        await client.status_after_block(last_round)
+        pending_txn = await client.pending_transaction_info(tx_id)
+    emit("confirmed", tx_id=tx_id, round=pending_txn.get("confirmed-round"), elapsed=time.perf_counter() - start)
+
+    get_account_cache(client).invalidate_txn(pending_txn)
+    get_params_provider(client).advance(pending_txn.get("confirmed-round"))
+    return PendingTxnResponse(pending_txn)
+
+
+@blocking_variant(utils.get_suggested_params)
+async def get_suggested_params(client: AsyncAlgodClient) -> transaction.SuggestedParams:
+    provider = get_params_provider(client)
+    with provider.lock:
+        if provider.params is not None and not provider.is_stale():
+            return provider.copy()
+    params = await client.suggested_params()
+    with provider.lock:
+        provider.set(params)
+        return provider.copy()
+
+
+@blocking_variant(utils.get_account_snapshot)
+async def get_account_snapshot(client: AsyncAlgodClient, address: str) -> Dict[str, Any]:
+    cache = get_account_cache(client)
+    account_info = cache.lookup(address)
+    if account_info is None:
+        account_info = await client.account_info(address)
+        cache.put(address, account_info)
+    return account_info
+
+
+@blocking_variant(utils.get_app_global_state)
+async def get_app_global_state(
+        client: AsyncAlgodClient, app_id: int
+) -> Dict[bytes, Union[int, bytes]]:
+    app_info = await client.application_info(app_id)
+    state = decode_state(app_info["params"]["global-state"])
+    emit("state_decoded", app_id=app_id, address=None, state=state)
+    return state
+
+
+@blocking_variant(utils.get_app_local_state)
+async def get_app_local_state(
+        client: AsyncAlgodClient, app_id: int, sender_address: str
+) -> Dict[bytes, Union[int, bytes]]:
+    account_info = await get_account_snapshot(client, sender_address)
+    for local_state in account_info["apps-local-state"]:
+        if local_state["id"] == app_id:
+            if "key-value" not in local_state:
+                return {}
+
+            state = decode_state(local_state["key-value"])
+            emit("state_decoded", app_id=app_id, address=sender_address, state=state)
+            return state
+    return {}
+
+
+@blocking_variant(utils.get_balances)
+async def get_balances(client: AsyncAlgodClient, account: str) -> Dict[int, int]:
+    account_info = await get_account_snapshot(client, account)
+
+    # set key 0 to Algo balance
+    balances: Dict[int, int] = {0: account_info["amount"]}
+    for assetHolding in account_info.get("assets", []):
+        balances[assetHolding["asset-id"]] = assetHolding["amount"]
+    return balances
+
+
+@blocking_variant(utils.is_opted_in_app)
+async def is_opted_in_app(client: AsyncAlgodClient, app_id: int, user_address: str) -> bool:
+    account_info = await get_account_snapshot(client, user_address)
+    return any(a['id'] == app_id for a in account_info.get('apps-local-state', []))
+
+
+@blocking_variant(utils.is_opted_in_asset)
+async def is_opted_in_asset(client: AsyncAlgodClient, asset_id: int, user_address: str) -> bool:
+    account_info = await get_account_snapshot(client, user_address)
+    return any(a['asset-id'] == asset_id for a in account_info.get('assets', []))
+
+
+@blocking_variant(utils.optin_app)
+async def optin_app(client: AsyncAlgodClient, app_id: int, sender: Account) -> None:
+    emit("optin", address=sender.get_address(), app_id=app_id)
+    txn = transaction.ApplicationOptInTxn(
+        sender=sender.get_address(),
+        sp=await get_suggested_params(client),
+        index=app_id
+    )
+    signed_txn = sender.sign(txn)
+    await client.send_transaction(signed_txn)
+    await wait_for_confirmation(client, signed_txn.get_txid())
+
+
+@blocking_variant(utils.optin_asset)
+async def optin_asset(client: AsyncAlgodClient, asset_id: int, sender: Account) -> None:
+    emit("optin", address=sender.get_address(), asset_id=asset_id)
+    txn = transaction.AssetOptInTxn(
+        sender=sender.get_address(),
+        sp=await get_suggested_params(client),
+        index=asset_id
+    )
+    signed_txn = sender.sign(txn)
+    await client.send_transaction(signed_txn)
+    await wait_for_confirmation(client, signed_txn.get_txid())
+
+
+@blocking_variant(utils.optin_txns)
+async def optin_txns(client: AsyncAlgodClient,
+                     address: str,
+                     sp: transaction.SuggestedParams,
+                     app_ids: List[int] = [],
+                     asset_ids: List[int] = []) -> List[transaction.Transaction]:
+    txns = []
+    for app_id in app_ids:
+        if not await is_opted_in_app(client, app_id, address):
+            emit("optin", address=address, app_id=app_id)
+            txns.append(transaction.ApplicationOptInTxn(sender=address, sp=sp, index=app_id))
+    for asset_id in asset_ids:
+        if not await is_opted_in_asset(client, asset_id, address):
+            emit("optin", address=address, asset_id=asset_id)
+            txns.append(transaction.AssetOptInTxn(sender=address, sp=sp, index=asset_id))
+    return txns
+
+
+async def send_transactions(client: AlgodClient, signed_txns: List[Any], wait: bool = True) -> Union[str, PendingTxnResponse]:
+    tx_id = await call(client.send_transactions(signed_txns))
+    if wait:
+        return await wait_for_confirmation(client, tx_id)
+    return tx_id
+
+
+@blocking_variant(slots.take_free_slot)
+async def take_free_slot(client: AsyncAlgodClient, owner: Account, app_id: int, token_key: bytes, optin_price: int) -> str:
+    """`slots.take_free_slot`, a free slot of a loaded owner is claimed right on the event loop.
+
+    Loading the owner's slots and setting up a new one run on a worker thread.
+    """
+    address = owner.get_address()
+    if not slot_index.is_loaded(address, app_id):
+        return await offload(slots.take_free_slot, client, owner, app_id, token_key, optin_price)
+    slot = slots.claim_free_slot(address, app_id)
+    if slot is not None:
+        return slot
+    return await offload(slots.set_up_slot, client, owner, app_id, optin_price)
+
+
+@blocking_variant(slots.take_free_slots)
+async def take_free_slots(
+    client: AsyncAlgodClient, owner: Account, app_id: int, token_key: bytes, optin_price: int, count: int
+) -> List[Union[str, Exception]]:
+    """`slots.take_free_slots` on a worker thread, it provisions the missing slots of a whole batch."""
+    return await offload(slots.take_free_slots, client, owner, app_id, token_key, optin_price, count)
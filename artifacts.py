@@ -0,0 +1,143 @@
+import base64
+import hashlib
+import importlib
+import json
+import os
+import sys
+import threading
+from typing import Any, Dict, Optional, Tuple
+
+from algosdk import encoding
+from algosdk.v2client.algod import AlgodClient
+
+from compile_cache import TEAL_VERSION
+
+# bump whenever the manifest layout changes, older manifests are then ignored
+MANIFEST_VERSION = 1
+APPS = ("auction", "bidding", "trading", "swap", "staking", "store")
+PROGRAMS = ("approval_program", "clear_state_program")
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+DIRECTORY = os.environ.get("ARTIFACTS_DIR", os.path.join(ROOT, "artifacts"))
+
+manifest: Optional[Dict[str, Any]] = None
+manifest_lock = threading.Lock()
+contracts: Dict[str, Optional[Tuple[bytes, bytes]]] = dict()
+
+
+def source_hash(app: str) -> str:
+    """Hash of the contract source of an app, read without importing it."""
+    with open(os.path.join(ROOT, app, "contracts.py"), "rb") as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+
+def pyteal_version() -> Optional[str]:
+    from importlib.metadata import PackageNotFoundError, version
+
+    try:
+        return version("pyteal")
+    except PackageNotFoundError:
+        return None
+
+
+def program_hash(bytecode: bytes) -> str:
+    """The program hash, which is also the address of the program as a logic signature."""
+    return encoding.encode_address(encoding.checksum(b"Program" + bytecode))
+
+
+def load_manifest(directory: str = DIRECTORY) -> Optional[Dict[str, Any]]:
+    path = os.path.join(directory, "manifest.json")
+    if not os.path.exists(path):
+        return None
+    with open(path) as f:
+        loaded = json.load(f)
+    if loaded.get("version") != MANIFEST_VERSION or loaded.get("teal_version") != TEAL_VERSION:
+        return None
+    # programs built by another PyTeal may differ, unless PyTeal is not even installed
+    installed = pyteal_version()
+    if installed is not None and installed != loaded.get("pyteal"):
+        return None
+    return loaded
+
+
+def get_manifest() -> Optional[Dict[str, Any]]:
+    global manifest
+    with manifest_lock:
+        if manifest is None:
+            manifest = load_manifest() or {}
+        return manifest or None
+
+
+def prebuilt_contracts(app: str) -> Optional[Tuple[bytes, bytes]]:
+    """The prebuilt approval and clear state programs of an app.
+
+    Returns None when there is no manifest or when the app's contract source
+    changed since it was built, in which case the caller compiles from PyTeal.
+    """
+    if app in contracts:
+        return contracts[app]
+
+    entry = (get_manifest() or {}).get("apps", {}).get(app)
+    programs = None
+    if entry is not None and entry["source"] == source_hash(app):
+        programs = tuple(base64.b64decode(entry[name]["bytecode"]) for name in PROGRAMS)
+        if any(program_hash(bytecode) != entry[name]["hash"] for name, bytecode in zip(PROGRAMS, programs)):
+            programs = None
+    contracts[app] = programs
+    return programs
+
+
+def schema(state_schema) -> Dict[str, int]:
+    return {"num_uints": state_schema.num_uints, "num_byte_slices": state_schema.num_byte_slices}
+
+
+def build(client: Optional[AlgodClient] = None, directory: str = DIRECTORY) -> Dict[str, Any]:
+    """Compile all apps and write their TEAL, bytecode, hashes and schemas.
+
+    Programs are assembled offline unless a client is given.
+    """
+    from pyteal import compileTeal, Mode
+
+    from compile_cache import program_cache
+
+    built: Dict[str, Any] = {
+        "version": MANIFEST_VERSION,
+        "teal_version": TEAL_VERSION,
+        "pyteal": pyteal_version(),
+        "compiler": program_cache.compiler_version(client),
+        "apps": {},
+    }
+    os.makedirs(directory, exist_ok=True)
+    for app in APPS:
+        contracts_module = importlib.import_module(f"{app}.contracts")
+        operations = importlib.import_module(f"{app}.operations")
+        entry: Dict[str, Any] = {
+            "source": source_hash(app),
+            "global_schema": schema(operations.GLOBAL_SCHEMA),
+            "local_schema": schema(operations.LOCAL_SCHEMA),
+        }
+        for name in PROGRAMS:
+            teal = compileTeal(getattr(contracts_module, name)(), mode=Mode.Application, version=TEAL_VERSION)
+            bytecode = program_cache.compile_teal(client, teal)
+            teal_file = f"{app}_{name}.teal"
+            with open(os.path.join(directory, teal_file), "w") as f:
+                f.write(teal)
+            entry[name] = {
+                "teal": teal_file,
+                "bytecode": base64.b64encode(bytecode).decode(),
+                "hash": program_hash(bytecode),
+            }
+        built["apps"][app] = entry
+
+    with open(os.path.join(directory, "manifest.json"), "w") as f:
+        json.dump(built, f, indent=2, sort_keys=True)
+        f.write("\n")
+    return built
+
+
+if __name__ == "__main__":
+    # python -m artifacts [algod_url algod_token]
+    client = AlgodClient(sys.argv[2], sys.argv[1]) if len(sys.argv) > 2 else None
+    built = build(client)
+    for app, entry in built["apps"].items():
+        print(app, *(entry[name]["hash"] for name in PROGRAMS))
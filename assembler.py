@@ -0,0 +1,414 @@
+import base64
+import os
+import sys
+from typing import Dict, List, Tuple
+
+from algosdk import encoding
+
+# the assembler started ordering constant blocks by use and inlining singletons in this version
+OPTIMIZE_CONSTANTS_VERSION = 4
+BACK_BRANCH_VERSION = 4
+MAX_VERSION = 5
+
+TXN_FIELDS = [
+    "Sender", "Fee", "FirstValid", "FirstValidTime", "LastValid", "Note", "Lease", "Receiver",
+    "Amount", "CloseRemainderTo", "VotePK", "SelectionPK", "VoteFirst", "VoteLast",
+    "VoteKeyDilution", "Type", "TypeEnum", "XferAsset", "AssetAmount", "AssetSender",
+    "AssetReceiver", "AssetCloseTo", "GroupIndex", "TxID", "ApplicationID", "OnCompletion",
+    "ApplicationArgs", "NumAppArgs", "Accounts", "NumAccounts", "ApprovalProgram",
+    "ClearStateProgram", "RekeyTo", "ConfigAsset", "ConfigAssetTotal", "ConfigAssetDecimals",
+    "ConfigAssetDefaultFrozen", "ConfigAssetUnitName", "ConfigAssetName", "ConfigAssetURL",
+    "ConfigAssetMetadataHash", "ConfigAssetManager", "ConfigAssetReserve", "ConfigAssetFreeze",
+    "ConfigAssetClawback", "FreezeAsset", "FreezeAssetAccount", "FreezeAssetFrozen", "Assets",
+    "NumAssets", "Applications", "NumApplications", "GlobalNumUint", "GlobalNumByteSlice",
+    "LocalNumUint", "LocalNumByteSlice", "ExtraProgramPages", "Nonparticipation", "Logs",
+    "NumLogs", "CreatedAssetID", "CreatedApplicationID",
+]
+GLOBAL_FIELDS = [
+    "MinTxnFee", "MinBalance", "MaxTxnLife", "ZeroAddress", "GroupSize", "LogicSigVersion",
+    "Round", "LatestTimestamp", "CurrentApplicationID", "CreatorAddress",
+    "CurrentApplicationAddress", "GroupID",
+]
+ASSET_HOLDING_FIELDS = ["AssetBalance", "AssetFrozen"]
+ASSET_PARAMS_FIELDS = [
+    "AssetTotal", "AssetDecimals", "AssetDefaultFrozen", "AssetUnitName", "AssetName",
+    "AssetURL", "AssetMetadataHash", "AssetManager", "AssetReserve", "AssetFreeze",
+    "AssetClawback", "AssetCreator",
+]
+APP_PARAMS_FIELDS = [
+    "AppApprovalProgram", "AppClearStateProgram", "AppGlobalNumUint", "AppGlobalNumByteSlice",
+    "AppLocalNumUint", "AppLocalNumByteSlice", "AppExtraProgramPages", "AppCreator", "AppAddress",
+]
+ECDSA_CURVES = ["Secp256k1"]
+
+# names usable as `int` arguments
+NAMED_INTS = {
+    "unknown": 0, "pay": 1, "keyreg": 2, "acfg": 3, "axfer": 4, "afrz": 5, "appl": 6,
+    "NoOp": 0, "OptIn": 1, "CloseOut": 2, "ClearState": 3, "UpdateApplication": 4,
+    "DeleteApplication": 5,
+}
+
+# immediate kinds: u8 (uint8), txn/global/... (named field), label (branch target)
+OPCODES: Dict[str, Tuple[int, Tuple[str, ...]]] = {
+    "err": (0x00, ()), "sha256": (0x01, ()), "keccak256": (0x02, ()), "sha512_256": (0x03, ()),
+    "ed25519verify": (0x04, ()), "ecdsa_verify": (0x05, ("ecdsa",)),
+    "ecdsa_pk_decompress": (0x06, ("ecdsa",)), "ecdsa_pk_recover": (0x07, ("ecdsa",)),
+    "+": (0x08, ()), "-": (0x09, ()), "/": (0x0a, ()), "*": (0x0b, ()), "<": (0x0c, ()),
+    ">": (0x0d, ()), "<=": (0x0e, ()), ">=": (0x0f, ()), "&&": (0x10, ()), "||": (0x11, ()),
+    "==": (0x12, ()), "!=": (0x13, ()), "!": (0x14, ()), "len": (0x15, ()), "itob": (0x16, ()),
+    "btoi": (0x17, ()), "%": (0x18, ()), "|": (0x19, ()), "&": (0x1a, ()), "^": (0x1b, ()),
+    "~": (0x1c, ()), "mulw": (0x1d, ()), "addw": (0x1e, ()), "divmodw": (0x1f, ()),
+    "intc": (0x21, ("u8",)), "intc_0": (0x22, ()), "intc_1": (0x23, ()), "intc_2": (0x24, ()),
+    "intc_3": (0x25, ()), "bytec": (0x27, ("u8",)), "bytec_0": (0x28, ()), "bytec_1": (0x29, ()),
+    "bytec_2": (0x2a, ()), "bytec_3": (0x2b, ()), "arg": (0x2c, ("u8",)), "arg_0": (0x2d, ()),
+    "arg_1": (0x2e, ()), "arg_2": (0x2f, ()), "arg_3": (0x30, ()),
+    "txn": (0x31, ("txn",)), "global": (0x32, ("global",)), "gtxn": (0x33, ("u8", "txn")),
+    "load": (0x34, ("u8",)), "store": (0x35, ("u8",)), "txna": (0x36, ("txn", "u8")),
+    "gtxna": (0x37, ("u8", "txn", "u8")), "gtxns": (0x38, ("txn",)),
+    "gtxnsa": (0x39, ("txn", "u8")), "gload": (0x3a, ("u8", "u8")), "gloads": (0x3b, ("u8",)),
+    "gaid": (0x3c, ("u8",)), "gaids": (0x3d, ()), "loads": (0x3e, ()), "stores": (0x3f, ()),
+    "bnz": (0x40, ("label",)), "bz": (0x41, ("label",)), "b": (0x42, ("label",)),
+    "return": (0x43, ()), "assert": (0x44, ()), "pop": (0x48, ()), "dup": (0x49, ()),
+    "dup2": (0x4a, ()), "dig": (0x4b, ("u8",)), "swap": (0x4c, ()), "select": (0x4d, ()),
+    "cover": (0x4e, ("u8",)), "uncover": (0x4f, ("u8",)), "concat": (0x50, ()),
+    "substring": (0x51, ("u8", "u8")), "substring3": (0x52, ()), "getbit": (0x53, ()),
+    "setbit": (0x54, ()), "getbyte": (0x55, ()), "setbyte": (0x56, ()),
+    "extract": (0x57, ("u8", "u8")), "extract3": (0x58, ()), "extract_uint16": (0x59, ()),
+    "extract_uint32": (0x5a, ()), "extract_uint64": (0x5b, ()),
+    "balance": (0x60, ()), "app_opted_in": (0x61, ()), "app_local_get": (0x62, ()),
+    "app_local_get_ex": (0x63, ()), "app_global_get": (0x64, ()), "app_global_get_ex": (0x65, ()),
+    "app_local_put": (0x66, ()), "app_global_put": (0x67, ()), "app_local_del": (0x68, ()),
+    "app_global_del": (0x69, ()), "asset_holding_get": (0x70, ("asset_holding",)),
+    "asset_params_get": (0x71, ("asset_params",)), "app_params_get": (0x72, ("app_params",)),
+    "min_balance": (0x78, ()), "callsub": (0x88, ("label",)), "retsub": (0x89, ()),
+    "shl": (0x90, ()), "shr": (0x91, ()), "sqrt": (0x92, ()), "bitlen": (0x93, ()),
+    "exp": (0x94, ()), "expw": (0x95, ()),
+    "b+": (0xa0, ()), "b-": (0xa1, ()), "b/": (0xa2, ()), "b*": (0xa3, ()), "b<": (0xa4, ()),
+    "b>": (0xa5, ()), "b<=": (0xa6, ()), "b>=": (0xa7, ()), "b==": (0xa8, ()), "b!=": (0xa9, ()),
+    "b%": (0xaa, ()), "b|": (0xab, ()), "b&": (0xac, ()), "b^": (0xad, ()), "b~": (0xae, ()),
+    "bzero": (0xaf, ()), "log": (0xb0, ()), "itxn_begin": (0xb1, ()),
+    "itxn_field": (0xb2, ("txn",)), "itxn_submit": (0xb3, ()), "itxn": (0xb4, ("txn",)),
+    "itxna": (0xb5, ("txn", "u8")), "txnas": (0xc0, ("txn",)), "gtxnas": (0xc1, ("u8", "txn")),
+    "gtxnsas": (0xc2, ("txn",)), "args": (0xc3, ()),
+}
+FIELDS = {
+    "txn": TXN_FIELDS,
+    "global": GLOBAL_FIELDS,
+    "asset_holding": ASSET_HOLDING_FIELDS,
+    "asset_params": ASSET_PARAMS_FIELDS,
+    "app_params": APP_PARAMS_FIELDS,
+    "ecdsa": ECDSA_CURVES,
+}
+PUSHBYTES, PUSHINT = 0x80, 0x81
+INTCBLOCK, BYTECBLOCK = 0x20, 0x26
+
+
+class AssemblyError(Exception):
+    def __init__(self, line: int, message: str) -> None:
+        super().__init__(f"{line}: {message}")
+        self.line = line
+
+
+def uvarint(value: int) -> bytes:
+    out = bytearray()
+    while value >= 0x80:
+        out.append((value & 0x7f) | 0x80)
+        value >>= 7
+    out.append(value)
+    return bytes(out)
+
+
+def tokenize(line: str) -> List[str]:
+    """Split a source line into tokens, keeping quoted strings whole and dropping comments."""
+    tokens = []
+    i = 0
+    while i < len(line):
+        c = line[i]
+        if c.isspace():
+            i += 1
+        elif line.startswith("//", i):
+            break
+        elif c == '"':
+            j = i + 1
+            while j < len(line) and line[j] != '"':
+                j += 2 if line[j] == "\\" else 1
+            tokens.append(line[i:j + 1])
+            i = j + 1
+        else:
+            j = i
+            while j < len(line) and not line[j].isspace() and not line.startswith("//", j):
+                j += 1
+            tokens.append(line[i:j])
+            i = j
+    return tokens
+
+
+def parse_string(token: str) -> bytes:
+    out = bytearray()
+    body = token[1:-1]
+    i = 0
+    while i < len(body):
+        c = body[i]
+        if c != "\\":
+            out += c.encode()
+            i += 1
+            continue
+        escape = body[i + 1]
+        if escape == "x":
+            out.append(int(body[i + 2:i + 4], 16))
+            i += 4
+            continue
+        out += {"n": b"\n", "r": b"\r", "t": b"\t", "\\": b"\\", '"': b'"'}[escape]
+        i += 2
+    return bytes(out)
+
+
+def parse_bytes(args: List[str]) -> bytes:
+    arg = args[0]
+    if arg.startswith('"'):
+        return parse_string(arg)
+    if arg.startswith("0x"):
+        return bytes.fromhex(arg[2:])
+    for prefix, decode in (("base64", base64.b64decode), ("b64", base64.b64decode),
+                           ("base32", _b32decode), ("b32", _b32decode)):
+        if arg == prefix:
+            return decode(args[1])
+        if arg.startswith(prefix + "(") and arg.endswith(")"):
+            return decode(arg[len(prefix) + 1:-1])
+    raise ValueError(f"unknown byte constant {' '.join(args)}")
+
+
+def _b32decode(value: str) -> bytes:
+    return base64.b32decode(value + "=" * (-len(value) % 8))
+
+
+def parse_int(arg: str) -> int:
+    if arg in NAMED_INTS:
+        return NAMED_INTS[arg]
+    if len(arg) > 1 and arg[0] == "0" and arg[1].isdigit():
+        # a leading zero means octal, as in Go
+        value = int(arg, 8)
+    else:
+        value = int(arg, 0)
+    if not 0 <= value < 2 ** 64:
+        raise ValueError(f"int {arg} out of range")
+    return value
+
+
+class Program:
+    """Intermediate state of one assembly, mirroring algod's OpStream."""
+
+    def __init__(self) -> None:
+        self.version = 1
+        self.code = bytearray()
+        self.labels: Dict[str, int] = dict()
+        # (position of the branch opcode, label, source line)
+        self.label_refs: List[List] = []
+        self.intc: List[int] = []
+        self.bytec: List[bytes] = []
+        # (position, value, is_bytes)
+        self.const_refs: List[List] = []
+
+    def int_constant(self, value: int) -> None:
+        if value not in self.intc:
+            self.intc.append(value)
+        self.const_refs.append([len(self.code), value, False])
+        self.code += constant_reference(False, self.intc.index(value))
+
+    def byte_constant(self, value: bytes) -> None:
+        if value not in self.bytec:
+            self.bytec.append(value)
+        self.const_refs.append([len(self.code), value, True])
+        self.code += constant_reference(True, self.bytec.index(value))
+
+    def optimize_constants(self, is_bytes: bool) -> None:
+        """Order a constant block by use, and inline constants that are used once."""
+        block = self.bytec if is_bytes else self.intc
+        refs = [ref for ref in self.const_refs if ref[2] == is_bytes]
+        frequency = {value: 0 for value in block}
+        for ref in refs:
+            frequency[ref[1]] += 1
+        ordered = sorted(block, key=lambda value: -frequency[value])
+
+        # rewrite from the end so the earlier positions stay valid
+        for ref in sorted(refs, key=lambda ref: -ref[0]):
+            position, value, _ = ref
+            singleton = frequency[value] == 1
+            if singleton:
+                new = bytes([PUSHBYTES]) + uvarint(len(value)) + value if is_bytes \
+                    else bytes([PUSHINT]) + uvarint(value)
+            else:
+                new = constant_reference(is_bytes, ordered.index(value))
+            old_length = len(constant_reference(is_bytes, block.index(value)))
+            self.code[position:position + old_length] = new
+            self.shift(position, len(new) - old_length)
+
+        optimized = [value for value in ordered if frequency[value] > 1]
+        if is_bytes:
+            self.bytec = optimized
+        else:
+            self.intc = optimized
+
+    def shift(self, position: int, delta: int) -> None:
+        if delta == 0:
+            return
+        for label, target in self.labels.items():
+            if target > position:
+                self.labels[label] = target + delta
+        for ref in self.label_refs + self.const_refs:
+            if ref[0] > position:
+                ref[0] += delta
+
+    def resolve_labels(self) -> None:
+        for position, label, line in self.label_refs:
+            if label not in self.labels:
+                raise AssemblyError(line, f"reference to undefined label {label!r}")
+            offset = self.labels[label] - (position + 3)
+            if offset < 0 and self.version < BACK_BRANCH_VERSION:
+                raise AssemblyError(line, f"label {label!r} is a back reference, back jumps need version {BACK_BRANCH_VERSION}")
+            if not -0x8000 <= offset < 0x8000:
+                raise AssemblyError(line, f"label {label!r} is too far away")
+            self.code[position + 1:position + 3] = (offset & 0xffff).to_bytes(2, "big")
+
+    def bytecode(self) -> bytes:
+        out = bytearray(uvarint(self.version))
+        if self.intc:
+            out.append(INTCBLOCK)
+            out += uvarint(len(self.intc))
+            for value in self.intc:
+                out += uvarint(value)
+        if self.bytec:
+            out.append(BYTECBLOCK)
+            out += uvarint(len(self.bytec))
+            for value in self.bytec:
+                out += uvarint(len(value)) + value
+        return bytes(out + self.code)
+
+
+def constant_reference(is_bytes: bool, index: int) -> bytes:
+    short, long = (0x28, 0x27) if is_bytes else (0x22, 0x21)
+    if index < 4:
+        return bytes([short + index])
+    if index > 0xff:
+        raise ValueError("constant block is too large")
+    return bytes([long, index])
+
+
+def assemble(teal: str) -> bytes:
+    """Assemble TEAL source (up to version 5) into the bytecode algod would produce."""
+    program = Program()
+    for line_number, line in enumerate(teal.splitlines(), 1):
+        if line.strip().startswith("#pragma"):
+            words = line.split()
+            if len(words) != 3 or words[1] != "version":
+                raise AssemblyError(line_number, f"unsupported pragma {line.strip()!r}")
+            program.version = int(words[2])
+            if not 1 <= program.version <= MAX_VERSION:
+                raise AssemblyError(line_number, f"unsupported version {program.version}")
+            continue
+
+        tokens = tokenize(line)
+        if tokens and tokens[0].endswith(":"):
+            label = tokens.pop(0)[:-1]
+            if label in program.labels:
+                raise AssemblyError(line_number, f"duplicate label {label!r}")
+            program.labels[label] = len(program.code)
+        if not tokens:
+            continue
+
+        try:
+            assemble_op(program, tokens, line_number)
+        except AssemblyError:
+            raise
+        except (ValueError, KeyError, IndexError) as e:
+            raise AssemblyError(line_number, f"{' '.join(tokens)}: {e}")
+
+    if program.version >= OPTIMIZE_CONSTANTS_VERSION:
+        program.optimize_constants(is_bytes=False)
+        program.optimize_constants(is_bytes=True)
+    program.resolve_labels()
+    return program.bytecode()
+
+
+def assemble_op(program: Program, tokens: List[str], line: int) -> None:
+    op, args = tokens[0], tokens[1:]
+    if op == "int":
+        program.int_constant(parse_int(args[0]))
+    elif op == "byte":
+        program.byte_constant(parse_bytes(args))
+    elif op == "addr":
+        program.byte_constant(encoding.decode_address(args[0]))
+    elif op == "pushint":
+        program.code += bytes([PUSHINT]) + uvarint(parse_int(args[0]))
+    elif op == "pushbytes":
+        value = parse_bytes(args)
+        program.code += bytes([PUSHBYTES]) + uvarint(len(value)) + value
+    elif op in ("intcblock", "bytecblock"):
+        raise AssemblyError(line, f"explicit {op} is not supported, use int/byte")
+    elif op in OPCODES:
+        opcode, immediates = OPCODES[op]
+        if len(args) != len(immediates):
+            raise AssemblyError(line, f"{op} expects {len(immediates)} immediate arguments")
+        position = len(program.code)
+        program.code.append(opcode)
+        for kind, arg in zip(immediates, args):
+            if kind == "label":
+                program.label_refs.append([position, arg, line])
+                program.code += b"\x00\x00"
+            elif kind == "u8":
+                value = int(arg, 0)
+                if not 0 <= value <= 0xff:
+                    raise AssemblyError(line, f"{op} immediate {arg} out of range")
+                program.code.append(value)
+            else:
+                program.code.append(FIELDS[kind].index(arg))
+    else:
+        raise AssemblyError(line, f"unknown opcode {op!r}")
+
+
+# golden/ only ever holds algod's bytecode: the pairs are test vectors of the assembler, they are not
+# required to follow later contract changes and must never be written with `assemble` itself
+def verify(golden_dir: str = "golden") -> bool:
+    """Check `assemble` against algod's output stored as <name>.teal / <name>.bin pairs."""
+    ok = True
+    for name in sorted(os.listdir(golden_dir)):
+        if not name.endswith(".teal"):
+            continue
+        with open(os.path.join(golden_dir, name)) as f:
+            teal = f.read()
+        with open(os.path.join(golden_dir, name[:-5] + ".bin"), "rb") as f:
+            expected = f.read()
+        matches = assemble(teal) == expected
+        ok = ok and matches
+        print(f"{name[:-5]}: {'ok' if matches else 'MISMATCH'}")
+    return ok
+
+
+def write_golden(client, golden_dir: str = "golden") -> None:
+    """Store the current contracts and algod's bytecode for them as golden outputs."""
+    import importlib
+    from base64 import b64decode
+    from pyteal import compileTeal, Mode
+
+    os.makedirs(golden_dir, exist_ok=True)
+    for app in ("auction", "bidding", "trading", "swap", "staking", "store"):
+        contracts = importlib.import_module(f"{app}.contracts")
+        for program in ("approval_program", "clear_state_program"):
+            teal = compileTeal(getattr(contracts, program)(), mode=Mode.Application, version=5)
+            with open(os.path.join(golden_dir, f"{app}_{program}.teal"), "w") as f:
+                f.write(teal)
+            with open(os.path.join(golden_dir, f"{app}_{program}.bin"), "wb") as f:
+                f.write(b64decode(client.compile(teal)["result"]))
+
+
+# python -m assembler verify | python -m assembler golden (needs ALGOD_URL with /v2/teal/compile)
+if __name__ == "__main__":
+    command = sys.argv[1] if len(sys.argv) > 1 else "verify"
+    if command == "golden":
+        import dotenv
+        from utils import get_algod_client
+
+        dotenv.load_dotenv(".env")
+        write_golden(get_algod_client(os.environ.get("ALGOD_URL"), os.environ.get("ALGOD_TOKEN")))
+    else:
+        sys.exit(0 if verify() else 1)
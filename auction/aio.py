@@ -0,0 +1,14 @@
+import aio
+from . import operations
+
+
+create_auction_app = operations.create_auction_app.aio
+setup_auction_app = operations.setup_auction_app.aio
+setup_auctions = operations.setup_auctions.aio
+place_bid = operations.place_bid.aio
+close_auction = operations.close_auction.aio
+
+
+async def get_usable_rekeyed_address(client: aio.AsyncAlgodClient, auther, app_id: int) -> str:
+    """Reserve a free auction index of the seller, creating one if needed."""
+    return await aio.take_free_slot(client, auther, app_id, operations.SLOT_TOKEN_KEY, operations.SLOT_OPTIN_PRICE)
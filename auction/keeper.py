@@ -0,0 +1,206 @@
+import heapq
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+import msgpack
+from algosdk import encoding
+from algosdk.error import AlgodHTTPError
+from algosdk.future import transaction
+from algosdk.v2client.algod import AlgodClient
+
+from account import Account
+from hooks import emit, subscribe, unsubscribe
+from receipts import Receipt, submit_groups
+from signing import sign_many
+from registry import OCCUPIED, rekeyed_registry
+from slots import slot_index
+from utils import MAX_GROUP_SIZE, get_app_global_state, get_app_local_state, get_suggested_params
+
+from .operations import close_auction_txns
+
+
+def rejected(error: Exception) -> bool:
+    """Whether the node refused a group for its content, as opposed to not being reachable."""
+    return isinstance(error, AlgodHTTPError) and error.code == 400
+
+
+class AuctionKeeper:
+    """Closes the auctions of an auction app as soon as they end.
+
+    Tracked auctions wait in a heap ordered by their `ET` end time. A thread
+    follows the rounds, and once the timestamp of the last block (the one the
+    contract compares with) reaches the end of some auctions, their close
+    calls, each followed by the store `auction` call when there is a lead
+    bidder, are packed up to 16 transactions (8 auctions with bids) per group
+    and all the groups are sent before waiting. Auctions thus settle about one
+    round after they end, however many end at once.
+
+    The contract pays the proceeds, or returns the unsold asset, to the closer,
+    so every auction is closed by its own seller and only the auctions of the
+    sellers given to `track` are kept. The auctions of a group the node
+    rejected are retried in a group of their own on the next round, an auction
+    rejected alone is dropped and reported in `auctions_settled`. Auctions that
+    could not be settled because of a transport error are retried as they were
+    on the next round.
+    """
+
+    def __init__(self, client: AlgodClient, app_id: int, workers: int = 16) -> None:
+        self.client = client
+        self.app_id = app_id
+        self.workers = workers
+        self.lock = threading.Lock()
+        self.sellers: Dict[str, Account] = dict()
+        # auction_index: (seller, end_time), the heap may hold outdated entries of reused indexes
+        self.auctions: Dict[str, Tuple[str, int]] = dict()
+        self.ends: List[Tuple[int, str]] = []
+        self.solo: Set[str] = set()
+        self.app_global_state: Optional[Dict] = None
+        self.last_round = 0
+        self.stopped = threading.Event()
+        self.thread: Optional[threading.Thread] = None
+
+    def track(self, seller: Account) -> None:
+        """Keep the auctions of `seller`, those already running are read from the chain."""
+        address = seller.get_address()
+        with self.lock:
+            self.sellers[address] = seller
+        indexes = rekeyed_registry.addresses(address, self.app_id, OCCUPIED)
+        with ThreadPoolExecutor(self.workers) as executor:
+            states = list(executor.map(lambda index: get_app_local_state(self.client, self.app_id, index), indexes))
+        for index, state in zip(indexes, states):
+            if state.get(b"TK_ID") and state.get(b"S_ADDR") == encoding.decode_address(address):
+                self.add(index, address, state[b"ET"])
+
+    def add(self, auction_index: str, seller: str, end_time: int) -> None:
+        with self.lock:
+            if seller not in self.sellers:
+                return
+            self.auctions[auction_index] = (seller, end_time)
+            heapq.heappush(self.ends, (end_time, auction_index))
+
+    def on_event(self, event: str, fields: Dict) -> None:
+        if event == "auction_set_up" and fields["app_id"] == self.app_id:
+            self.add(fields["auction_index"], fields["seller"], fields["end_time"])
+
+    def due(self, timestamp: int) -> List[str]:
+        """Auctions that ended at `timestamp`, in end time order."""
+        due: Dict[str, None] = dict()
+        with self.lock:
+            while self.ends and self.ends[0][0] <= timestamp:
+                end_time, index = heapq.heappop(self.ends)
+                if self.auctions.get(index, (None, None))[1] == end_time:
+                    due[index] = None
+        return list(due)
+
+    def forget(self, auction_index: str) -> None:
+        with self.lock:
+            self.auctions.pop(auction_index, None)
+            self.solo.discard(auction_index)
+
+    def retry(self, indexes: Iterable[str]) -> None:
+        """Put auctions taken by `due` back in the heap, for the next round."""
+        with self.lock:
+            for index in indexes:
+                if index in self.auctions:
+                    heapq.heappush(self.ends, (self.auctions[index][1], index))
+
+    def settle(self, timestamp: int) -> Tuple[List[str], Dict[str, Exception]]:
+        """Close every auction that ended at `timestamp`, returns the settled and the dropped ones.
+
+        When reading the chain or sending fails, the due auctions are put back
+        and the error is raised.
+        """
+        due = self.due(timestamp)
+        if not due:
+            return [], dict()
+        try:
+            receipts = self.submit(due)
+        except Exception:
+            self.retry(due)
+            raise
+
+        settled: List[str] = []
+        failed: Dict[str, Exception] = dict()
+        for receipt in receipts:
+            if receipt.ok:
+                for index in receipt.item:
+                    self.forget(index)
+                    slot_index.release(self.app_id, index)
+                settled += receipt.item
+            elif not rejected(receipt.error):
+                self.retry(receipt.item)
+            elif len(receipt.item) == 1:
+                self.forget(receipt.item[0])
+                failed[receipt.item[0]] = receipt.error
+            else:
+                with self.lock:
+                    self.solo.update(receipt.item)
+                self.retry(receipt.item)
+        emit("auctions_settled", app_id=self.app_id, settled=settled, failed=failed)
+        return settled, failed
+
+    def submit(self, due: List[str]) -> List[Receipt]:
+        """Send the close groups of the `due` auctions and wait for them, one receipt per group."""
+        if self.app_global_state is None:
+            self.app_global_state = get_app_global_state(self.client, self.app_id)
+        with ThreadPoolExecutor(self.workers) as executor:
+            states = list(executor.map(lambda index: get_app_local_state(self.client, self.app_id, index), due))
+
+        sp = get_suggested_params(self.client)
+        packed: List[Tuple[List[str], List]] = []
+        groups: List[Tuple[List[str], List]] = []
+        for index, state in zip(due, states):
+            if not state.get(b"TK_ID"):
+                # closed by someone else meanwhile
+                self.forget(index)
+                continue
+            seller = self.sellers[self.auctions[index][0]]
+            txns = close_auction_txns(self.app_id, index, seller.get_address(), state, self.app_global_state, sp)
+            signed = [(txn, seller) for txn in txns]
+            if index in self.solo:
+                groups.append(([index], signed))
+                continue
+            if not packed or len(packed[-1][1]) + len(signed) > MAX_GROUP_SIZE:
+                packed.append(([], []))
+            packed[-1][0].append(index)
+            packed[-1][1].extend(signed)
+        groups += packed
+
+        for _, signed in groups:
+            txns = [txn for txn, _ in signed]
+            if len(txns) > 1:
+                transaction.assign_group_id(txns)
+        signed_txns = iter(sign_many(pair for _, signed in groups for pair in signed))
+        receipts = [(Receipt(item=indexes), [next(signed_txns) for _ in signed]) for indexes, signed in groups]
+        submit_groups(self.client, receipts)
+        return [receipt for receipt, _ in receipts]
+
+    def block_timestamp(self, round_: int) -> int:
+        raw = self.client.block_info(round_, response_format="msgpack")
+        return msgpack.unpackb(raw, raw=False, strict_map_key=False)["block"]["ts"]
+
+    def start(self) -> "AuctionKeeper":
+        if self.thread is None:
+            # settle what already ended right away
+            self.last_round = self.client.status()["last-round"] - 1
+            self.stopped.clear()
+            subscribe(self.on_event)
+            self.thread = threading.Thread(target=self._run, daemon=True)
+            self.thread.start()
+        return self
+
+    def stop(self) -> None:
+        unsubscribe(self.on_event)
+        self.stopped.set()
+        self.thread = None
+
+    def _run(self) -> None:
+        while not self.stopped.is_set():
+            try:
+                status = self.client.status_after_block(self.last_round)
+                self.last_round = status["last-round"]
+                self.settle(self.block_timestamp(self.last_round))
+            except Exception:
+                time.sleep(1)
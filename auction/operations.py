@@ -1,17 +1,31 @@
+import copy
 import os
 
-from typing import Tuple, List
+from typing import AsyncIterator, Dict, Iterable, List, Optional, Tuple, Union
 
 from algosdk import encoding
 from algosdk.future import transaction
 from algosdk.logic import get_application_address
 from algosdk.v2client.algod import AlgodClient
-from pyteal.ast import app
-from pyteal.ast.global_ import Global
 
+import aio
 from account import Account
+from artifacts import prebuilt_contracts
+from hooks import emit, operation
+from packer import GroupPacker
+from pending import confirm, defer, deferring
+from receipts import Receipt, send_groups, settle_groups
+from slots import slot_index, take_free_slot
 from utils import *
-from .contracts import approval_program, clear_state_program
+
+
+GLOBAL_SCHEMA = transaction.StateSchema(num_uints=1, num_byte_slices=2)
+LOCAL_SCHEMA = transaction.StateSchema(num_uints=8, num_byte_slices=2)
+
+# a slot (rekeyed address) is free while its local TK_ID is 0
+SLOT_TOKEN_KEY = b"TK_ID"
+# min balance the slot needs to opt into the app
+SLOT_OPTIN_PRICE = 100000 + 28500 * 8 + 50000 * 2 + 1000
 
 
 def get_contracts(client: AlgodClient) -> Tuple[bytes, bytes]:
@@ -24,13 +38,20 @@ def get_contracts(client: AlgodClient) -> Tuple[bytes, bytes]:
         A tuple of 2 byte strings. The first is the approval program, and the
         second is the clear state program.
     """
-    approval = fully_compile_contract(client, approval_program())
-    clear_state = fully_compile_contract(client, clear_state_program())
+    contracts = prebuilt_contracts("auction")
+    if contracts is not None:
+        return contracts
+
+    from .contracts import approval_program, clear_state_program
+
+    approval = fully_compile_contract(client, approval_program)
+    clear_state = fully_compile_contract(client, clear_state_program)
 
     return approval, clear_state
 
 
-def create_auction_app(
+@operation
+async def create_auction_app(
     client: AlgodClient,
     creator: Account,
     store_app_id: int,
@@ -49,27 +70,25 @@ def create_auction_app(
     Returns:
         The ID of the newly created auction app.
     """
-    approval, clear = get_contracts(client)
+    approval, clear = await aio.offload(get_contracts, client)
 
-    global_schema = transaction.StateSchema(num_uints=1, num_byte_slices=2)
-    local_schema = transaction.StateSchema(num_uints=8, num_byte_slices=2)
-    sp = client.suggested_params()
+    sp = await aio.get_suggested_params(client)
     
     txn = transaction.ApplicationCreateTxn(
         sender=creator.get_address(),
         on_complete=transaction.OnComplete.NoOpOC,
         approval_program=approval,
         clear_program=clear,
-        global_schema=global_schema,
-        local_schema=local_schema,
+        global_schema=GLOBAL_SCHEMA,
+        local_schema=LOCAL_SCHEMA,
         foreign_apps=[store_app_id],
         accounts=[staking_address, team_wallet_address],
         sp=sp,
     )
 
-    signed_txn = txn.sign(creator.get_private_key())
-    client.send_transaction(signed_txn)
-    response = wait_for_confirmation(client, signed_txn.get_txid())
+    signed_txn = creator.sign(txn)
+    await aio.call(client.send_transaction(signed_txn))
+    response = await aio.wait_for_confirmation(client, signed_txn.get_txid())
     assert response.application_index is not None and response.application_index > 0
     
     app_id = response.application_index
@@ -84,57 +103,27 @@ def create_auction_app(
         amt=initial_funding_amount,
         sp=sp,
     )
-    signed_initial_fund_app_txn = initial_fund_app_txn.sign(creator.get_private_key())
-    client.send_transaction(signed_initial_fund_app_txn)
-    wait_for_confirmation(client, initial_fund_app_txn.get_txid())
+    signed_initial_fund_app_txn = creator.sign(initial_fund_app_txn)
+    await aio.call(client.send_transaction(signed_initial_fund_app_txn))
+    await confirm(client, initial_fund_app_txn)
     
     return app_id
 
 
-def setup_auction_app(
-    client: AlgodClient,
+def setup_auction_txns(
     app_id: int,
-    seller: Account,
+    seller: str,
     token_id: int,
     token_amount: int,
     start_time: int,
     end_time: int,
     reserve: int,
-    min_bid_increment: int
-) -> int:
-    """Create a new auction and return auction_index (rekeyed address)
-
-    Args:
-        client: An algod client.
-        seller: The address of the seller that currently holds the asset being
-            auctioned.
-        token_id: The ID of the asset being auctioned.
-        start_time: A UNIX timestamp representing the start time of the auction.
-            This must be greater than the current UNIX timestamp.
-        end_time: A UNIX timestamp representing the end time of the auction. This
-            must be greater than startTime.
-        reserve: The reserve amount of the auction. If the auction ends without
-            a bid that is equal to or greater than this amount, the auction will
-            fail, meaning the bid amount will be refunded to the lead bidder and
-            the asset will return to the seller.
-        min_bid_increment: The minimum different required between a new bid and
-            the current leading bid.
-
-    Returns:
-        Auction index.
-    """
+    min_bid_increment: int,
+    auction_index: str,
+    sp: transaction.SuggestedParams,
+) -> List[transaction.Transaction]:
+    """The grouped funding payment, setup call and asset transfer of an auction in `auction_index`."""
     app_address = get_application_address(app_id)
-    sp = client.suggested_params()
-    app_global_state = get_app_global_state(client, app_id)
-    
-    # optin store app for saving information    
-    store_app_id = app_global_state[b"SA_ID"]
-    print(f"store_app_id", store_app_id)
-    if is_opted_in_app(client, store_app_id, seller.get_address()) == False:
-        print(f"seller {seller.get_address()} opt in app {store_app_id}")
-        optin_app(client, store_app_id, seller)
-        
-    n_address = get_usable_rekeyed_address(client=client, auther=seller, app_id=app_id)
     
     funding_amount = (
         # balance for the app to opt into asset
@@ -143,9 +132,8 @@ def setup_auction_app(
         + 1_000
     )
     
-    app_address = get_application_address(app_id)
     pay_txn = transaction.PaymentTxn(
-        sender=seller.get_address(),
+        sender=seller,
         receiver=app_address,
         amt=funding_amount,
         sp=sp,
@@ -160,67 +148,212 @@ def setup_auction_app(
     ]
 
     setup_txn = transaction.ApplicationCallTxn(
-        sender=seller.get_address(),
+        sender=seller,
         index=app_id,
         on_complete=transaction.OnComplete.NoOpOC,
         app_args=app_args,
         foreign_assets=[token_id],
-        accounts=[n_address],
+        accounts=[auction_index],
         sp=sp,
     )
     
     fund_token_txn = transaction.AssetTransferTxn(
-        sender=seller.get_address(),
+        sender=seller,
         receiver=app_address,
         index=token_id,
         amt=token_amount,
         sp=sp,
     )
     
-    transaction.assign_group_id([pay_txn, setup_txn, fund_token_txn])
+    return transaction.assign_group_id([pay_txn, setup_txn, fund_token_txn])
+
+
+@operation
+async def setup_auction_app(
+    client: AlgodClient,
+    app_id: int,
+    seller: Account,
+    token_id: int,
+    token_amount: int,
+    start_time: int,
+    end_time: int,
+    reserve: int,
+    min_bid_increment: int
+) -> int:
+    """Create a new auction and return auction_index (rekeyed address)
+
+    Args:
+        client: An algod client.
+        seller: The address of the seller that currently holds the asset being
+            auctioned.
+        token_id: The ID of the asset being auctioned.
+        start_time: A UNIX timestamp representing the start time of the auction.
+            This must be greater than the current UNIX timestamp.
+        end_time: A UNIX timestamp representing the end time of the auction. This
+            must be greater than startTime.
+        reserve: The reserve amount of the auction. If the auction ends without
+            a bid that is equal to or greater than this amount, the auction will
+            fail, meaning the bid amount will be refunded to the lead bidder and
+            the asset will return to the seller.
+        min_bid_increment: The minimum different required between a new bid and
+            the current leading bid.
+
+    Returns:
+        Auction index.
+    """
+    app_address = get_application_address(app_id)
+    sp = await aio.get_suggested_params(client)
+    app_global_state = await aio.get_app_global_state(client, app_id)
     
-    signed_pay_txn = pay_txn.sign(seller.get_private_key())
-    signed_setup_txn = setup_txn.sign(seller.get_private_key())
-    signed_fund_token_txn = fund_token_txn.sign(seller.get_private_key())
+    # optin store app for saving information    
+    store_app_id = app_global_state[b"SA_ID"]
+    if await aio.is_opted_in_app(client, store_app_id, seller.get_address()) == False:
+        await aio.optin_app(client, store_app_id, seller)
+        
+    n_address = await aio.take_free_slot(client, seller, app_id, SLOT_TOKEN_KEY, SLOT_OPTIN_PRICE)
     
-    client.send_transactions([signed_pay_txn, signed_setup_txn, signed_fund_token_txn])
+    pay_txn, setup_txn, fund_token_txn = setup_auction_txns(
+        app_id, seller.get_address(), token_id, token_amount, start_time, end_time,
+        reserve, min_bid_increment, n_address, sp,
+    )
     
-    wait_for_confirmation(client, signed_setup_txn.get_txid())
+    signed_pay_txn = seller.sign(pay_txn)
+    signed_setup_txn = seller.sign(setup_txn)
+    signed_fund_token_txn = seller.sign(fund_token_txn)
+    
+    def on_set_up(_):
+        slot_index.occupy(seller.get_address(), app_id, n_address)
+        emit("auction_set_up", app_id=app_id, auction_index=n_address, seller=seller.get_address(), end_time=end_time)
+
+    try:
+        await aio.call(client.send_transactions([signed_pay_txn, signed_setup_txn, signed_fund_token_txn]))
+    except Exception:
+        slot_index.release(app_id, n_address)
+        raise
+    await confirm(client, setup_txn, on_set_up, lambda _: slot_index.release(app_id, n_address))
     return n_address
 
     
 def get_usable_rekeyed_address(client: AlgodClient, auther: Account, app_id: int):
-    n_address = ""
-    rekeyed_addresses = get_rekeyed_addresses(auther.get_address()) # we can get this from network
-    for rekeyed_address in rekeyed_addresses:
-        if is_opted_in_app(client, app_id, rekeyed_address):
-            state = get_app_local_state(client, app_id, rekeyed_address)
-            print(f"local state of {rekeyed_address} :", state)
-            if b"TK_ID" in state and state[b"TK_ID"] == 0:
-                n_address = rekeyed_address
+    """Reserve a free auction index of the seller, creating one if needed."""
+    return take_free_slot(client, auther, app_id, SLOT_TOKEN_KEY, SLOT_OPTIN_PRICE)
+
+
+@operation
+async def setup_auctions(
+    client: AlgodClient,
+    app_id: int,
+    seller: Account,
+    items: Iterable[Tuple[int, int, int, int, int, int]],
+    pack: bool = False,
+) -> AsyncIterator[Receipt]:
+    """Create many auctions at once, returns their receipts as they are set up.
+
+    The store app opt-in is checked once, the auction indexes are claimed
+    together (the missing ones provisioned in a single round) and all the
+    setup groups are built with one suggested params fetch and sent before
+    waiting, so most auctions are set up in the same round.
+
+    With `pack`, the setups are packed 5 per group instead of one group each,
+    a failed group fails all its auctions.
+
+    Args:
+        client: An algod client.
+        app_id: The app ID of the auction.
+        seller: The account holding the assets being auctioned.
+        items: (token_id, token_amount, start_time, end_time, reserve,
+            min_bid_increment) of each auction, see `setup_auction_app`.
+        pack: Share groups between auctions.
+
+    Returns:
+        An iterator (an async iterator from `aio`) of one receipt per item,
+        with the auction index, in the order they are settled: items whose
+        group the node refused first, then the others as they confirm, and
+        last the items that got no auction index. A failed item keeps its
+        error in its receipt and the others go on. Every group is sent when
+        this returns, iterating waits for them and records each auction
+        index as occupied (or released) when its receipt comes. Closing the
+        iterator early hands the groups still in flight to the confirmation
+        tracker, which settles their auction indexes. With `wait=False`, the
+        `pending.PendingBatch` of the groups, its value lists the receipts in
+        item order.
+    """
+    seller_address = seller.get_address()
+    receipts = [Receipt(item=item) for item in items]
+
+    store_app_id = (await aio.get_app_global_state(client, app_id))[b"SA_ID"]
+    if await aio.is_opted_in_app(client, store_app_id, seller_address) == False:
+        await aio.optin_app(client, store_app_id, seller)
+
+    slots = await aio.take_free_slots(client, seller, app_id, SLOT_TOKEN_KEY, SLOT_OPTIN_PRICE, len(receipts))
+    sp = await aio.get_suggested_params(client)
+    setups = GroupPacker(MAX_GROUP_SIZE if pack else 1)
+    unslotted = []
+    for receipt, slot in zip(receipts, slots):
+        if isinstance(slot, Exception):
+            receipt.error = slot
+            unslotted.append(receipt)
+            continue
+        receipt.index = slot
+        setups.add(receipt, setup_auction_txns(app_id, seller_address, *receipt.item, slot, sp), seller)
+
+    def on_settled(receipt: Receipt) -> None:
+        if receipt.ok:
+            slot_index.occupy(seller_address, app_id, receipt.index)
+            emit("auction_set_up", app_id=app_id, auction_index=receipt.index, seller=seller_address,
+                 end_time=receipt.item[3])
         else:
-            # might have rekeyed address already but not optin app, we can use it
-            n_address = rekeyed_address
-            additional_balance = 100000 + 28500 * 8 + 50000 * 2 + 1000
-            charge_optin_price(client, auther, n_address, additional_balance)
-            optin_app_rekeyed_address(client, app_id, auther, n_address)
-            break
-    
-    # if not found, create one, and optin app for local state
-    if not n_address:
-        optin_price = 100000 + 28500 * 8 + 50000 * 2 + 1000
-        n_address = generate_rekeyed_address(client, auther, app_id, optin_price)
-        optin_app_rekeyed_address(client, app_id, auther, n_address)
-        set_rekeyed_address(auther.get_address(), n_address, 1)
-        
-    return n_address
+            slot_index.release(app_id, receipt.index)
+
+    if deferring():
+        # the handle's value is the receipts, filled in as their groups settle
+        await setups.confirm(client, on_settled)
+        return receipts
+
+    signed_groups = setups.signed_groups()
+    groups = await send_groups(client, signed_groups)
+
+    async def stream() -> AsyncIterator[Receipt]:
+        unsettled = {id(receipt) for group in groups for receipt in group.item}
+        try:
+            async for group in settle_groups(client, groups):
+                for receipt in setups.spread([group]):
+                    unsettled.discard(id(receipt))
+                    on_settled(receipt)
+                    yield receipt
+            for receipt in unslotted:
+                yield receipt
+        finally:
+            # the caller stopped early, the groups still in flight settle on the confirmation tracker
+            for group, signed_txns in signed_groups:
+                rest = [receipt for receipt in group.item if id(receipt) in unsettled]
+                if not rest:
+                    continue
+                if group.tx_id is None or group.round is not None or group.error is not None:
+                    for receipt in rest:
+                        on_settled(receipt)
+                    continue
+                await defer(
+                    client, signed_txns[0],
+                    on_confirmed=lambda response, group=group: settle_rest(group, response),
+                    on_failed=lambda error, group=group: settle_rest(group, error=error),
+                )
+
+    def settle_rest(group: Receipt, response: Optional[PendingTxnResponse] = None,
+                    error: Optional[Exception] = None) -> None:
+        group.round, group.error = response and response.confirmed_round, error
+        for receipt in setups.spread([group]):
+            on_settled(receipt)
+
+    return stream()
 
     
-def place_bid(client: AlgodClient, 
-              app_id: int, 
-              auction_index: str,
-              bidder: Account, 
-              bid_amount: int) -> None:
+@operation
+async def place_bid(client: AlgodClient, 
+                    app_id: int, 
+                    auction_index: str,
+                    bidder: Account, 
+                    bid_amount: int) -> None:
     """Place a bid on an active auction.
 
     Args:
@@ -231,21 +364,16 @@ def place_bid(client: AlgodClient,
         bid_amount: The amount of the bid.
     """
     
-    if (is_opted_in_app(client, app_id, auction_index) == False): 
+    if (await aio.is_opted_in_app(client, app_id, auction_index) == False): 
         return False
     
-    app_global_state = get_app_global_state(client, app_id)
+    app_global_state = await aio.get_app_global_state(client, app_id)
     store_app_id = app_global_state[b"SA_ID"]
-    if (is_opted_in_app(client, store_app_id, bidder.get_address()) == False):
-        optin_app(client, store_app_id, bidder)
     
-    app_local_state = get_app_local_state(client, app_id, auction_index)
+    app_local_state = await aio.get_app_local_state(client, app_id, auction_index)
     token_id = app_local_state[b"TK_ID"]
     if token_id == 0: # invalid auction_index
         return False
-    
-    if (is_opted_in_asset(client, token_id, bidder.get_address()) == False):
-        optin_asset(client, token_id, bidder)
 
     if any(app_local_state[b"LB_ADDR"]):
         # if "bid_account" is not the zero address
@@ -253,7 +381,7 @@ def place_bid(client: AlgodClient,
     else:
         prev_bid_leader = None
 
-    suggested_params = client.suggested_params()
+    suggested_params = await aio.get_suggested_params(client)
 
     app_address = get_application_address(app_id)
     pay_txn = transaction.PaymentTxn(
@@ -263,7 +391,6 @@ def place_bid(client: AlgodClient,
         sp=suggested_params,
     )
     
-    print('prev_bid_leader', prev_bid_leader)
     app_call_txn = transaction.ApplicationCallTxn(
         sender=bidder.get_address(),
         index=app_id,
@@ -275,18 +402,75 @@ def place_bid(client: AlgodClient,
         sp=suggested_params,
     )
     
-    transaction.assign_group_id([pay_txn, app_call_txn])
-    signed_pay_txn = pay_txn.sign(bidder.get_private_key())
-    signed_app_call_txn = app_call_txn.sign(bidder.get_private_key())
-    client.send_transactions([signed_pay_txn, signed_app_call_txn])
+    # the missing opt-ins ride in the same group, the bid call finds the payment right before it
+    txns = await aio.optin_txns(client, bidder.get_address(), suggested_params,
+                                app_ids=[store_app_id], asset_ids=[token_id])
+    txns += [pay_txn, app_call_txn]
+    transaction.assign_group_id(txns)
+    emit("txns_built", txns=txns)
+    await aio.call(client.send_transactions([bidder.sign(txn) for txn in txns]))
+
+    await confirm(client, app_call_txn)
+    
 
-    wait_for_confirmation(client, app_call_txn.get_txid())
+def close_auction_txns(
+    app_id: int,
+    auction_index: str,
+    closer: str,
+    auction_index_local_state: Dict[bytes, Union[int, bytes]],
+    app_global_state: Dict[bytes, Union[int, bytes]],
+    sp: transaction.SuggestedParams,
+) -> List[transaction.Transaction]:
+    """The close call of an auction, followed by the store `auction` call when it has a lead bidder.
+
+    The store call reads the close call right before it, so the two can be
+    put anywhere in a larger group as long as they stay next to each other.
+    No group id is assigned.
+    """
+    accounts: List[str] = [auction_index]
+    token_id = auction_index_local_state[b"TK_ID"]
+    lead_bidder = None
+    
+    if any(auction_index_local_state[b"LB_ADDR"]):
+        lead_bidder = encoding.encode_address(auction_index_local_state[b"LB_ADDR"])
+    
+    if lead_bidder != None:
+        accounts.append(lead_bidder)
+        accounts.append(encoding.encode_address(app_global_state[b"SA_ADDR"])) 
+        accounts.append(encoding.encode_address(app_global_state[b"TW_ADDR"]))
+    
+    sp = copy.copy(sp)
+    sp.fee = 2 * 1_000 # include inner txn
+    close_txn = transaction.ApplicationCallTxn(
+        sender=closer,
+        index=app_id,
+        on_complete=transaction.OnComplete.NoOpOC,
+        app_args=[b"close"],
+        accounts=accounts,
+        foreign_assets=[token_id],
+        sp=sp,
+    )
+    if lead_bidder is None:
+        return [close_txn]
     
+    sp.fee = 1_000
+    store_app_call_txn = transaction.ApplicationCallTxn(
+        sender=closer,
+        index=app_global_state[b"SA_ID"],
+        on_complete=transaction.OnComplete.NoOpOC,
+        app_args=[b"auction"],
+        accounts=[lead_bidder, auction_index],
+        foreign_apps=[app_id],
+        sp=sp,
+    )
+    return [close_txn, store_app_call_txn]
 
-def close_auction(client: AlgodClient, 
-                  app_id: int, 
-                  auction_index: str, 
-                  closer: Account):
+
+@operation
+async def close_auction(client: AlgodClient, 
+                        app_id: int, 
+                        auction_index: str, 
+                        closer: Account):
     """Close an auction.
 
     This action can only happen before an auction has begun, in which case it is
@@ -304,67 +488,22 @@ def close_auction(client: AlgodClient,
         closer: The account initiating the close transaction. This must be
             either the seller or creator.
     """
-    app_global_state = get_app_global_state(client, app_id)
-    print("app_global_state", app_global_state)
-    sp=client.suggested_params()
+    app_global_state = await aio.get_app_global_state(client, app_id)
+    sp=await aio.get_suggested_params(client)
     
-    if (is_opted_in_app(client, app_id, auction_index) == False): 
+    if (await aio.is_opted_in_app(client, app_id, auction_index) == False): 
         return False
     
-    accounts: List[str] = [auction_index]
-    token_id = 0
-    lead_bidder = None
-    
-    auction_index_local_state = get_app_local_state(client, app_id, auction_index)
-    if auction_index_local_state[b"TK_ID"] > 0:
-        token_id = auction_index_local_state[b"TK_ID"]
-        
-    if any(auction_index_local_state[b"LB_ADDR"]):
-        lead_bidder = encoding.encode_address(auction_index_local_state[b"LB_ADDR"])
-    
-    if token_id == 0:
+    auction_index_local_state = await aio.get_app_local_state(client, app_id, auction_index)
+    if auction_index_local_state[b"TK_ID"] == 0:
         return False
     
-    if lead_bidder != None:
-        accounts.append(lead_bidder)
-        accounts.append(encoding.encode_address(app_global_state[b"SA_ADDR"])) 
-        accounts.append(encoding.encode_address(app_global_state[b"TW_ADDR"]))
-    print(accounts)
-    
-    sp.fee = 2 * 1_000 # include inner txn
-    close_txn = transaction.ApplicationCallTxn(
-        sender=closer.get_address(),
-        index=app_id,
-        on_complete=transaction.OnComplete.NoOpOC,
-        app_args=[b"close"],
-        accounts=accounts,
-        foreign_assets=[token_id],
-        sp=sp,
-    )
+    txns = close_auction_txns(app_id, auction_index, closer.get_address(),
+                              auction_index_local_state, app_global_state, sp)
+    if len(txns) > 1:
+        transaction.assign_group_id(txns)
+    signed_txns = [closer.sign(txn) for txn in txns]
+    await aio.call(client.send_transactions(signed_txns))
     
-    if len(accounts) == 4:
-        store_app_id = app_global_state[b"SA_ID"]
-        sp.fee = 1_000
-        store_app_call_txn = transaction.ApplicationCallTxn(
-            sender=closer.get_address(),
-            index=store_app_id,
-            on_complete=transaction.OnComplete.NoOpOC,
-            app_args=[b"auction"],
-            accounts=[lead_bidder, auction_index],
-            foreign_apps=[app_id],
-            sp=sp,
-        )
-        
-        transaction.assign_group_id([close_txn, store_app_call_txn])
-        signed_close_txn = close_txn.sign(closer.get_private_key())
-        signed_store_app_call_txn = store_app_call_txn.sign(closer.get_private_key())
-        client.send_transactions([signed_close_txn, signed_store_app_call_txn])
-        
-        wait_for_confirmation(client, signed_close_txn.get_txid())
-        
-    else:
-        signed_close_txn = close_txn.sign(closer.get_private_key())
-        client.send_transaction(signed_close_txn)
-        
-        wait_for_confirmation(client, signed_close_txn.get_txid())
+    await confirm(client, txns[0], lambda _: slot_index.release(app_id, auction_index))
 
@@ -0,0 +1,44 @@
+import os
+import statistics
+import sys
+import time
+
+import dotenv
+from algosdk.v2client.algod import AlgodClient
+
+from utils import get_algod_client
+
+
+def measure(client: AlgodClient, requests: int):
+    latencies = []
+    for _ in range(requests):
+        start = time.perf_counter()
+        client.status()
+        latencies.append((time.perf_counter() - start) * 1000)
+    return latencies
+
+
+def report(name: str, latencies):
+    latencies = sorted(latencies)
+    p95 = latencies[int(len(latencies) * 0.95) - 1]
+    print(f"{name:>8}: mean {statistics.mean(latencies):7.2f} ms  "
+          f"p50 {statistics.median(latencies):7.2f} ms  p95 {p95:7.2f} ms  "
+          f"min {latencies[0]:7.2f} ms")
+
+
+# python -m benchmarks.client [requests]
+if __name__ == '__main__':
+    dotenv.load_dotenv('.env')
+    requests = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+
+    url, token = os.environ.get('ALGOD_URL'), os.environ.get('ALGOD_TOKEN')
+    stock = get_algod_client(url, token)
+    pooled = get_algod_client(url, token, pooled=True)
+
+    # warm up DNS and the pool before measuring
+    stock.status()
+    pooled.status()
+
+    print(f"{requests} x GET /v2/status against {url}")
+    report("stock", measure(stock, requests))
+    report("pooled", measure(pooled, requests))
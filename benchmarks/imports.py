@@ -0,0 +1,62 @@
+import os
+import statistics
+import subprocess
+import sys
+from typing import Dict, List, Tuple
+
+MODULES = [
+    "utils",
+    "aio",
+    "auction.operations",
+    "bidding.operations",
+    "trading.operations",
+    "swap.operations",
+    "staking.operations",
+    "store.operations",
+]
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def import_times(module: str) -> List[Tuple[str, int, int]]:
+    """Import a module in a fresh interpreter and parse its `-X importtime` report.
+
+    Returns (imported module, self us, cumulative us) for every module it pulled in.
+    """
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=ROOT, capture_output=True, text=True, check=True,
+    )
+    times = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        times.append((name.strip(), int(self_us), int(cumulative_us)))
+    return times
+
+
+def measure(module: str, runs: int) -> Tuple[float, Dict[str, int]]:
+    totals = []
+    packages: Dict[str, int] = dict()
+    for _ in range(runs):
+        times = import_times(module)
+        totals.append(next(c for name, _, c in times if name == module) / 1000)
+        for name, self_us, _ in times:
+            package = name.split(".")[0]
+            packages[package] = packages.get(package, 0) + self_us
+    return statistics.median(totals), {k: v // runs for k, v in packages.items()}
+
+
+# python -m benchmarks.imports [runs] [module ...]
+if __name__ == '__main__':
+    runs = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+    modules = sys.argv[2:] or MODULES
+
+    print(f"cold import, median of {runs} fresh interpreters")
+    for module in modules:
+        total, packages = measure(module, runs)
+        heaviest = sorted(packages.items(), key=lambda item: -item[1])[:4]
+        print(f"{module:>20}: {total:7.1f} ms  "
+              + "  ".join(f"{name} {us / 1000:.1f}" for name, us in heaviest)
+              + f"  pyteal {'yes' if 'pyteal' in packages else 'no'}")
@@ -0,0 +1,43 @@
+import sys
+import time
+
+from algosdk import account
+from algosdk.future import transaction
+
+import signing
+from account import Account
+from signing import sign_many
+
+
+def payments(count: int, sender: str):
+    sp = transaction.SuggestedParams(1000, 1, 1000, "SGO1GKSzyE7IEPItTxCByw9x8FmnrCDexi9/cOUJOiI=", flat_fee=True)
+    return [transaction.PaymentTxn(sender, sp, sender, i) for i in range(count)]
+
+
+def measure(sign, txns) -> float:
+    start = time.perf_counter()
+    sign(txns)
+    return len(txns) / (time.perf_counter() - start)
+
+
+def report(name: str, rate: float, baseline: float):
+    print(f"{name:>18}: {rate:9.0f} signatures/s  x{rate / baseline:5.2f}")
+
+
+# python -m benchmarks.signing [transactions]
+if __name__ == '__main__':
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    private_key, address = account.generate_account()
+    signer = Account(private_key)
+    txns = payments(count, address)
+
+    print(f"{count} payments signed by one key")
+    stock = measure(lambda txns: [txn.sign(private_key) for txn in txns], txns)
+    report("txn.sign", stock, stock)
+    report("Account.sign", measure(lambda txns: [signer.sign(txn) for txn in txns], txns), stock)
+    for workers in (1, 4, 16):
+        # start the workers before measuring
+        sign_many([(txn, signer) for txn in txns[:signing.POOL_THRESHOLD]], workers)
+        rate = measure(lambda txns: sign_many([(txn, signer) for txn in txns], workers), txns)
+        report(f"sign_many {workers:>2} workers", rate, stock)
+    signing.shutdown()
@@ -0,0 +1,9 @@
+from . import operations
+
+
+create_bidding_app = operations.create_bidding_app.aio
+setup_bidding_app = operations.setup_bidding_app.aio
+place_bid = operations.place_bid.aio
+cancel_bid = operations.cancel_bid.aio
+accept_bid = operations.accept_bid.aio
+close_bidding = operations.close_bidding.aio
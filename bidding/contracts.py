@@ -183,16 +183,17 @@ def approval_program():
         Approve(),
     )
     
+    on_setup_pay_txn_index = Txn.group_index() - Int(1)
     on_setup = Seq(
         # opt into NFT asset -- because you can't opt in if you're already opted in, this is what
         # we'll use to make sure the contract has been set up
         Assert(
             And(
                 # the payment for optin assest is before the app call
-                Gtxn[0].type_enum() == TxnType.Payment,
-                Gtxn[0].sender() == Txn.sender(),
-                Gtxn[0].receiver() == Global.current_application_address(),
-                Gtxn[0].amount() >= Global.min_balance(),
+                Gtxn[on_setup_pay_txn_index].type_enum() == TxnType.Payment,
+                Gtxn[on_setup_pay_txn_index].sender() == Txn.sender(),
+                Gtxn[on_setup_pay_txn_index].receiver() == Global.current_application_address(),
+                Gtxn[on_setup_pay_txn_index].amount() >= Global.min_balance(),
                 
                 Txn.assets.length() == Int(1),
                 Txn.assets[0] > Int(0),
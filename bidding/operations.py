@@ -7,11 +7,23 @@ from algosdk.future import transaction
 from algosdk.logic import get_application_address
 from algosdk.v2client.algod import AlgodClient
 from nacl import utils
-from pyteal.ast import app
 
+import aio
 from account import Account
+from artifacts import prebuilt_contracts
+from hooks import emit, operation
+from pending import confirm
+from slots import slot_index
 from utils import *
-from .contracts import approval_program, clear_state_program
+
+
+GLOBAL_SCHEMA = transaction.StateSchema(num_uints=1, num_byte_slices=2)
+LOCAL_SCHEMA = transaction.StateSchema(num_uints=3, num_byte_slices=1)
+
+# a slot (rekeyed address) is free while its local TK_ID is 0
+SLOT_TOKEN_KEY = b"TK_ID"
+# min balance the slot needs to opt into the app
+SLOT_OPTIN_PRICE = 100000 + 28500 * 3 + 50000 * 1 + 1000
 
 
 def get_contracts(client: AlgodClient) -> Tuple[bytes, bytes]:
@@ -24,13 +36,20 @@ def get_contracts(client: AlgodClient) -> Tuple[bytes, bytes]:
         A tuple of 2 byte strings. The first is the approval program, and the
         second is the clear state program.
     """
-    approval = fully_compile_contract(client, approval_program())
-    clear_state = fully_compile_contract(client, clear_state_program())
+    contracts = prebuilt_contracts("bidding")
+    if contracts is not None:
+        return contracts
+
+    from .contracts import approval_program, clear_state_program
+
+    approval = fully_compile_contract(client, approval_program)
+    clear_state = fully_compile_contract(client, clear_state_program)
 
     return approval, clear_state
 
 
-def create_bidding_app(
+@operation
+async def create_bidding_app(
     client: AlgodClient,
     creator: Account,
     store_app_id: int,
@@ -47,32 +66,29 @@ def create_bidding_app(
     Returns:
         The ID of the newly created bidding app.
     """
-    approval, clear = get_contracts(client)
+    approval, clear = await aio.offload(get_contracts, client)
 
-    global_schema = transaction.StateSchema(num_uints=1, num_byte_slices=2)
-    local_schema = transaction.StateSchema(num_uints=3, num_byte_slices=1)
-    
     app_args = [
         # encoding.decode_address(staking_address.get_address()),
         # encoding.decode_address(team_wallet_address.get_address()),
     ]
-    sp = client.suggested_params()
+    sp = await aio.get_suggested_params(client)
     
     txn = transaction.ApplicationCreateTxn(
         sender=creator.get_address(),
         on_complete=transaction.OnComplete.NoOpOC,
         approval_program=approval,
         clear_program=clear,
-        global_schema=global_schema,
-        local_schema=local_schema,
+        global_schema=GLOBAL_SCHEMA,
+        local_schema=LOCAL_SCHEMA,
         app_args=app_args,
         foreign_apps=[store_app_id],
         accounts=[staking_address, team_wallet_address],
         sp=sp,
     )
-    signed_txn = txn.sign(creator.get_private_key())
-    client.send_transaction(signed_txn)
-    response = wait_for_confirmation(client, signed_txn.get_txid())
+    signed_txn = creator.sign(txn)
+    await aio.call(client.send_transaction(signed_txn))
+    response = await aio.wait_for_confirmation(client, signed_txn.get_txid())
     assert response.application_index is not None and response.application_index > 0
     
     app_id = response.application_index
@@ -87,14 +103,15 @@ def create_bidding_app(
         amt=initial_funding_amount,
         sp=sp,
     )
-    signed_initial_fund_app_txn = initial_fund_app_txn.sign(creator.get_private_key())
-    client.send_transaction(signed_initial_fund_app_txn)
-    wait_for_confirmation(client, initial_fund_app_txn.get_txid())
+    signed_initial_fund_app_txn = creator.sign(initial_fund_app_txn)
+    await aio.call(client.send_transaction(signed_initial_fund_app_txn))
+    await confirm(client, initial_fund_app_txn)
     
     return app_id
 
 
-def setup_bidding_app(
+@operation
+async def setup_bidding_app(
     client: AlgodClient,
     app_id: int,
     funder: Account,
@@ -116,7 +133,7 @@ def setup_bidding_app(
         token_id: The asset ID.
     """
     app_address = get_application_address(app_id)
-    params = client.suggested_params()
+    params = await aio.get_suggested_params(client)
     
     funding_amount = (
         # opt into asset min balance
@@ -141,14 +158,15 @@ def setup_bidding_app(
 
     transaction.assign_group_id([pay_txn, setup_txn])
     
-    signed_pay_txn = pay_txn.sign(funder.get_private_key())
-    signed_setup_txn = setup_txn.sign(funder.get_private_key())
+    signed_pay_txn = funder.sign(pay_txn)
+    signed_setup_txn = funder.sign(setup_txn)
     
-    client.send_transactions([signed_pay_txn, signed_setup_txn])
-    wait_for_confirmation(client, signed_setup_txn.get_txid())
+    await aio.call(client.send_transactions([signed_pay_txn, signed_setup_txn]))
+    await confirm(client, setup_txn)
     
     
-def place_bid(client: AlgodClient, app_id: int, bidder: Account, token_id: int, bid_amount: int, bid_price: int, bid_index: str) -> str: 
+@operation
+async def place_bid(client: AlgodClient, app_id: int, bidder: Account, token_id: int, bid_amount: int, bid_price: int, bid_index: str) -> str: 
     """Place or replace a bid on an active bidding.
     Returning rekeyed address as bid index
 
@@ -161,50 +179,25 @@ def place_bid(client: AlgodClient, app_id: int, bidder: Account, token_id: int,
         bid_index: rekeyed address for replace bid
     """
     app_address = get_application_address(app_id)
-    suggested_params = client.suggested_params()
+    suggested_params = await aio.get_suggested_params(client)
     
     # optin asset for receiving the asset
-    if is_opted_in_asset(client, token_id, bidder.get_address()) == False:
-        print(f"bidder {bidder.get_address()} opt in asset {token_id}")
-        optin_asset(client, token_id, bidder)
+    if await aio.is_opted_in_asset(client, token_id, bidder.get_address()) == False:
+        await aio.optin_asset(client, token_id, bidder)
     
     # optin store app for saving information
-    app_global_state = get_app_global_state(client, app_id)
+    app_global_state = await aio.get_app_global_state(client, app_id)
     store_app_id = app_global_state[b"SA_ID"]
-    print(f"store_app_id", store_app_id)
-    if is_opted_in_app(client, store_app_id, bidder.get_address()) == False:
-        print(f"bidder {bidder.get_address()} opt in app {store_app_id}")
-        optin_app(client, store_app_id, bidder)
+    if await aio.is_opted_in_app(client, store_app_id, bidder.get_address()) == False:
+        await aio.optin_app(client, store_app_id, bidder)
     
     tokens = [token_id]
     n_address = bid_index
     # if bid_index is empty, find a usable(if the bid app local state's token id is 0) rekeyed address used in the past, 
     if not n_address:
-        unused_rekeyed_address = ""
-        rekeyed_addresses = get_rekeyed_addresses(bidder.get_address()) # we will get this from network
-        for rekeyed_address in rekeyed_addresses:
-            if is_opted_in_app(client, app_id, rekeyed_address):
-                state = get_app_local_state(client, app_id, rekeyed_address)
-                print(f"local state of {rekeyed_address} :", state)
-                if b"TK_ID" in state and state[b"TK_ID"] == 0:
-                    unused_rekeyed_address = rekeyed_address
-            else:
-                # might have rekeyed address already but not optin app, we can use it
-                unused_rekeyed_address = rekeyed_address
-                optin_price = 100000 + 28500 * 3 + 50000 * 1 + 1000
-                charge_optin_price(client, bidder, unused_rekeyed_address, optin_price)
-                optin_app_rekeyed_address(client, app_id, bidder, unused_rekeyed_address)
-                break
-        
-        # if not found, create one, and optin app for local state
-        n_address = unused_rekeyed_address
-        if not n_address:
-            optin_price = 100000 + 28500 * 3 + 50000 * 1 + 1000
-            n_address = generate_rekeyed_address(client, bidder, app_id, optin_price)
-            optin_app_rekeyed_address(client, app_id, bidder, n_address)
-            set_rekeyed_address(bidder.get_address(), n_address, 1)
+        n_address = await aio.take_free_slot(client, bidder, app_id, SLOT_TOKEN_KEY, SLOT_OPTIN_PRICE)
     else:
-        state = get_app_local_state(client, app_id, bid_index)
+        state = await aio.get_app_local_state(client, app_id, bid_index)
         if b"TK_ID" in state and state[b"TK_ID"] > 0:
             tokens.append(state[b"TK_ID"])
         
@@ -225,23 +218,27 @@ def place_bid(client: AlgodClient, app_id: int, bidder: Account, token_id: int,
         sp=suggested_params,
     )
 
-    print(f"app_id", app_id)
-    print(f"app_args", [b"bid", bid_amount.to_bytes(8, "big")])
-    print(f"foreign_assets", tokens)
-    print(f"accounts", [n_address])
-    
     transaction.assign_group_id([pay_txn, app_call_txn])
+    emit("txns_built", txns=[pay_txn, app_call_txn])
     
-    signed_pay_txn = pay_txn.sign(bidder.get_private_key())
-    signed_app_call_txn = app_call_txn.sign(bidder.get_private_key())
-
-    client.send_transactions([signed_pay_txn, signed_app_call_txn])
-
-    wait_for_confirmation(client, app_call_txn.get_txid())
+    signed_pay_txn = bidder.sign(pay_txn)
+    signed_app_call_txn = bidder.sign(app_call_txn)
+
+    def on_failed(_):
+        if not bid_index:
+            slot_index.release(app_id, n_address)
+
+    try:
+        await aio.call(client.send_transactions([signed_pay_txn, signed_app_call_txn]))
+    except Exception as e:
+        on_failed(e)
+        raise
+    await confirm(client, app_call_txn, lambda _: slot_index.occupy(bidder.get_address(), app_id, n_address), on_failed)
     return n_address
     
     
-def cancel_bid(client: AlgodClient, app_id: int, bidder: Account, bid_index: str) -> None:
+@operation
+async def cancel_bid(client: AlgodClient, app_id: int, bidder: Account, bid_index: str) -> None:
     """Place a bid on an active bidding.
 
     Args:
@@ -249,10 +246,10 @@ def cancel_bid(client: AlgodClient, app_id: int, bidder: Account, bid_index: str
         app_id: The app ID of the bidding.
         bidder: The account providing the bid.
     """
-    if (is_opted_in_app(client, app_id, bid_index) == False): 
+    if (await aio.is_opted_in_app(client, app_id, bid_index) == False): 
         return False
     
-    sp = client.suggested_params()
+    sp = await aio.get_suggested_params(client)
     sp.fee = 2 * 1_000
     app_call_txn = transaction.ApplicationCallTxn(
         sender=bidder.get_address(),
@@ -263,9 +260,9 @@ def cancel_bid(client: AlgodClient, app_id: int, bidder: Account, bid_index: str
         sp=sp,
     )
 
-    signed_app_call_txn = app_call_txn.sign(bidder.get_private_key())
-    client.send_transaction(signed_app_call_txn)
-    wait_for_confirmation(client, app_call_txn.get_txid())    
+    signed_app_call_txn = bidder.sign(app_call_txn)
+    await aio.call(client.send_transaction(signed_app_call_txn))
+    await confirm(client, app_call_txn, lambda _: slot_index.release(app_id, bid_index))
     
     # #do we need this store app opt out? cause the bidder might wants to bid again later ?
     # app_global_state = get_app_global_state(client, app_id)
@@ -276,7 +273,8 @@ def cancel_bid(client: AlgodClient, app_id: int, bidder: Account, bid_index: str
     #     return False
 
 
-def accept_bid(client: AlgodClient, app_id: int, seller: Account, bidder: str, bid_index: str) -> None:
+@operation
+async def accept_bid(client: AlgodClient, app_id: int, seller: Account, bidder: str, bid_index: str) -> None:
     """Accept on an active bidding.
 
     Args:
@@ -287,28 +285,26 @@ def accept_bid(client: AlgodClient, app_id: int, seller: Account, bidder: str, b
         bidder: The account address offerring the bid.
     """
     app_address = get_application_address(app_id)
-    sp = client.suggested_params()
-    app_global_state = get_app_global_state(client, app_id)
+    sp = await aio.get_suggested_params(client)
+    app_global_state = await aio.get_app_global_state(client, app_id)
     
-    if (is_opted_in_app(client, app_id, bid_index) == False): 
+    if (await aio.is_opted_in_app(client, app_id, bid_index) == False): 
         return False
         
-    app_bidder_local_state = get_app_local_state(client, app_id, bid_index)
+    app_bidder_local_state = await aio.get_app_local_state(client, app_id, bid_index)
     token_id = app_bidder_local_state[b"TK_ID"]
     token_amount = app_bidder_local_state[b"TA"]
     bid_price = app_bidder_local_state[b"TP"]
-    print(f"token_amount", token_amount)
-    print(f"price", bid_price)
-    if get_balances(client, seller.get_address())[token_id] < token_amount:
+    if (await aio.get_balances(client, seller.get_address()))[token_id] < token_amount:
         return False
     
     # app optin asset for receiving the asset
-    if is_opted_in_asset(client, token_id, app_address) == False:
-        setup_bidding_app(client=client, app_id=app_id, funder=seller, token_id=token_id)
+    if await aio.is_opted_in_asset(client, token_id, app_address) == False:
+        await setup_bidding_app.aio(client=client, app_id=app_id, funder=seller, token_id=token_id)
     
     store_app_id = app_global_state[b"SA_ID"]
-    if is_opted_in_app(client, store_app_id, seller.get_address()) == False:
-        optin_app(client, store_app_id, seller)
+    if await aio.is_opted_in_app(client, store_app_id, seller.get_address()) == False:
+        await aio.optin_app(client, store_app_id, seller)
     
     asset_txn = transaction.AssetTransferTxn(
         sender=seller.get_address(),
@@ -343,15 +339,16 @@ def accept_bid(client: AlgodClient, app_id: int, seller: Account, bidder: str, b
     
     transaction.assign_group_id([asset_txn, app_call_txn, store_app_call_txn])
     
-    signed_asset_txn = asset_txn.sign(seller.get_private_key())
-    signed_app_call_txn = app_call_txn.sign(seller.get_private_key())
-    signed_store_app_call_txn = store_app_call_txn.sign(seller.get_private_key())
+    signed_asset_txn = seller.sign(asset_txn)
+    signed_app_call_txn = seller.sign(app_call_txn)
+    signed_store_app_call_txn = seller.sign(store_app_call_txn)
     
-    client.send_transactions([signed_asset_txn, signed_app_call_txn, signed_store_app_call_txn])
-    wait_for_confirmation(client, app_call_txn.get_txid())
+    await aio.call(client.send_transactions([signed_asset_txn, signed_app_call_txn, signed_store_app_call_txn]))
+    await confirm(client, app_call_txn, lambda _: slot_index.release(app_id, bid_index))
 
 
-def close_bidding(client: AlgodClient, app_id: int, closer: Account, assets: List[int]):
+@operation
+async def close_bidding(client: AlgodClient, app_id: int, closer: Account, assets: List[int]):
     """Close an bidding.
 
     This action can only happen before an bidding has begun, in which case it is
@@ -368,22 +365,20 @@ def close_bidding(client: AlgodClient, app_id: int, closer: Account, assets: Lis
         closer: The account initiating the close transaction. This must be
             the bidding creator.
     """
-    app_global_state = get_app_global_state(client, app_id)
-
-    print(b"assets", assets)
+    app_global_state = await aio.get_app_global_state(client, app_id)
 
     accounts: List[str] = [encoding.encode_address(app_global_state[b"SA_ADDR"]), 
                            encoding.encode_address(app_global_state[b"TW_ADDR"])]
-    print(b"accounts", accounts)
     
     delete_txn = transaction.ApplicationDeleteTxn(
         sender=closer.get_address(),
         index=app_id,
         accounts=accounts,
         foreign_assets=assets,
-        sp=client.suggested_params(),
+        sp=await aio.get_suggested_params(client),
     )
-    signed_delete_txn = delete_txn.sign(closer.get_private_key())
-    client.send_transaction(signed_delete_txn)
+    emit("txns_built", txns=[delete_txn])
+    signed_delete_txn = closer.sign(delete_txn)
+    await aio.call(client.send_transaction(signed_delete_txn))
 
-    wait_for_confirmation(client, signed_delete_txn.get_txid())
+    await confirm(client, delete_txn)
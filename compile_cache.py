@@ -0,0 +1,149 @@
+import hashlib
+import inspect
+import os
+from base64 import b64decode
+from typing import Callable, Dict, Optional, Union
+
+from algosdk.error import AlgodHTTPError
+from algosdk.v2client.algod import AlgodClient
+
+import assembler
+from hooks import emit
+
+TEAL_VERSION = 5
+# stands in for the algod build in program keys of locally assembled programs
+LOCAL_COMPILER = "local-assembler"
+
+
+def program_key(teal: str, compiler_version: str, teal_version: int = TEAL_VERSION) -> str:
+    """Content address of a compiled program."""
+    h = hashlib.sha256()
+    h.update(f"{compiler_version}\n{teal_version}\n".encode())
+    h.update(teal.encode())
+    return h.hexdigest()
+
+
+def source_key(builder: Callable, teal_version: int = TEAL_VERSION) -> str:
+    """Fingerprint of a PyTeal builder, its module source and the PyTeal version."""
+    from importlib.metadata import version
+
+    h = hashlib.sha256()
+    h.update(f"{builder.__module__}.{builder.__qualname__}\n{teal_version}\n".encode())
+    h.update(version("pyteal").encode())
+    with open(inspect.getsourcefile(builder), "rb") as f:
+        h.update(f.read())
+    return h.hexdigest()
+
+
+class ProgramCache:
+    """In-memory and on-disk cache of compiled TEAL programs.
+
+    Programs are stored under a hash of their TEAL source, the algod compiler
+    version and the TEAL version. Builders (`approval_program` and friends) are
+    additionally linked to the program they produced, so once warmed neither
+    PyTeal nor `client.compile` runs again.
+
+    With `assembler="local"` (or TEAL_ASSEMBLER=local) programs are assembled
+    offline by `assembler.assemble`. In the default "algod" mode the local
+    assembler is used when the node's compile endpoint is unavailable.
+    """
+
+    def __init__(self, directory: Optional[str] = None, assembler: Optional[str] = None) -> None:
+        self.directory = directory or os.environ.get("TEAL_CACHE_DIR", ".teal_cache")
+        self.assembler = assembler or os.environ.get("TEAL_ASSEMBLER", "algod")
+        self.programs: Dict[str, bytes] = dict()
+        self.sources: Dict[str, str] = dict()
+        self.compiler_versions: Dict[str, str] = dict()
+
+    def compiler_version(self, client: Optional[AlgodClient]) -> str:
+        if self.assembler == "local" or client is None:
+            return LOCAL_COMPILER
+        version = self.compiler_versions.get(client.algod_address)
+        if version is None:
+            build = client.versions()["build"]
+            version = "{major}.{minor}.{build_number}-{commit_hash}".format(**build)
+            self.compiler_versions[client.algod_address] = version
+        return version
+
+    def compile(self, client: Optional[AlgodClient], contract: Union["Expr", Callable]) -> bytes:
+        version = self.compiler_version(client)
+
+        source = None
+        if callable(contract):
+            source = source_key(contract)
+            key = self.read_link(source, version)
+            bytecode = self.get(key) if key else None
+            if bytecode is not None:
+                return bytecode
+            contract = contract()
+
+        from pyteal import compileTeal, Mode
+
+        teal = compileTeal(contract, mode=Mode.Application, version=TEAL_VERSION)
+        key = program_key(teal, version)
+        bytecode = self.compile_teal(client, teal, key)
+        if source is not None:
+            self.write_link(source, version, key)
+        return bytecode
+
+    def compile_teal(self, client: Optional[AlgodClient], teal: str, key: Optional[str] = None) -> bytes:
+        key = key or program_key(teal, self.compiler_version(client))
+        bytecode = self.get(key)
+        if bytecode is None:
+            bytecode = self.assemble(client, teal)
+            self.put(key, bytecode)
+        return bytecode
+
+    def assemble(self, client: Optional[AlgodClient], teal: str) -> bytes:
+        if self.assembler == "local" or client is None:
+            return assembler.assemble(teal)
+        try:
+            return b64decode(client.compile(teal)["result"])
+        except AlgodHTTPError as e:
+            # hosted providers often disable /v2/teal/compile
+            emit("compile_fallback", error=e)
+            return assembler.assemble(teal)
+
+    def get(self, key: str) -> Optional[bytes]:
+        bytecode = self.programs.get(key)
+        if bytecode is None:
+            path = os.path.join(self.directory, "programs", key)
+            if os.path.exists(path):
+                with open(path, "rb") as f:
+                    bytecode = self.programs[key] = f.read()
+        return bytecode
+
+    def put(self, key: str, bytecode: bytes) -> None:
+        self.programs[key] = bytecode
+        self.write(os.path.join(self.directory, "programs", key), bytecode)
+
+    def read_link(self, source: str, compiler_version: str) -> Optional[str]:
+        link = f"{source}-{hashlib.sha256(compiler_version.encode()).hexdigest()[:16]}"
+        key = self.sources.get(link)
+        if key is None:
+            path = os.path.join(self.directory, "sources", link)
+            if os.path.exists(path):
+                with open(path) as f:
+                    key = self.sources[link] = f.read().strip()
+        return key
+
+    def write_link(self, source: str, compiler_version: str, key: str) -> None:
+        link = f"{source}-{hashlib.sha256(compiler_version.encode()).hexdigest()[:16]}"
+        self.sources[link] = key
+        self.write(os.path.join(self.directory, "sources", link), key.encode())
+
+    @staticmethod
+    def write(path: str, data: bytes) -> None:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # write then rename so concurrent readers never see a partial file
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with open(tmp, "wb") as f:
+            f.write(data)
+        os.replace(tmp, path)
+
+    def clear(self) -> None:
+        self.programs.clear()
+        self.sources.clear()
+
+
+program_cache = ProgramCache()
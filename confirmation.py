@@ -0,0 +1,153 @@
+import base64
+import threading
+import time
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, List, Optional
+
+import msgpack
+from algosdk import encoding
+from algosdk.v2client.algod import AlgodClient
+
+import utils
+from utils import PendingTxnResponse, get_account_cache, get_params_provider
+
+
+def block_txids(block: Dict[str, Any]) -> List[str]:
+    """Recompute the ids of the top level transactions of a msgpack decoded block.
+
+    Blocks store transactions without the genesis hash (always implied) and,
+    unless `hgi` is set, without the genesis id, so both are restored before
+    hashing the canonical encoding.
+    """
+    header = block["block"]
+    txids = []
+    for stxn in header.get("txns", []):
+        txn = dict(stxn["txn"])
+        txn["gh"] = header["gh"]
+        if stxn.get("hgi"):
+            txn["gen"] = header["gen"]
+        encoded = msgpack.packb(dict(sorted(txn.items())), use_bin_type=True)
+        txid = base64.b32encode(encoding.checksum(b"TX" + encoded)).decode()
+        txids.append(txid.strip("="))
+    return txids
+
+
+class ConfirmationTracker:
+    """Resolves any number of pending transactions from a single block stream.
+
+    A background thread follows `status_after_block` and reads every block
+    once. When a registered transaction shows up, its `pending_transaction_info`
+    is fetched a single time to build the usual `PendingTxnResponse`. The algod
+    load therefore grows with rounds, not with in-flight transactions.
+
+    Futures are `concurrent.futures.Future`, use `asyncio.wrap_future` to await
+    them from a coroutine.
+    """
+
+    def __init__(self, client: AlgodClient) -> None:
+        self.client = client
+        self.lock = threading.Lock()
+        self.futures: Dict[str, Future] = dict()
+        self.last_valid: Dict[str, int] = dict()
+        self.last_round = 0
+        self.thread: Optional[threading.Thread] = None
+        self.stopped = threading.Event()
+
+    def start(self) -> "ConfirmationTracker":
+        with self.lock:
+            if self.thread is not None:
+                return self
+            self.last_round = self.client.status()["last-round"]
+            self.stopped.clear()
+            self.thread = threading.Thread(target=self._follow, daemon=True)
+            self.thread.start()
+        return self
+
+    def stop(self) -> None:
+        self.stopped.set()
+        self.thread = None
+
+    def install(self) -> "ConfirmationTracker":
+        """Route every `utils.wait_for_confirmation` call through this tracker."""
+        utils.confirmation_tracker = self.start()
+        return self
+
+    def uninstall(self) -> None:
+        if utils.confirmation_tracker is self:
+            utils.confirmation_tracker = None
+        self.stop()
+
+    def register(self, tx_id: str, callback: Optional[Callable[[Future], Any]] = None,
+                 last_valid: Optional[int] = None) -> Future:
+        """Track a sent transaction, the future fails once `last_valid` has passed."""
+        self.start()
+        with self.lock:
+            future = self.futures.get(tx_id)
+            is_new = future is None
+            if is_new:
+                future = self.futures[tx_id] = Future()
+            if last_valid is not None:
+                self.last_valid[tx_id] = last_valid
+        if callback is not None:
+            future.add_done_callback(callback)
+
+        if is_new:
+            # the transaction may have landed in a round we already went past
+            pending_txn = self.client.pending_transaction_info(tx_id)
+            if pending_txn.get("confirmed-round"):
+                self._resolve(tx_id, pending_txn)
+        return future
+
+    def _resolve(self, tx_id: str, pending_txn: Dict[str, Any]) -> None:
+        with self.lock:
+            future = self.futures.pop(tx_id, None)
+            self.last_valid.pop(tx_id, None)
+        if future is not None:
+            get_account_cache(self.client).invalidate_txn(pending_txn)
+            future.set_result(PendingTxnResponse(pending_txn))
+
+    def wait(self, tx_id: str, timeout: Optional[float] = None) -> PendingTxnResponse:
+        return self.register(tx_id).result(timeout)
+
+    def pending(self) -> int:
+        with self.lock:
+            return len(self.futures)
+
+    def _follow(self) -> None:
+        while not self.stopped.is_set():
+            try:
+                status = self.client.status_after_block(self.last_round)
+                while self.last_round < status["last-round"] and not self.stopped.is_set():
+                    self._process(self.last_round + 1)
+                    self.last_round += 1
+            except Exception:
+                time.sleep(1)
+
+    def _process(self, round_: int) -> None:
+        get_account_cache(self.client).advance(round_)
+        get_params_provider(self.client).advance(round_)
+        with self.lock:
+            if not self.futures:
+                return
+
+        raw = self.client.block_info(round_, response_format="msgpack")
+        block = msgpack.unpackb(raw, raw=False, strict_map_key=False)
+        for tx_id in block_txids(block):
+            with self.lock:
+                if tx_id not in self.futures:
+                    continue
+            try:
+                self._resolve(tx_id, self.client.pending_transaction_info(tx_id))
+            except Exception as e:
+                with self.lock:
+                    future = self.futures.pop(tx_id, None)
+                if future is not None:
+                    future.set_exception(e)
+
+        with self.lock:
+            expired = [tx_id for tx_id, last_valid in self.last_valid.items() if last_valid <= round_]
+            for tx_id in expired:
+                del self.last_valid[tx_id]
+                self.futures.pop(tx_id).set_exception(
+                    Exception(f"Transaction {tx_id} was not confirmed before round {round_}")
+                )
@@ -0,0 +1,682 @@
+import base64
+import hashlib
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Optional, Tuple, Union
+
+import msgpack
+from algosdk import encoding
+from algosdk.logic import get_application_address
+
+from assembler import parse_bytes, parse_int, tokenize
+
+Value = Union[int, bytes]
+
+MAX_UINT64 = 2 ** 64 - 1
+MAX_STACK = 1000
+MAX_BYTES = 4096
+# opcode budget of an app call, pooled over the app calls of a group
+BUDGET = 700
+COSTS = {"sha256": 35, "keccak256": 130, "sha512_256": 45, "divmodw": 20}
+MIN_BALANCE = 100_000
+ASSET_MIN_BALANCE = 100_000
+UINT_MIN_BALANCE = 28_500
+BYTES_MIN_BALANCE = 50_000
+TYPE_ENUMS = {"pay": 1, "keyreg": 2, "acfg": 3, "axfer": 4, "afrz": 5, "appl": 6}
+TYPES = {enum: name for name, enum in TYPE_ENUMS.items()}
+ZERO_ADDRESS = bytes(32)
+OPT_IN, CLOSE_OUT, CLEAR_STATE, DELETE_APPLICATION = 1, 2, 3, 5
+
+
+class Reject(Exception):
+    """The group would be rejected, at `line` (1-based) of the program when a program failed."""
+
+    def __init__(self, message: str, line: Optional[int] = None) -> None:
+        super().__init__(message)
+        self.message = message
+        self.line = line
+
+
+class Unsupported(Exception):
+    """The transaction uses something the local evaluator does not model."""
+
+
+@dataclass
+class Outcome:
+    """What evaluating one transaction of a group gave.
+
+    `cost` is the opcode cost of its program, `error` and `line` say why and
+    where it was rejected. `evaluated` is False when the evaluator could not
+    model the transaction, or when an earlier transaction already failed.
+    """
+    cost: int = 0
+    error: Optional[str] = None
+    line: Optional[int] = None
+    evaluated: bool = True
+
+
+class Program:
+    """TEAL source split into operations, with the line each one comes from."""
+
+    def __init__(self, source: str) -> None:
+        self.lines = source.splitlines()
+        self.labels: Dict[str, int] = dict()
+        # (source line, opcode, immediates), int and byte constants are parsed once here
+        self.ops: List[Tuple[int, str, List[Any]]] = []
+        for line_number, line in enumerate(self.lines, 1):
+            if line.strip().startswith("#pragma"):
+                continue
+            tokens = tokenize(line)
+            if tokens and tokens[0].endswith(":"):
+                self.labels[tokens.pop(0)[:-1]] = len(self.ops)
+            if not tokens:
+                continue
+            op, args = tokens[0], tokens[1:]
+            if op in ("int", "pushint"):
+                args = [parse_int(args[0])]
+            elif op in ("byte", "pushbytes"):
+                args = [parse_bytes(args)]
+            elif op == "addr":
+                args = [encoding.decode_address(args[0])]
+            self.ops.append((line_number, op, args))
+
+
+programs: Dict[str, Program] = dict()
+
+
+def get_program(source: str) -> Program:
+    key = hashlib.sha256(source.encode()).hexdigest()
+    if key not in programs:
+        programs[key] = Program(source)
+    return programs[key]
+
+
+class Ledger:
+    """The state a group is evaluated against, loaded on first use and changed as the group runs.
+
+    `load_account(address)` returns {"amount", "min_balance" (None if unknown),
+    "assets": {asset_id: amount}, "apps": {app_id: local state}} and
+    `load_app(app_id)` returns {"creator" (address), "global": state,
+    "local_schema": (uints, byte slices), "source": approval TEAL or None}.
+    Both may hand out shared snapshots, the ledger keeps its own copies.
+    """
+
+    def __init__(self, load_account: Callable[[str], Dict[str, Any]], load_app: Callable[[int], Dict[str, Any]],
+                 round_: int, timestamp: int, min_fee: int = 1000) -> None:
+        self.load_account = load_account
+        self.load_app = load_app
+        self.round = round_
+        self.timestamp = timestamp
+        self.min_fee = min_fee
+        self.accounts: Dict[bytes, Dict[str, Any]] = dict()
+        self.apps: Dict[int, Dict[str, Any]] = dict()
+
+    def account(self, address: bytes) -> Dict[str, Any]:
+        if address not in self.accounts:
+            loaded = self.load_account(encoding.encode_address(address))
+            self.accounts[address] = {
+                "amount": loaded["amount"],
+                "min_balance": loaded.get("min_balance"),
+                "assets": dict(loaded["assets"]),
+                "apps": {app_id: dict(state) for app_id, state in loaded["apps"].items()},
+            }
+        return self.accounts[address]
+
+    def app(self, app_id: int) -> Dict[str, Any]:
+        if app_id not in self.apps:
+            loaded = self.load_app(app_id)
+            self.apps[app_id] = {**loaded, "global": dict(loaded["global"])}
+        return self.apps[app_id]
+
+    def pay(self, sender: bytes, receiver: Optional[bytes], amount: int) -> None:
+        """Move `amount` micro algos, to nowhere (fees) when `receiver` is None."""
+        account = self.account(sender)
+        if account["amount"] < amount:
+            raise Reject(f"overspend, {encoding.encode_address(sender)} has {account['amount']} and needs {amount}")
+        account["amount"] -= amount
+        if receiver is not None:
+            self.account(receiver)["amount"] += amount
+
+    def transfer(self, asset_id: int, sender: bytes, receiver: bytes, amount: int) -> None:
+        holding = self.account(sender)["assets"]
+        if asset_id not in holding:
+            raise Reject(f"{encoding.encode_address(sender)} is not opted in to asset {asset_id}")
+        if asset_id not in self.account(receiver)["assets"]:
+            raise Reject(f"{encoding.encode_address(receiver)} is not opted in to asset {asset_id}")
+        if holding[asset_id] < amount:
+            raise Reject(f"underflow on asset {asset_id}, {encoding.encode_address(sender)} has {holding[asset_id]} and needs {amount}")
+        holding[asset_id] -= amount
+        self.account(receiver)["assets"][asset_id] += amount
+
+    def adjust_min_balance(self, address: bytes, delta: int) -> None:
+        account = self.account(address)
+        if account["min_balance"] is not None:
+            account["min_balance"] += delta
+
+    def check_min_balance(self, address: bytes) -> None:
+        account = self.account(address)
+        if account["min_balance"] is not None and 0 < account["amount"] < account["min_balance"]:
+            raise Reject(f"{encoding.encode_address(address)} balance {account['amount']} below min {account['min_balance']}")
+
+    def asset_opt_in(self, address: bytes, asset_id: int) -> None:
+        assets = self.account(address)["assets"]
+        if asset_id not in assets:
+            assets[asset_id] = 0
+            self.adjust_min_balance(address, ASSET_MIN_BALANCE)
+
+    def asset_close(self, asset_id: int, sender: bytes, close_to: bytes) -> None:
+        self.transfer(asset_id, sender, close_to, self.account(sender)["assets"][asset_id])
+        del self.account(sender)["assets"][asset_id]
+        self.adjust_min_balance(sender, -ASSET_MIN_BALANCE)
+
+
+def txn_field(group: List[Dict[str, Any]], index: int, field: str, array_index: Optional[int] = None) -> Value:
+    """A field of a transaction in its msgpack (`dictify`) form, as a program reads it."""
+    txn = group[index]
+    arrays = {
+        "ApplicationArgs": txn.get("apaa", []),
+        "Accounts": [txn["snd"]] + txn.get("apat", []),
+        "Assets": txn.get("apas", []),
+        "Applications": [txn.get("apid", 0)] + txn.get("apfa", []),
+    }
+    if field in arrays:
+        values = arrays[field]
+        if array_index is None or array_index >= len(values):
+            raise Reject(f"invalid {field} index {array_index}")
+        return values[array_index]
+    counts = {"NumAppArgs": "apaa", "NumAccounts": "apat", "NumAssets": "apas", "NumApplications": "apfa"}
+    if field in counts:
+        return len(txn.get(counts[field], []))
+    if field == "TypeEnum":
+        return TYPE_ENUMS[txn["type"]]
+    if field == "Type":
+        return txn["type"].encode()
+    if field == "GroupIndex":
+        return index
+    if field == "TxID":
+        return base64.b32decode(txn_id(txn) + "====")
+    keys = {
+        "Sender": ("snd", ZERO_ADDRESS), "Fee": ("fee", 0), "FirstValid": ("fv", 0), "LastValid": ("lv", 0),
+        "Note": ("note", b""), "Lease": ("lx", ZERO_ADDRESS), "Receiver": ("rcv", ZERO_ADDRESS),
+        "Amount": ("amt", 0), "CloseRemainderTo": ("close", ZERO_ADDRESS), "XferAsset": ("xaid", 0),
+        "AssetAmount": ("aamt", 0), "AssetSender": ("asnd", ZERO_ADDRESS), "AssetReceiver": ("arcv", ZERO_ADDRESS),
+        "AssetCloseTo": ("aclose", ZERO_ADDRESS), "ApplicationID": ("apid", 0), "OnCompletion": ("apan", 0),
+        "RekeyTo": ("rekey", ZERO_ADDRESS),
+    }
+    if field not in keys:
+        raise Unsupported(f"transaction field {field}")
+    key, default = keys[field]
+    return txn.get(key, default)
+
+
+def txn_id(txn: Dict[str, Any]) -> str:
+    encoded = msgpack.packb(dict(sorted(txn.items())), use_bin_type=True)
+    return base64.b32encode(encoding.checksum(b"TX" + encoded)).decode().strip("=")
+
+
+class Evaluation:
+    """One run of an approval program, for the app call at `index` of `group`."""
+
+    def __init__(self, evaluator: "GroupEvaluator", index: int) -> None:
+        self.evaluator = evaluator
+        self.ledger = evaluator.ledger
+        self.group = evaluator.group
+        self.index = index
+        self.txn = self.group[index]
+        self.app_id = self.txn.get("apid", 0)
+        self.app_address = encoding.decode_address(get_application_address(self.app_id))
+        self.stack: List[Value] = []
+        self.scratch: List[Value] = [0] * 256
+        self.frames: List[int] = []
+        self.inner: Optional[Dict[str, Value]] = None
+        self.cost = 0
+        self.line: Optional[int] = None
+
+    def run(self, program: Program) -> None:
+        pc = 0
+        while pc < len(program.ops):
+            self.line, op, args = program.ops[pc]
+            self.cost += COSTS.get(op, 1)
+            self.evaluator.spend(COSTS.get(op, 1), self.line)
+            if op == "callsub":
+                self.frames.append(pc + 1)
+                pc = self.target(program, args[0])
+                continue
+            if op == "retsub":
+                if not self.frames:
+                    raise Reject("retsub with empty callstack", self.line)
+                pc = self.frames.pop()
+                continue
+            try:
+                branch = self.step(op, args)
+            except Reject as e:
+                e.line = e.line or self.line
+                raise
+            if branch is True:
+                return self.finish()
+            pc = pc + 1 if branch is None else self.target(program, branch)
+            if len(self.stack) > MAX_STACK:
+                raise Reject("stack overflow", self.line)
+        if len(self.stack) != 1:
+            raise Reject(f"stack len is {len(self.stack)} instead of 1")
+        self.finish()
+
+    def target(self, program: Program, label: str) -> int:
+        if label not in program.labels:
+            raise Reject(f"reference to undefined label {label}", self.line)
+        return program.labels[label]
+
+    def finish(self) -> None:
+        result = self.stack[-1]
+        if isinstance(result, bytes):
+            raise Reject("stack finished with bytes not int", self.line)
+        if result == 0:
+            raise Reject("rejected by ApprovalProgram", self.line)
+
+    def pop(self, kind: Optional[type] = None) -> Value:
+        if not self.stack:
+            raise Reject("stack underflow")
+        value = self.stack.pop()
+        if kind is not None and not isinstance(value, kind):
+            raise Reject(f"expected {kind.__name__}, got {type(value).__name__}")
+        return value
+
+    def push(self, value: Value) -> None:
+        if isinstance(value, int):
+            # bools and enums (OnComplete of dictified transactions)
+            value = int(value)
+        if isinstance(value, bytes) and len(value) > MAX_BYTES:
+            raise Reject("byte array too long")
+        self.stack.append(value)
+
+    def account(self, value: Value) -> bytes:
+        """Resolve an account reference, an index in Accounts or an available address."""
+        accounts = [self.txn["snd"]] + self.txn.get("apat", [])
+        if isinstance(value, int):
+            if value >= len(accounts):
+                raise Reject(f"invalid Accounts index {value}")
+            return accounts[value]
+        available = accounts + [self.app_address] + [
+            encoding.decode_address(get_application_address(app_id)) for app_id in self.txn.get("apfa", [])
+        ]
+        if value not in available:
+            raise Reject(f"unavailable Account {encoding.encode_address(value)}")
+        return value
+
+    def app(self, value: int) -> int:
+        apps = [self.app_id] + self.txn.get("apfa", [])
+        if value < len(apps):
+            return apps[value]
+        if value not in apps:
+            raise Reject(f"unavailable App {value}")
+        return value
+
+    def asset(self, value: int) -> int:
+        assets = self.txn.get("apas", [])
+        if value < len(assets):
+            return assets[value]
+        if value not in assets:
+            raise Reject(f"unavailable Asset {value}")
+        return value
+
+    def local_state(self, address: bytes, app_id: int) -> Dict[bytes, Value]:
+        apps = self.ledger.account(address)["apps"]
+        if app_id not in apps:
+            raise Reject(f"{encoding.encode_address(address)} has not opted in to app {app_id}")
+        return apps[app_id]
+
+    def global_field(self, field: str) -> Value:
+        if field == "MinTxnFee":
+            return self.ledger.min_fee
+        if field == "MinBalance":
+            return MIN_BALANCE
+        if field == "MaxTxnLife":
+            return 1000
+        if field == "ZeroAddress":
+            return ZERO_ADDRESS
+        if field == "GroupSize":
+            return len(self.group)
+        if field == "LogicSigVersion":
+            return 5
+        if field == "Round":
+            return self.ledger.round
+        if field == "LatestTimestamp":
+            return self.ledger.timestamp
+        if field == "CurrentApplicationID":
+            return self.app_id
+        if field == "CreatorAddress":
+            return encoding.decode_address(self.ledger.app(self.app_id)["creator"])
+        if field == "CurrentApplicationAddress":
+            return self.app_address
+        if field == "GroupID":
+            return self.txn.get("grp", ZERO_ADDRESS)
+        raise Unsupported(f"global {field}")
+
+    def step(self, op: str, args: List[Any]) -> Union[None, bool, str]:
+        """Execute one operation, returns True on `return` or the label to jump to."""
+        if op in ("int", "pushint", "byte", "pushbytes", "addr"):
+            self.push(args[0])
+        elif op in BINARY_INT_OPS:
+            b, a = self.pop(int), self.pop(int)
+            self.push(BINARY_INT_OPS[op](a, b))
+        elif op in ("==", "!="):
+            b, a = self.pop(), self.pop()
+            if isinstance(a, int) != isinstance(b, int):
+                raise Reject(f"cannot compare {type(a).__name__} to {type(b).__name__}")
+            self.push((a == b) == (op == "=="))
+        elif op == "!":
+            self.push(self.pop(int) == 0)
+        elif op == "len":
+            self.push(len(self.pop(bytes)))
+        elif op == "itob":
+            self.push(self.pop(int).to_bytes(8, "big"))
+        elif op == "btoi":
+            value = self.pop(bytes)
+            if len(value) > 8:
+                raise Reject(f"btoi arg too long, got {len(value)} bytes")
+            self.push(int.from_bytes(value, "big"))
+        elif op == "concat":
+            b, a = self.pop(bytes), self.pop(bytes)
+            self.push(a + b)
+        elif op == "sha256":
+            self.push(hashlib.sha256(self.pop(bytes)).digest())
+        elif op == "sha512_256":
+            self.push(encoding.checksum(self.pop(bytes)))
+        elif op == "mulw":
+            b, a = self.pop(int), self.pop(int)
+            self.push((a * b) >> 64)
+            self.push((a * b) & MAX_UINT64)
+        elif op == "addw":
+            b, a = self.pop(int), self.pop(int)
+            self.push((a + b) >> 64)
+            self.push((a + b) & MAX_UINT64)
+        elif op == "divmodw":
+            b_low, b_high, a_low, a_high = self.pop(int), self.pop(int), self.pop(int), self.pop(int)
+            divisor = (b_high << 64) | b_low
+            if divisor == 0:
+                raise Reject("/ 0")
+            quotient, remainder = divmod((a_high << 64) | a_low, divisor)
+            for value in (quotient >> 64, quotient & MAX_UINT64, remainder >> 64, remainder & MAX_UINT64):
+                self.push(value)
+        elif op in ("txn", "txna", "txnas"):
+            array_index = int(args[1], 0) if op == "txna" else self.pop(int) if op == "txnas" else None
+            self.push(txn_field(self.group, self.index, args[0], array_index))
+        elif op in ("gtxn", "gtxna"):
+            self.push(self.group_txn_field(int(args[0], 0), args[1], int(args[2], 0) if op == "gtxna" else None))
+        elif op in ("gtxns", "gtxnsa", "gtxnsas"):
+            array_index = int(args[1], 0) if op == "gtxnsa" else self.pop(int) if op == "gtxnsas" else None
+            self.push(self.group_txn_field(self.pop(int), args[0], array_index))
+        elif op == "global":
+            self.push(self.global_field(args[0]))
+        elif op == "load":
+            self.push(self.scratch[int(args[0], 0)])
+        elif op == "store":
+            self.scratch[int(args[0], 0)] = self.pop()
+        elif op == "bnz":
+            return args[0] if self.pop(int) != 0 else None
+        elif op == "bz":
+            return args[0] if self.pop(int) == 0 else None
+        elif op == "b":
+            return args[0]
+        elif op == "return":
+            self.stack = [self.pop()]
+            return True
+        elif op == "assert":
+            if self.pop(int) == 0:
+                raise Reject("assert failed", self.line)
+        elif op == "err":
+            raise Reject("err opcode executed", self.line)
+        elif op == "pop":
+            self.pop()
+        elif op == "dup":
+            value = self.pop()
+            self.push(value)
+            self.push(value)
+        elif op == "dup2":
+            b, a = self.pop(), self.pop()
+            for value in (a, b, a, b):
+                self.push(value)
+        elif op == "swap":
+            b, a = self.pop(), self.pop()
+            self.push(b)
+            self.push(a)
+        elif op == "select":
+            c, b, a = self.pop(int), self.pop(), self.pop()
+            self.push(b if c != 0 else a)
+        elif op == "dig":
+            depth = int(args[0], 0)
+            if depth >= len(self.stack):
+                raise Reject("dig beyond the stack")
+            self.push(self.stack[-1 - depth])
+        elif op == "balance":
+            self.push(self.ledger.account(self.account(self.pop()))["amount"])
+        elif op == "min_balance":
+            min_balance = self.ledger.account(self.account(self.pop()))["min_balance"]
+            if min_balance is None:
+                raise Unsupported("min_balance of an account whose min balance is unknown")
+            self.push(min_balance)
+        elif op == "app_opted_in":
+            app_id, address = self.app(self.pop(int)), self.account(self.pop())
+            self.push(app_id in self.ledger.account(address)["apps"])
+        elif op == "app_local_get":
+            key, address = self.pop(bytes), self.account(self.pop())
+            self.push(self.local_state(address, self.app_id).get(key, 0))
+        elif op == "app_local_get_ex":
+            key, app_id, address = self.pop(bytes), self.app(self.pop(int)), self.account(self.pop())
+            state = self.ledger.account(address)["apps"].get(app_id, {})
+            self.push(state.get(key, 0))
+            self.push(key in state)
+        elif op == "app_global_get":
+            self.push(self.ledger.app(self.app_id)["global"].get(self.pop(bytes), 0))
+        elif op == "app_global_get_ex":
+            key, app_id = self.pop(bytes), self.app(self.pop(int))
+            state = self.ledger.app(app_id)["global"]
+            self.push(state.get(key, 0))
+            self.push(key in state)
+        elif op == "app_local_put":
+            value, key, address = self.pop(), self.pop(bytes), self.account(self.pop())
+            self.local_state(address, self.app_id)[key] = value
+        elif op == "app_global_put":
+            value, key = self.pop(), self.pop(bytes)
+            self.ledger.app(self.app_id)["global"][key] = value
+        elif op == "app_local_del":
+            key, address = self.pop(bytes), self.account(self.pop())
+            self.local_state(address, self.app_id).pop(key, None)
+        elif op == "app_global_del":
+            self.ledger.app(self.app_id)["global"].pop(self.pop(bytes), None)
+        elif op == "asset_holding_get":
+            asset_id, address = self.asset(self.pop(int)), self.account(self.pop())
+            assets = self.ledger.account(address)["assets"]
+            if args[0] not in ("AssetBalance", "AssetFrozen"):
+                raise Unsupported(f"asset_holding_get {args[0]}")
+            self.push(assets.get(asset_id, 0) if args[0] == "AssetBalance" else 0)
+            self.push(asset_id in assets)
+        elif op == "itxn_begin":
+            self.inner = {}
+        elif op == "itxn_field":
+            if self.inner is None:
+                raise Reject("itxn_field without itxn_begin")
+            self.inner[args[0]] = self.pop()
+        elif op == "itxn_submit":
+            if self.inner is None:
+                raise Reject("itxn_submit without itxn_begin")
+            self.submit_inner(self.inner)
+            self.inner = None
+        elif op == "log":
+            self.pop(bytes)
+        else:
+            raise Unsupported(f"opcode {op}")
+        return None
+
+    def group_txn_field(self, index: int, field: str, array_index: Optional[int]) -> Value:
+        if index >= len(self.group):
+            raise Reject(f"gtxn lookup TxnGroup[{index}] but it only has {len(self.group)}")
+        return txn_field(self.group, index, field, array_index)
+
+    def submit_inner(self, fields: Dict[str, Value]) -> None:
+        type_enum = fields.get("TypeEnum") or TYPE_ENUMS.get(fields.get("Type", b"").decode(), 0)
+        sender = fields.get("Sender", self.app_address)
+        if sender != self.app_address:
+            raise Unsupported("inner transactions sent by another account than the app")
+        if "Fee" in fields:
+            self.ledger.pay(sender, None, fields["Fee"])
+        elif not self.evaluator.use_fee_credit():
+            self.ledger.pay(sender, None, self.ledger.min_fee)
+
+        if type_enum == TYPE_ENUMS["pay"]:
+            receiver = self.account(fields.get("Receiver", ZERO_ADDRESS))
+            self.ledger.pay(sender, receiver, fields.get("Amount", 0))
+            if "CloseRemainderTo" in fields:
+                close_to = self.account(fields["CloseRemainderTo"])
+                self.ledger.pay(sender, close_to, self.ledger.account(sender)["amount"])
+        elif type_enum == TYPE_ENUMS["axfer"]:
+            asset_id = self.asset(fields.get("XferAsset", 0))
+            receiver = self.account(fields.get("AssetReceiver", ZERO_ADDRESS))
+            amount = fields.get("AssetAmount", 0)
+            if amount == 0 and receiver == sender:
+                self.ledger.asset_opt_in(sender, asset_id)
+            else:
+                self.ledger.transfer(asset_id, sender, receiver, amount)
+            if "AssetCloseTo" in fields:
+                self.ledger.asset_close(asset_id, sender, self.account(fields["AssetCloseTo"]))
+        else:
+            raise Unsupported(f"inner {TYPES.get(type_enum, type_enum)} transactions")
+        self.ledger.check_min_balance(sender)
+
+
+class GroupEvaluator:
+    """Applies a group transaction by transaction to a `Ledger`, running the approval programs.
+
+    Fees are pooled over the group and pay for inner transactions first, the
+    opcode budget is pooled over its app calls. Evaluation stops at the first
+    rejected transaction, as algod rejects the whole group.
+    """
+
+    def __init__(self, ledger: Ledger, group: List[Dict[str, Any]]) -> None:
+        self.ledger = ledger
+        self.group = group
+        self.budget = BUDGET * sum(1 for txn in group if txn["type"] == "appl")
+        self.fee_credit = sum(txn.get("fee", 0) for txn in group) - ledger.min_fee * len(group)
+
+    def spend(self, cost: int, line: int) -> None:
+        self.budget -= cost
+        if self.budget < 0:
+            raise Reject("dynamic cost budget exceeded", line)
+
+    def use_fee_credit(self) -> bool:
+        if self.fee_credit < self.ledger.min_fee:
+            return False
+        self.fee_credit -= self.ledger.min_fee
+        return True
+
+    def evaluate(self) -> List[Outcome]:
+        outcomes = [Outcome(evaluated=False) for _ in self.group]
+        if self.fee_credit < 0:
+            fees = sum(txn.get("fee", 0) for txn in self.group)
+            outcomes[0] = Outcome(error=f"txgroup had {fees} in fees, which is less than the minimum "
+                                        f"{self.ledger.min_fee * len(self.group)}")
+            return outcomes
+        for index, txn in enumerate(self.group):
+            outcome = outcomes[index] = Outcome()
+            try:
+                self.apply(index, txn, outcome)
+            except Reject as e:
+                outcome.error, outcome.line = e.message, e.line
+                return outcomes
+            except Unsupported as e:
+                outcome.evaluated, outcome.error = False, f"not evaluated: {e}"
+        return outcomes
+
+    def apply(self, index: int, txn: Dict[str, Any], outcome: Outcome) -> None:
+        sender = txn["snd"]
+        self.ledger.pay(sender, None, txn.get("fee", 0))
+        if txn["type"] == "pay":
+            if "rcv" in txn or txn.get("amt", 0):
+                self.ledger.pay(sender, txn.get("rcv", ZERO_ADDRESS), txn.get("amt", 0))
+            if "close" in txn:
+                self.ledger.pay(sender, txn["close"], self.ledger.account(sender)["amount"])
+        elif txn["type"] == "axfer":
+            if "asnd" in txn:
+                raise Unsupported("clawback transfers")
+            asset_id, receiver, amount = txn.get("xaid", 0), txn.get("arcv", ZERO_ADDRESS), txn.get("aamt", 0)
+            if amount == 0 and receiver == sender:
+                self.ledger.asset_opt_in(sender, asset_id)
+            else:
+                self.ledger.transfer(asset_id, sender, receiver, amount)
+            if "aclose" in txn:
+                self.ledger.asset_close(asset_id, sender, txn["aclose"])
+        elif txn["type"] == "appl":
+            self.call(index, txn, outcome)
+        else:
+            raise Unsupported(f"{txn['type']} transactions")
+        self.ledger.check_min_balance(sender)
+
+    def call(self, index: int, txn: Dict[str, Any], outcome: Outcome) -> None:
+        sender, app_id, on_completion = txn["snd"], txn.get("apid", 0), txn.get("apan", 0)
+        if app_id == 0:
+            raise Unsupported("app creation")
+        if on_completion == CLEAR_STATE:
+            raise Unsupported("clear state calls")
+        app = self.ledger.app(app_id)
+        if app["source"] is None:
+            raise Unsupported(f"app {app_id} does not run a known approval program")
+
+        local_states = self.ledger.account(sender)["apps"]
+        uints, byte_slices = app["local_schema"]
+        opt_in_min_balance = MIN_BALANCE + UINT_MIN_BALANCE * uints + BYTES_MIN_BALANCE * byte_slices
+        if on_completion == OPT_IN:
+            if app_id in local_states:
+                raise Reject(f"{encoding.encode_address(sender)} has already opted in to app {app_id}")
+            local_states[app_id] = {}
+            self.ledger.adjust_min_balance(sender, opt_in_min_balance)
+
+        evaluation = Evaluation(self, index)
+        try:
+            evaluation.run(get_program(app["source"]))
+        finally:
+            outcome.cost = evaluation.cost
+        if on_completion == CLOSE_OUT:
+            del local_states[app_id]
+            self.ledger.adjust_min_balance(sender, -opt_in_min_balance)
+
+
+def evaluate_group(ledger: Ledger, group: List[Dict[str, Any]]) -> List[Outcome]:
+    """Evaluate a group given as `dictify`ed transactions, see `GroupEvaluator`."""
+    return GroupEvaluator(ledger, group).evaluate()
+
+
+def _div(a: int, b: int) -> int:
+    if b == 0:
+        raise Reject("/ 0")
+    return a // b
+
+
+def _mod(a: int, b: int) -> int:
+    if b == 0:
+        raise Reject("% 0")
+    return a % b
+
+
+def _checked(value: int, op: str) -> int:
+    if value > MAX_UINT64:
+        raise Reject(f"{op} overflowed")
+    if value < 0:
+        raise Reject(f"{op} would result negative")
+    return value
+
+
+BINARY_INT_OPS: Dict[str, Callable[[int, int], Value]] = {
+    "+": lambda a, b: _checked(a + b, "+"),
+    "-": lambda a, b: _checked(a - b, "-"),
+    "*": lambda a, b: _checked(a * b, "*"),
+    "/": _div,
+    "%": _mod,
+    "<": lambda a, b: int(a < b),
+    ">": lambda a, b: int(a > b),
+    "<=": lambda a, b: int(a <= b),
+    ">=": lambda a, b: int(a >= b),
+    "&&": lambda a, b: int(a != 0 and b != 0),
+    "||": lambda a, b: int(a != 0 or b != 0),
+    "|": lambda a, b: a | b,
+    "&": lambda a, b: a & b,
+    "^": lambda a, b: a ^ b,
+}
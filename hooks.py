@@ -0,0 +1,203 @@
+import functools
+import inspect
+import time
+from contextvars import ContextVar
+from typing import Any, AsyncIterator, Callable, Coroutine, Dict, Iterator, List, Optional
+
+# a subscriber receives every event name together with its fields
+Subscriber = Callable[[str, Dict[str, Any]], None]
+
+subscribers: List[Subscriber] = []
+
+# the `pending.PendingTxn` handles of the operation running with wait=False, None while it waits. A context
+# variable, so operations running concurrently on one event loop (or thread) each keep their own
+deferred: ContextVar[Optional[List[Any]]] = ContextVar("deferred", default=None)
+
+
+def subscribe(subscriber: Subscriber) -> Subscriber:
+    subscribers.append(subscriber)
+    return subscriber
+
+
+def unsubscribe(subscriber: Subscriber) -> None:
+    if subscriber in subscribers:
+        subscribers.remove(subscriber)
+
+
+def emit(event: str, **fields) -> None:
+    """Publish an event, a no-op until something subscribes.
+
+    Events emitted by this package:
+        operation_start: operation
+        operation_end: operation, elapsed, error
+        algod_call: method, path, elapsed, error (only for `instrument`ed clients)
+        round_waited: tx_id, round, elapsed
+        confirmed: tx_id, round, elapsed
+        state_decoded: app_id, address (None for global state), state
+        txns_built: txns
+        optin: address, app_id or asset_id
+        account_generated: address
+        app_created: app_id, address (the application account, before it is funded)
+        compile_fallback: error (algod could not compile, assembled locally)
+        slot_taken: owner, app_id, hit (False when the slot was set up on the caller's path)
+        slot_pool_error: owner, app_id, error
+        slot_lease_lost: address, app_id (the lease expired or was taken before it could be renewed)
+        slot_lease_error: address, app_id, error (renewing the lease failed, it is retried)
+        slots_swept: owner, closed (addresses), error (only when the sweep failed)
+        auction_set_up: app_id, auction_index, seller, end_time
+        auctions_settled: app_id, settled (auction indexes), failed ({auction_index: error})
+        registry_synced: first, last (rounds), found, closed (slots, see rebuild.rebuild)
+        confirmation_deferred: tx_id, group_id, last_valid (operations called with wait=False)
+        preflight: evaluator, tx_id (first of the group), ok, cost, rejection (see preflight.guard)
+    """
+    if not subscribers:
+        return
+    for subscriber in subscribers:
+        subscriber(event, fields)
+
+
+def run_blocking(coroutine: Coroutine) -> Any:
+    """Run a coroutine that never suspends to completion, which is how the sync API runs operations.
+
+    Given a blocking `AlgodClient`, every await of an operation completes
+    right away. A coroutine that does suspend needs an event loop and is refused.
+    """
+    try:
+        coroutine.send(None)
+    except StopIteration as done:
+        return done.value
+    coroutine.close()
+    raise RuntimeError(f"{coroutine.__qualname__} suspended, only an AsyncAlgodClient can be awaited")
+
+
+def iterate_blocking(iterator: AsyncIterator) -> Iterator:
+    """Step an async iterator that never suspends, see `run_blocking`.
+
+    Closing the iterator, or dropping it, before the end closes an async generator too.
+    """
+    try:
+        while True:
+            try:
+                item = run_blocking(iterator.__anext__())
+            except StopAsyncIteration:
+                return
+            yield item
+    finally:
+        if inspect.isasyncgen(iterator):
+            run_blocking(iterator.aclose())
+
+
+def operation(fn: Callable) -> Callable:
+    """Turn a coroutine function into a public operation, emitting `operation_start` and `operation_end` around it.
+
+    An operation is written once, as a coroutine function awaiting its algod
+    calls (see `aio`), and can be used two ways:
+
+    - `op(client, ...)` with a regular `AlgodClient` runs it to completion
+      on the calling thread. Every await completes right away, the same
+      blocking calls as before.
+    - `await op.aio(client, ...)` with an `aio.AsyncAlgodClient` runs it on
+      the event loop. The operations exported by the `aio` module of each
+      app are these.
+
+    An operation that returns an async iterator returns a regular iterator
+    from the sync API instead.
+
+    Every operation also takes a keyword-only `wait` argument. With
+    `wait=False` it returns as soon as its last group is sent: the final wait
+    (`pending.confirm`) gives back a `pending.PendingTxn` handle, holding the
+    operation's return value in `value`, instead of blocking. Bulk operations
+    give back a `pending.PendingBatch` over all their groups. An operation
+    that sent nothing returns its value as usual. Operations it calls, and
+    the transactions it needs confirmed before its last group, still wait.
+    """
+    name = f"{fn.__module__.split('.')[0]}.{fn.__name__}"
+
+    async def run(*args, **kwargs):
+        if not subscribers:
+            return await fn(*args, **kwargs)
+
+        emit("operation_start", operation=name)
+        start = time.perf_counter()
+        error = None
+        try:
+            return await fn(*args, **kwargs)
+        except Exception as e:
+            error = e
+            raise
+        finally:
+            emit("operation_end", operation=name, elapsed=time.perf_counter() - start, error=error)
+
+    @functools.wraps(fn)
+    async def aio(*args, wait: bool = True, **kwargs):
+        token = deferred.set(None if wait else [])
+        try:
+            value = await run(*args, **kwargs)
+            handles = deferred.get()
+        finally:
+            deferred.reset(token)
+        if not handles:
+            return value
+        handles[-1].value = value
+        return handles[-1]
+
+    @functools.wraps(fn)
+    def wrapper(*args, wait: bool = True, **kwargs):
+        value = run_blocking(aio(*args, wait=wait, **kwargs))
+        return iterate_blocking(value) if inspect.isasyncgen(value) else value
+
+    wrapper.aio = aio
+    return wrapper
+
+
+def instrument(client):
+    """Emit an `algod_call` event with its timing for every request the client makes, blocking or async."""
+    algod_request = client.algod_request
+
+    def emit_call(method, requrl, start, error):
+        emit("algod_call", method=method, path=requrl, elapsed=time.perf_counter() - start, error=error)
+
+    @functools.wraps(algod_request)
+    def timed_request(method, requrl, *args, **kwargs):
+        start = time.perf_counter()
+        error = None
+        try:
+            return algod_request(method, requrl, *args, **kwargs)
+        except Exception as e:
+            error = e
+            raise
+        finally:
+            emit_call(method, requrl, start, error)
+
+    @functools.wraps(algod_request)
+    async def timed_async_request(method, requrl, *args, **kwargs):
+        start = time.perf_counter()
+        error = None
+        try:
+            return await algod_request(method, requrl, *args, **kwargs)
+        except Exception as e:
+            error = e
+            raise
+        finally:
+            emit_call(method, requrl, start, error)
+
+    client.algod_request = timed_async_request if inspect.iscoroutinefunction(algod_request) else timed_request
+    return client
+
+
+def print_subscriber(event: str, fields: Dict[str, Any]) -> None:
+    """Prints events the way the operations used to print them."""
+    if event == "round_waited":
+        print("Waiting for confirmation...")
+    elif event == "confirmed":
+        print("Transaction {} confirmed in round {}.".format(fields["tx_id"], fields["round"]))
+    elif event == "app_created":
+        print(f"App ID: {fields['app_id']}")
+        print(f"App address: {fields['address']}")
+    elif event == "state_decoded":
+        owner = fields["address"] or "global"
+        print(f"state of app {fields['app_id']} ({owner}) :", fields["state"])
+    elif event in ("operation_end", "algod_call"):
+        print(event, {**fields, "elapsed": f"{fields['elapsed'] * 1000:.1f} ms"})
+    else:
+        print(event, fields)
@@ -0,0 +1,98 @@
+from typing import Any, AsyncIterator, Callable, Iterable, Iterator, List, Optional, Tuple, Union
+
+from algosdk.future import transaction
+from algosdk.v2client.algod import AlgodClient
+
+from account import Account
+from pending import PendingBatch
+from receipts import Receipt, confirm_groups, send_groups, settle_groups
+from signing import sign_many
+from utils import MAX_GROUP_SIZE
+
+
+class GroupPacker:
+    """Packs the transactions of independent operations into as few atomic groups as possible.
+
+    Each operation keeps its transactions adjacent and in order, which is all
+    the contracts need since they find the other transactions of a call
+    relative to it (`Txn.group_index() - 1`...). Operations are added in order
+    and a new group starts when the next one does not fit in `max_size`
+    transactions (16 at most), `max_size=1` gives every operation its own group.
+
+    A packed group succeeds or fails as a whole: every operation in it gets
+    the group's tx id and round, or its error. Sending is awaited, with
+    either client (see `aio.call`), like the operations it is used by.
+    """
+
+    def __init__(self, max_size: int = MAX_GROUP_SIZE) -> None:
+        self.max_size = max_size
+        self.groups: List[Tuple[List[Receipt], List[Tuple[transaction.Transaction, Union[Account, str]]]]] = []
+
+    def add(self, receipt: Receipt, txns: List[transaction.Transaction], signer: Union[Account, str]) -> None:
+        """Add the transactions of one operation, signed by `signer` (an account or private key) once packed."""
+        if len(txns) > MAX_GROUP_SIZE:
+            raise ValueError(f"an operation of {len(txns)} transactions does not fit in a group")
+        if not self.groups or len(self.groups[-1][1]) + len(txns) > self.max_size:
+            self.groups.append(([], []))
+        self.groups[-1][0].append(receipt)
+        self.groups[-1][1].extend((txn, signer) for txn in txns)
+
+    def signed_groups(self) -> List[Tuple[Receipt, List[transaction.SignedTransaction]]]:
+        """Assign the group ids and sign, one receipt per group holding the receipts of its operations.
+
+        Every group is signed in one `sign_many` batch, over worker processes
+        for large setups.
+        """
+        for _, txns in self.groups:
+            unsigned = [txn for txn, _ in txns]
+            # the group id of an operation built on its own covers the group id field
+            for txn in unsigned:
+                txn.group = None
+            transaction.assign_group_id(unsigned)
+        signed = iter(sign_many(pair for _, txns in self.groups for pair in txns))
+        return [(Receipt(item=receipts), [next(signed) for _ in txns]) for receipts, txns in self.groups]
+
+    async def send(self, client: AlgodClient) -> AsyncIterator[Receipt]:
+        """Send every group now, returns an async iterator of the operations' receipts as their group confirms."""
+        return self.settle(client, await send_groups(client, self.signed_groups()))
+
+    async def settle(self, client: AlgodClient, groups: List[Receipt]) -> AsyncIterator[Receipt]:
+        async for group in settle_groups(client, groups):
+            for receipt in self.spread([group]):
+                yield receipt
+
+    async def stream(self, client: AlgodClient) -> AsyncIterator[Receipt]:
+        """Send every group before waiting, then yield the operations' receipts as their group confirms."""
+        async for receipt in await self.send(client):
+            yield receipt
+
+    async def submit(self, client: AlgodClient) -> List[Receipt]:
+        return [receipt async for receipt in self.stream(client)]
+
+    async def confirm(self, client: AlgodClient,
+                      on_settled: Optional[Callable[[Receipt], Any]] = None) -> Union[List[Receipt], PendingBatch]:
+        """Send every group as the final wait of a bulk operation, see `receipts.confirm_groups`.
+
+        `on_settled` runs for the receipt of every operation of a group once
+        the group settled.
+        """
+        def settle_group(group: Receipt) -> None:
+            for receipt in self.spread([group]):
+                if on_settled is not None:
+                    on_settled(receipt)
+
+        groups = self.signed_groups()
+        settled = await confirm_groups(client, groups, settle_group)
+        # groups still in flight with wait=False
+        for group, _ in groups:
+            for receipt in group.item:
+                receipt.tx_id = group.tx_id
+        return settled
+
+    @staticmethod
+    def spread(groups: Iterable[Receipt]) -> Iterator[Receipt]:
+        """The receipts of the operations of each group, given the group's outcome."""
+        for group in groups:
+            for receipt in group.item:
+                receipt.tx_id, receipt.round, receipt.error = group.tx_id, group.round, group.error
+                yield receipt
@@ -0,0 +1,215 @@
+import asyncio
+import base64
+import threading
+from concurrent import futures
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, Iterator, List, Optional, Union
+
+from algosdk.future import transaction
+from algosdk.v2client.algod import AlgodClient
+
+import aio
+import hooks
+import utils
+from confirmation import ConfirmationTracker
+from hooks import emit
+from utils import PendingTxnResponse
+
+# trackers of the pending handles, by algod address
+trackers: Dict[str, ConfirmationTracker] = dict()
+tracker_lock = threading.Lock()
+
+
+class Pending:
+    """What the handles have in common: poll with `done()`, block with
+    `result()`, attach callbacks with `add_done_callback` or `await` them.
+    `value` is what the operation returned.
+    """
+
+    def __init__(self) -> None:
+        self.value: Any = None
+        self.future: Future = Future()
+
+    def done(self) -> bool:
+        return self.future.done()
+
+    def result(self, timeout: Optional[float] = None) -> Any:
+        return self.future.result(timeout)
+
+    def exception(self, timeout: Optional[float] = None) -> Optional[BaseException]:
+        return self.future.exception(timeout)
+
+    def add_done_callback(self, callback: Callable[[Any], Any]) -> None:
+        self.future.add_done_callback(lambda _: callback(self))
+
+    def __await__(self):
+        return asyncio.wrap_future(self.future).__await__()
+
+
+class PendingTxn(Pending):
+    """Handle on the group an operation called with `wait=False` left in flight.
+
+    `tx_id` is the transaction the operation would have waited on, `group_id`
+    its group (base64, None for a lone transaction) and `first_valid` ..
+    `last_valid` the rounds it can be confirmed in, the handle fails once
+    `last_valid` has passed. `value` is what the operation returned.
+
+    Poll it with `done()`, block with `result()`, attach callbacks with
+    `add_done_callback` or `await` it. It completes after the operation's own
+    follow-up (recording or releasing a slot...) has run.
+    """
+
+    def __init__(self, txn: transaction.Transaction) -> None:
+        super().__init__()
+        self.tx_id: str = txn.get_txid()
+        self.group_id: Optional[str] = base64.b64encode(txn.group).decode() if txn.group else None
+        self.first_valid: int = txn.first_valid_round
+        self.last_valid: int = txn.last_valid_round
+
+    def result(self, timeout: Optional[float] = None) -> PendingTxnResponse:
+        return self.future.result(timeout)
+
+    @property
+    def round(self) -> Optional[int]:
+        """The confirmed round, None until the group is confirmed."""
+        if self.future.done() and self.future.exception() is None:
+            return self.future.result().confirmed_round
+        return None
+
+    def __repr__(self) -> str:
+        state = "confirmed" if self.round else "failed" if self.done() else "pending"
+        return f"PendingTxn({self.tx_id}, rounds {self.first_valid}-{self.last_valid}, {state})"
+
+    def settle(self, confirmed: Future,
+               on_confirmed: Optional[Callable[[PendingTxnResponse], Any]],
+               on_failed: Optional[Callable[[Exception], Any]]) -> None:
+        """Run the operation's follow-up once the tracker resolved the group, then complete."""
+        try:
+            error = confirmed.exception()
+            if error is not None:
+                if on_failed is not None:
+                    on_failed(error)
+                self.future.set_exception(error)
+                return
+            response = confirmed.result()
+            if on_confirmed is not None:
+                on_confirmed(response)
+            self.future.set_result(response)
+        except Exception as e:
+            self.future.set_exception(e)
+
+
+class PendingBatch(Pending):
+    """Handle on the groups a bulk operation called with `wait=False` left in flight.
+
+    `handles` holds the `PendingTxn` of every group it sent. The batch
+    completes once all of them are confirmed or failed, with the list of
+    their responses or exceptions: a failed group does not fail the batch,
+    its operations' receipts hold the error. `value` is what the operation
+    returned, usually its receipts, filled in as their groups settle.
+    """
+
+    def __init__(self, handles: List[PendingTxn]) -> None:
+        super().__init__()
+        self.handles = handles
+        self.lock = threading.Lock()
+        self.remaining = len(handles)
+        if not handles:
+            self.future.set_result([])
+        for handle in handles:
+            handle.future.add_done_callback(self._on_done)
+
+    def _on_done(self, _) -> None:
+        with self.lock:
+            self.remaining -= 1
+            if self.remaining:
+                return
+        self.future.set_result([handle.exception() or handle.result() for handle in self.handles])
+
+    def as_completed(self, timeout: Optional[float] = None) -> Iterator[PendingTxn]:
+        """The group handles as they settle."""
+        handles = {handle.future: handle for handle in self.handles}
+        for future in futures.as_completed(handles, timeout):
+            yield handles[future]
+
+    def __repr__(self) -> str:
+        return f"PendingBatch({len(self.handles)} groups, {self.remaining} pending)"
+
+
+def get_tracker(client: AlgodClient) -> ConfirmationTracker:
+    """The confirmation tracker resolving the handles of `client`'s node, started on first use.
+
+    The tracker installed with `ConfirmationTracker.install()` is used when it
+    follows the same node. Otherwise the handles get a tracker of their own,
+    which is not installed: `wait_for_confirmation` keeps working as before
+    for every other caller and client.
+    """
+    installed = utils.confirmation_tracker
+    if installed is not None and installed.client.algod_address == client.algod_address:
+        return installed
+    with tracker_lock:
+        tracker = trackers.get(client.algod_address)
+        if tracker is None:
+            tracker = trackers[client.algod_address] = ConfirmationTracker(client)
+        return tracker.start()
+
+
+async def confirm(client: AlgodClient,
+                  txn: Union[transaction.Transaction, transaction.SignedTransaction],
+                  on_confirmed: Optional[Callable[[PendingTxnResponse], Any]] = None,
+                  on_failed: Optional[Callable[[Exception], Any]] = None) -> Union[PendingTxnResponse, PendingTxn]:
+    """The final wait of an operation, with what it does once the group is confirmed or failed.
+
+    Waits like `wait_for_confirmation` and runs `on_confirmed(response)`, or
+    `on_failed(error)` before raising again. When the operation was called
+    with `wait=False` (see `hooks.operation`), the transaction is handed to the
+    confirmation tracker instead and a `PendingTxn` is returned right away, the
+    callbacks run on the tracker thread.
+    """
+    txn = getattr(txn, "transaction", txn)
+    handles = hooks.deferred.get()
+    if handles is None:
+        try:
+            response = await aio.wait_for_confirmation(client, txn.get_txid())
+        except Exception as e:
+            if on_failed is not None:
+                on_failed(e)
+            raise
+        if on_confirmed is not None:
+            on_confirmed(response)
+        return response
+
+    pending = await defer(client, txn, on_confirmed, on_failed)
+    handles.append(pending)
+    return pending
+
+
+def deferring() -> bool:
+    """Whether the running operation was called with `wait=False`."""
+    return hooks.deferred.get() is not None
+
+
+async def defer(client: AlgodClient,
+                txn: Union[transaction.Transaction, transaction.SignedTransaction],
+                on_confirmed: Optional[Callable[[PendingTxnResponse], Any]] = None,
+                on_failed: Optional[Callable[[Exception], Any]] = None) -> PendingTxn:
+    """Hand a sent transaction to the confirmation tracker, returns its handle."""
+    pending = PendingTxn(getattr(txn, "transaction", txn))
+    emit("confirmation_deferred", tx_id=pending.tx_id, group_id=pending.group_id, last_valid=pending.last_valid)
+    # the tracker follows the node with a blocking client, from its own thread
+    await aio.offload(
+        lambda tracked: get_tracker(tracked).register(
+            pending.tx_id,
+            callback=lambda future: pending.settle(future, on_confirmed, on_failed),
+            last_valid=pending.last_valid,
+        ),
+        client,
+    )
+    return pending
+
+
+def confirm_batch(client: AlgodClient, handles: List[PendingTxn]) -> PendingBatch:
+    """The final wait of a bulk operation called with `wait=False`, over the `defer`red handles of its groups."""
+    batch = PendingBatch(handles)
+    hooks.deferred.get().append(batch)
+    return batch
@@ -0,0 +1,239 @@
+import os
+import threading
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Set
+
+import msgpack
+from algosdk.error import AlgodHTTPError
+from algosdk.future import transaction
+from algosdk.v2client.algod import AlgodClient
+
+import aio
+import artifacts
+from evaluator import Ledger, evaluate_group
+from hooks import emit
+from utils import decode_state, get_account_snapshot, get_suggested_params
+
+# lines of program shown before the failing one, enough for the conditions of an assert
+CONTEXT_LINES = 8
+
+# algod addresses that refused dryrun requests (developer API disabled), evaluated locally from then on
+dryrun_unavailable: Set[str] = set()
+approval_sources: Optional[Dict[str, str]] = None
+sources_lock = threading.Lock()
+
+
+@dataclass
+class TxnReport:
+    """Preflight outcome of one transaction of a group.
+
+    `passed` is None when the transaction was not evaluated (not a program
+    call for dryrun, something the local evaluator does not model, or a
+    transaction after the rejected one). For a rejected program, `line` is the
+    failing line of the program (of the disassembly with dryrun), `source` that
+    line (`assert`, `err`...) and `context` the lines before it.
+    """
+    index: int
+    tx_id: str
+    passed: Optional[bool]
+    cost: int = 0
+    message: Optional[str] = None
+    line: Optional[int] = None
+    source: Optional[str] = None
+    context: List[str] = field(default_factory=list)
+
+
+@dataclass
+class Preflight:
+    """Outcome of a group, `evaluator` is "dryrun" or "local"."""
+    evaluator: str
+    txns: List[TxnReport]
+
+    @property
+    def ok(self) -> bool:
+        return self.rejection is None
+
+    @property
+    def rejection(self) -> Optional[TxnReport]:
+        return next((report for report in self.txns if report.passed is False), None)
+
+    @property
+    def cost(self) -> int:
+        return sum(report.cost for report in self.txns)
+
+
+class PreflightError(Exception):
+    """A group was rejected by its preflight, nothing was sent."""
+
+    def __init__(self, preflight: Preflight) -> None:
+        self.preflight = preflight
+        rejection = preflight.rejection
+        where = f" at line {rejection.line} ({rejection.source})" if rejection.line is not None else ""
+        super().__init__(f"transaction {rejection.index} of the group would be rejected{where}: "
+                         f"{rejection.message}, cost {rejection.cost} ({preflight.evaluator})")
+
+
+def program_lines(lines: List[str], line: Optional[int]) -> Dict[str, Any]:
+    """The `source` and `context` fields of a report for `line` (1-based) of a program."""
+    if line is None or not 1 <= line <= len(lines):
+        return {}
+    return {"source": lines[line - 1].strip(), "context": lines[max(0, line - 1 - CONTEXT_LINES):line - 1]}
+
+
+def latest_timestamp(client: AlgodClient, round_: int) -> int:
+    raw = client.block_info(round_, response_format="msgpack")
+    return msgpack.unpackb(raw, raw=False, strict_map_key=False)["block"]["ts"]
+
+
+def dryrun(client: AlgodClient, signed_txns: List[Any]) -> Preflight:
+    """Evaluate a signed group with algod's dryrun endpoint (needs the developer API)."""
+    round_ = client.status()["last-round"]
+    request = transaction.create_dryrun(client, signed_txns, latest_timestamp=latest_timestamp(client, round_),
+                                        round=round_)
+    response = client.dryrun(request)
+    if response.get("error"):
+        raise Exception(f"dryrun failed: {response['error']}")
+
+    reports = []
+    for index, (signed_txn, result) in enumerate(zip(signed_txns, response["txns"])):
+        report = TxnReport(index=index, tx_id=signed_txn.get_txid(), passed=None)
+        messages = result.get("app-call-messages") or []
+        if messages:
+            report.cost = result.get("budget-consumed", result.get("cost")) or 0
+            report.passed = "PASS" in messages
+        if report.passed is False:
+            report.message = next((m for m in reversed(messages) if m not in ("REJECT", "ApprovalProgram")), "REJECT")
+            trace = result.get("app-call-trace") or []
+            if trace:
+                # trace lines are 0-based indexes in the disassembly
+                report.line = trace[-1]["line"] + 1
+                report.__dict__.update(program_lines(result.get("disassembly") or [], report.line))
+        reports.append(report)
+    return Preflight("dryrun", reports)
+
+
+def get_approval_sources() -> Dict[str, str]:
+    """TEAL of the prebuilt approval programs, by base64 bytecode."""
+    global approval_sources
+    with sources_lock:
+        if approval_sources is None:
+            approval_sources = dict()
+            for entry in ((artifacts.get_manifest() or {}).get("apps") or {}).values():
+                program = entry["approval_program"]
+                with open(os.path.join(artifacts.DIRECTORY, program["teal"])) as f:
+                    approval_sources[program["bytecode"]] = f.read()
+        return approval_sources
+
+
+def local_ledger(client: AlgodClient) -> Ledger:
+    """A ledger reading the chain through the account cache, at the last round."""
+    round_ = client.status()["last-round"]
+
+    def load_account(address: str) -> Dict[str, Any]:
+        account_info = get_account_snapshot(client, address)
+        return {
+            "amount": account_info["amount"],
+            "min_balance": account_info.get("min-balance"),
+            "assets": {holding["asset-id"]: holding["amount"] for holding in account_info.get("assets", [])},
+            "apps": {
+                local_state["id"]: decode_state(local_state.get("key-value", []))
+                for local_state in account_info.get("apps-local-state", [])
+            },
+        }
+
+    def load_app(app_id: int) -> Dict[str, Any]:
+        params = client.application_info(app_id)["params"]
+        schema = params.get("local-state-schema", {})
+        return {
+            "creator": params["creator"],
+            "global": decode_state(params.get("global-state", [])),
+            "local_schema": (schema.get("num-uint", 0), schema.get("num-byte-slice", 0)),
+            "source": get_approval_sources().get(params["approval-program"]),
+        }
+
+    min_fee = get_suggested_params(client).min_fee or 1000
+    return Ledger(load_account, load_app, round_, latest_timestamp(client, round_), min_fee)
+
+
+def evaluate(client: AlgodClient, signed_txns: List[Any]) -> Preflight:
+    """Evaluate a signed group locally, against the state algod reports for the last round.
+
+    Only the apps of this package are evaluated, through their prebuilt TEAL,
+    along with the payments, asset transfers and opt-ins of the group.
+    """
+    ledger = local_ledger(client)
+    outcomes = evaluate_group(ledger, [getattr(txn, "transaction", txn).dictify() for txn in signed_txns])
+    reports = []
+    for index, (signed_txn, outcome) in enumerate(zip(signed_txns, outcomes)):
+        report = TxnReport(index=index, tx_id=signed_txn.get_txid(), passed=None, cost=outcome.cost,
+                           message=outcome.error, line=outcome.line)
+        if outcome.evaluated:
+            report.passed = outcome.error is None
+        if outcome.line is not None:
+            txn = getattr(signed_txn, "transaction", signed_txn)
+            source = ledger.app(txn.index)["source"]
+            report.__dict__.update(program_lines(source.splitlines(), outcome.line))
+        reports.append(report)
+    return Preflight("local", reports)
+
+
+def preflight(client: AlgodClient, signed_txns: List[Any], local: bool = False) -> Preflight:
+    """Evaluate a signed group before sending it, with dryrun or, when algod refuses it or `local`, locally.
+
+    Blocking, an `AsyncAlgodClient` is evaluated through its blocking twin.
+    """
+    client = aio.blocking_client(client)
+    if not local and client.algod_address not in dryrun_unavailable:
+        try:
+            return dryrun(client, signed_txns)
+        except AlgodHTTPError:
+            dryrun_unavailable.add(client.algod_address)
+    return evaluate(client, signed_txns)
+
+
+def check(client: AlgodClient, signed_txns: List[Any], local: bool = False) -> Preflight:
+    """Preflight a group, raises `PreflightError` when it would be rejected."""
+    result = preflight(client, signed_txns, local)
+    rejection = result.rejection
+    emit("preflight", evaluator=result.evaluator, tx_id=result.txns[0].tx_id if result.txns else None,
+         ok=result.ok, cost=result.cost, rejection=rejection)
+    if rejection is not None:
+        raise PreflightError(result)
+    return result
+
+
+def guard(client: AlgodClient, local: bool = False) -> AlgodClient:
+    """Preflight every transaction or group the client sends, a rejected one raises `PreflightError` unsent.
+
+    Operations called with a guarded client stop before the group that would
+    fail, without waiting for a round; a preflight costs one dryrun call, or
+    the few state reads of a local evaluation. The send methods of an
+    `AsyncAlgodClient` stay coroutines, its preflights run off the event loop.
+    """
+    send_transaction = client.send_transaction
+    send_transactions = client.send_transactions
+
+    if aio.is_async(client):
+        async def checked_send_transaction(txn, **kwargs):
+            await aio.offload(check, client, [txn], local)
+            return await send_transaction(txn, **kwargs)
+
+        async def checked_send_transactions(txns, **kwargs):
+            await aio.offload(check, client, txns, local)
+            return await send_transactions(txns, **kwargs)
+
+        client.send_transaction = checked_send_transaction
+        client.send_transactions = checked_send_transactions
+        return client
+
+    def checked_send_transaction(txn, **kwargs):
+        check(client, [txn], local)
+        return send_transaction(txn, **kwargs)
+
+    def checked_send_transactions(txns, **kwargs):
+        check(client, txns, local)
+        return send_transactions(txns, **kwargs)
+
+    client.send_transaction = checked_send_transaction
+    client.send_transactions = checked_send_transactions
+    return client
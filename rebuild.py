@@ -0,0 +1,150 @@
+import itertools
+import sys
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Deque, Dict, Iterable, List, Optional, Set, Tuple
+
+import msgpack
+from algosdk import encoding
+from algosdk.v2client.algod import AlgodClient
+
+from hooks import emit
+from registry import OPTED_IN, OPTED_OUT, rekeyed_registry
+from slots import slot_index
+
+# on completion values of the app calls that change a slot's membership
+OPT_IN, CLOSE_OUT, CLEAR_STATE = 1, 2, 3
+
+# (round, timestamp, kind, sender, value), in chain order. kind is "rekey" (value is
+# the new auth address, the sender itself when rekeyed back), "app" (value is
+# (app_id, on_completion)) or "close" (the sender's balance was closed out)
+Event = Tuple[int, int, str, str, Any]
+
+
+def block_events(client: AlgodClient, round_: int) -> List[Event]:
+    """The top level transactions of a block that can change who owns a slot."""
+    raw = client.block_info(round_, response_format="msgpack")
+    block = msgpack.unpackb(raw, raw=False, strict_map_key=False)["block"]
+    timestamp = block.get("ts", 0)
+    events: List[Event] = []
+    for stxn in block.get("txns", []):
+        txn = stxn["txn"]
+        sender = encoding.encode_address(txn["snd"])
+        if "rekey" in txn:
+            events.append((round_, timestamp, "rekey", sender, encoding.encode_address(txn["rekey"])))
+        if txn.get("type") == "appl" and txn.get("apid") and txn.get("apan") in (OPT_IN, CLOSE_OUT, CLEAR_STATE):
+            events.append((round_, timestamp, "app", sender, (txn["apid"], txn["apan"])))
+        if txn.get("type") == "pay" and "close" in txn:
+            events.append((round_, timestamp, "close", sender, None))
+    return events
+
+
+def scan_range(client: AlgodClient, first: int, last: int) -> List[Event]:
+    return [event for round_ in range(first, last + 1) for event in block_events(client, round_)]
+
+
+class ChainState:
+    """Ownership of the scanned owners' slots as the events are replayed in order.
+
+    `starts` is the first round not yet recorded for each owner, the events of
+    an owner before it were applied by a previous run and are skipped.
+    """
+
+    def __init__(self, starts: Dict[str, int], known: Dict[str, str]) -> None:
+        self.starts = starts
+        self.known = known
+
+    def replay(self, events: Iterable[Event]) -> Tuple[List[Tuple], List[Tuple], Set[str]]:
+        """Replay a range of events, returns its rekeyed addresses, app statuses and closed addresses."""
+        rekeyed: Dict[str, Tuple[str, float]] = dict()
+        statuses: Dict[Tuple[str, str, int], Tuple[int, float]] = dict()
+        closed: Set[str] = set()
+        for round_, timestamp, kind, sender, value in events:
+            owner = self.known.get(sender)
+            if kind == "rekey" and value in self.starts:
+                if round_ >= self.starts[value]:
+                    self.known[sender] = value
+                    rekeyed[sender] = (value, timestamp)
+                    closed.discard(sender)
+                continue
+            if owner is None or round_ < self.starts[owner]:
+                continue
+            if kind == "app":
+                app_id, on_completion = value
+                status = OPTED_IN if on_completion == OPT_IN else OPTED_OUT
+                statuses[(owner, sender, app_id)] = (status, timestamp)
+            else:
+                # closed, or rekeyed away from its owner
+                del self.known[sender]
+                closed.add(sender)
+        return (
+            [(owner, address, timestamp) for address, (owner, timestamp) in rekeyed.items()],
+            [(*key, status, timestamp) for key, (status, timestamp) in statuses.items()],
+            closed,
+        )
+
+
+def rebuild(
+    client: AlgodClient,
+    owners: List[str],
+    first_round: int = 1,
+    last_round: Optional[int] = None,
+    workers: int = 8,
+    chunk: int = 1000,
+) -> int:
+    """Rebuild the registry rows of `owners` from the blocks, returns how many slots were found.
+
+    A slot is an address that sent a transaction rekeying it to an owner, the
+    app opt-ins, close outs and clear states it sends afterwards give its
+    status per app, and closing it or rekeying it elsewhere marks it CLOSED.
+
+    Blocks are read `chunk` rounds at a time by `workers` threads, and the
+    ranges are applied in order, each in one transaction together with the
+    owners' checkpoints. A run that stops resumes after the last applied
+    range, and a later run only reads the rounds added since. An owner without
+    a checkpoint is scanned from `first_round`.
+    """
+    if last_round is None:
+        last_round = client.status()["last-round"]
+    starts: Dict[str, int] = dict()
+    for owner in owners:
+        checkpoint = rekeyed_registry.checkpoint(owner)
+        starts[owner] = first_round if checkpoint is None else checkpoint + 1
+    known = {address: owner for owner in owners for address in rekeyed_registry.memberships(owner)}
+    state = ChainState(starts, known)
+
+    first = min(starts.values(), default=last_round + 1)
+    ranges = ((start, min(start + chunk - 1, last_round)) for start in range(first, last_round + 1, chunk))
+    found = 0
+    with ThreadPoolExecutor(workers) as executor:
+        pending: Deque = deque(
+            (start, end, executor.submit(scan_range, client, start, end))
+            for start, end in itertools.islice(ranges, workers)
+        )
+        try:
+            while pending:
+                start, end, future = pending.popleft()
+                events = future.result()
+                next_range = next(ranges, None)
+                if next_range is not None:
+                    pending.append((*next_range, executor.submit(scan_range, client, *next_range)))
+
+                rekeyed, statuses, closed = state.replay(events)
+                rekeyed_registry.apply_chain(owners, end, rekeyed, statuses, closed)
+                found += len(rekeyed)
+                emit("registry_synced", first=start, last=end, found=len(rekeyed), closed=len(closed))
+        finally:
+            for *_, future in pending:
+                future.cancel()
+
+    # the in-memory slot index reloads from the chain on next use
+    for owner in owners:
+        slot_index.forget(owner)
+    return found
+
+
+# python -m rebuild algod_url algod_token first_round owner [owner ...]
+if __name__ == "__main__":
+    client = AlgodClient(sys.argv[2], sys.argv[1])
+    found = rebuild(client, sys.argv[4:], first_round=int(sys.argv[3]))
+    print(f"found {found} rekeyed addresses, registry {rekeyed_registry.path}")
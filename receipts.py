@@ -0,0 +1,125 @@
+from dataclasses import dataclass
+from typing import Any, AsyncIterator, Callable, Iterable, List, Optional, Tuple, Union
+
+from algosdk.v2client.algod import AlgodClient
+
+import aio
+from hooks import iterate_blocking
+from pending import PendingBatch, confirm_batch, defer, deferring
+from utils import PendingTxnResponse
+
+
+@dataclass
+class Receipt:
+    """Outcome of one item of a bulk operation.
+
+    `index` is the rekeyed address (trading index, auction index...) the item
+    uses, `tx_id` the id of its group once sent and `round` the round it was
+    confirmed in. `error` holds the exception that stopped the item, the other
+    items of the batch are not affected by it.
+    """
+    item: Any
+    index: Optional[str] = None
+    tx_id: Optional[str] = None
+    round: Optional[int] = None
+    error: Optional[Exception] = None
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None and self.round is not None
+
+
+async def send_groups(client: AlgodClient, groups: Iterable[Tuple[Receipt, List]]) -> List[Receipt]:
+    """Send signed groups that do not depend on each other, without waiting.
+
+    Returns the receipt of every group, with its `tx_id`, or the `error` the
+    node refused it with.
+    """
+    receipts = []
+    for receipt, signed_txns in groups:
+        try:
+            receipt.tx_id = await aio.call(client.send_transactions(signed_txns))
+        except Exception as e:
+            receipt.error = e
+        receipts.append(receipt)
+    return receipts
+
+
+async def settle_groups(client: AlgodClient, receipts: List[Receipt]) -> AsyncIterator[Receipt]:
+    """Yield the receipts of `send_groups` as their groups confirm, the refused groups first.
+
+    Each receipt gets its `round`, or the `error` of its group, before it is yielded.
+    """
+    for receipt in receipts:
+        if receipt.tx_id is None:
+            yield receipt
+    for receipt in receipts:
+        if receipt.tx_id is None:
+            continue
+        try:
+            receipt.round = (await aio.wait_for_confirmation(client, receipt.tx_id)).confirmed_round
+        except Exception as e:
+            receipt.error = e
+        yield receipt
+
+
+async def stream_groups(client: AlgodClient, groups: Iterable[Tuple[Receipt, List]]) -> AsyncIterator[Receipt]:
+    """Send signed groups that do not depend on each other, then yield their receipts as they confirm.
+
+    Nothing waits before the last group is sent, so the groups land in the
+    same round as long as the node takes them. Each receipt gets its `tx_id`
+    and `round`, or the `error` of its group, before it is yielded. Groups the
+    node refused come first.
+    """
+    async for receipt in settle_groups(client, await send_groups(client, groups)):
+        yield receipt
+
+
+async def confirm_groups(client: AlgodClient, groups: Iterable[Tuple[Receipt, List]],
+                         on_settled: Optional[Callable[[Receipt], Any]] = None) -> Union[List[Receipt], PendingBatch]:
+    """The final wait of a bulk operation: send signed groups that do not depend on each other and settle them.
+
+    `on_settled(receipt)` runs for every group once it is confirmed or failed,
+    the refused ones first, and the receipts are returned. When the operation
+    was called with `wait=False`, the groups are handed to the confirmation
+    tracker and a `pending.PendingBatch` is returned once they are sent
+    instead, `on_settled` runs on the tracker thread.
+    """
+    groups = list(groups)
+    receipts = await send_groups(client, groups)
+    if not deferring():
+        async for receipt in settle_groups(client, receipts):
+            if on_settled is not None:
+                on_settled(receipt)
+        return receipts
+
+    def settled(receipt: Receipt, response: Optional[PendingTxnResponse] = None,
+                error: Optional[Exception] = None) -> None:
+        receipt.round, receipt.error = response and response.confirmed_round, error
+        if on_settled is not None:
+            on_settled(receipt)
+
+    handles = []
+    for receipt, signed_txns in groups:
+        if receipt.tx_id is None:
+            settled(receipt, error=receipt.error)
+            continue
+        handles.append(await defer(
+            client, signed_txns[0],
+            on_confirmed=lambda response, receipt=receipt: settled(receipt, response),
+            on_failed=lambda error, receipt=receipt: settled(receipt, error=error),
+        ))
+    return confirm_batch(client, handles)
+
+
+def submit_groups(client: AlgodClient, groups: Iterable[Tuple[Receipt, List]]) -> None:
+    """Send signed groups that do not depend on each other and wait for all of them, see `stream_groups`.
+
+    Blocking, for a regular `AlgodClient`.
+    """
+    for _ in iterate_blocking(stream_groups(client, groups)):
+        pass
+
+
+def failed(receipts: Iterable[Receipt]) -> List[Receipt]:
+    return [receipt for receipt in receipts if not receipt.ok]
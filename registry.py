@@ -0,0 +1,296 @@
+import json
+import os
+import socket
+import sqlite3
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+# status of a (owner, address, app_id) row, 1 matches the flag of rekeyed_addresses.json
+OPTED_OUT = 0
+OPTED_IN = 1
+# opted in and holding a listing (auction, bid, trade or swap) of the app
+OCCUPIED = 2
+# the account was closed back to its owner or rekeyed away, set on every row of the address
+CLOSED = 3
+
+# seconds a claimed slot stays reserved unless renewed or released
+LEASE_TTL = 120.0
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS rekeyed_addresses (
+    owner TEXT NOT NULL,
+    address TEXT NOT NULL,
+    app_id INTEGER NOT NULL DEFAULT 0,
+    status INTEGER NOT NULL DEFAULT 0,
+    created_at REAL NOT NULL,
+    PRIMARY KEY (owner, address, app_id)
+);
+CREATE INDEX IF NOT EXISTS rekeyed_addresses_by_status
+    ON rekeyed_addresses (owner, app_id, status, address);
+CREATE INDEX IF NOT EXISTS rekeyed_addresses_by_address
+    ON rekeyed_addresses (address, app_id);
+CREATE TABLE IF NOT EXISTS slot_leases (
+    address TEXT NOT NULL,
+    app_id INTEGER NOT NULL,
+    owner TEXT NOT NULL,
+    holder TEXT NOT NULL,
+    expires_at REAL NOT NULL,
+    PRIMARY KEY (address, app_id)
+);
+CREATE TABLE IF NOT EXISTS sync_checkpoints (
+    owner TEXT PRIMARY KEY,
+    round INTEGER NOT NULL
+);
+"""
+
+
+def default_holder() -> str:
+    """Identifies this process on this host, leases are exclusive between its threads anyway."""
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+class RekeyedAddressRegistry:
+    """SQLite registry of the addresses rekeyed to an owner.
+
+    Every row is one (owner, address, app_id) with its status, app_id 0 is used
+    when the app is unknown (addresses imported from rekeyed_addresses.json).
+    Lookups go through the primary key or the (owner, app_id, status) index and
+    writes touch a single row, so the cost no longer grows with the number of
+    slots. The connection is opened on first use, and the legacy JSON file is
+    imported when the database is created.
+
+    A slot is claimed before an operation uses it. `claim` atomically takes a
+    lease on (address, app_id) that no other thread or process can take until
+    it is released, or until it expires when its holder died. Occupied and
+    closed slots cannot be claimed.
+    """
+
+    def __init__(self, path: Optional[str] = None, legacy_json: str = "rekeyed_addresses.json") -> None:
+        self.path = path or os.environ.get("REKEYED_ADDRESSES_DB", "rekeyed_addresses.db")
+        self.legacy_json = legacy_json
+        self.lock = threading.RLock()
+        self.connection: Optional[sqlite3.Connection] = None
+
+    def connect(self) -> sqlite3.Connection:
+        with self.lock:
+            if self.connection is None:
+                is_new = self.path == ":memory:" or not os.path.exists(self.path)
+                connection = sqlite3.connect(self.path, timeout=30, check_same_thread=False, isolation_level=None)
+                # readers in other processes do not block the writer
+                connection.execute("PRAGMA journal_mode=WAL")
+                connection.executescript(SCHEMA)
+                self.connection = connection
+                if is_new and self.legacy_json and os.path.exists(self.legacy_json):
+                    self.import_json(self.legacy_json)
+            return self.connection
+
+    def execute(self, sql: str, parameters: Iterable = ()) -> List[Tuple]:
+        with self.lock:
+            return self.connect().execute(sql, tuple(parameters)).fetchall()
+
+    @contextmanager
+    def transaction(self) -> Iterator[sqlite3.Connection]:
+        """A write transaction, taking the database lock up front so concurrent writers queue."""
+        with self.lock:
+            connection = self.connect()
+            connection.execute("BEGIN IMMEDIATE")
+            try:
+                yield connection
+            except BaseException:
+                connection.execute("ROLLBACK")
+                raise
+            connection.execute("COMMIT")
+
+    def add(self, owner: str, address: str, app_id: int = 0, status: int = OPTED_OUT) -> None:
+        """Record an address, or update its status if it is already known for that app."""
+        self.execute(
+            "INSERT INTO rekeyed_addresses (owner, address, app_id, status, created_at) VALUES (?, ?, ?, ?, ?) "
+            "ON CONFLICT (owner, address, app_id) DO UPDATE SET status = excluded.status",
+            (owner, address, app_id, status, time.time()),
+        )
+
+    def set_status(self, owner: str, address: str, app_id: int, status: int) -> None:
+        self.add(owner, address, app_id, status)
+
+    def set_statuses(self, owner: str, app_id: int, statuses: Dict[str, int]) -> None:
+        """Record the status of many of an owner's addresses for an app in one transaction."""
+        now = time.time()
+        with self.transaction() as connection:
+            connection.executemany(
+                "INSERT INTO rekeyed_addresses (owner, address, app_id, status, created_at) VALUES (?, ?, ?, ?, ?) "
+                "ON CONFLICT (owner, address, app_id) DO UPDATE SET status = excluded.status",
+                [(owner, address, app_id, status, now) for address, status in statuses.items()],
+            )
+
+    def set_slot_status(self, address: str, app_id: int, status: int) -> None:
+        self.execute("UPDATE rekeyed_addresses SET status = ? WHERE address = ? AND app_id = ?", (status, address, app_id))
+
+    def claim(self, owner: str, address: str, app_id: int, ttl: float = LEASE_TTL, holder: Optional[str] = None) -> bool:
+        """Lease a slot for `ttl` seconds, False if it is occupied, closed or leased by someone else."""
+        holder = holder or default_holder()
+        now = time.time()
+        with self.transaction() as connection:
+            unusable = connection.execute(
+                # closing marks every row of the address, the slot may never have joined this app
+                "SELECT 1 FROM rekeyed_addresses WHERE address = ? AND (status = ? OR (app_id = ? AND status = ?))",
+                (address, CLOSED, app_id, OCCUPIED),
+            ).fetchone()
+            if unusable:
+                return False
+            connection.execute(
+                "DELETE FROM slot_leases WHERE address = ? AND app_id = ? AND expires_at <= ?", (address, app_id, now)
+            )
+            cursor = connection.execute(
+                "INSERT OR IGNORE INTO slot_leases (address, app_id, owner, holder, expires_at) VALUES (?, ?, ?, ?, ?)",
+                (address, app_id, owner, holder, now + ttl),
+            )
+            return cursor.rowcount == 1
+
+    def renew(self, address: str, app_id: int, ttl: float = LEASE_TTL, holder: Optional[str] = None) -> bool:
+        """Extend a lease we still hold."""
+        holder = holder or default_holder()
+        now = time.time()
+        with self.transaction() as connection:
+            cursor = connection.execute(
+                "UPDATE slot_leases SET expires_at = ? WHERE address = ? AND app_id = ? AND holder = ? AND expires_at > ?",
+                (now + ttl, address, app_id, holder, now),
+            )
+            return cursor.rowcount == 1
+
+    def release(self, address: str, app_id: int, holder: Optional[str] = None) -> None:
+        """Drop our lease on a slot, a lease taken over by someone else after expiry is left alone."""
+        self.execute(
+            "DELETE FROM slot_leases WHERE address = ? AND app_id = ? AND holder = ?",
+            (address, app_id, holder or default_holder()),
+        )
+
+    def leased(self, owner: str, app_id: int) -> List[str]:
+        """Addresses of an owner with a live lease for an app."""
+        rows = self.execute(
+            "SELECT address FROM slot_leases WHERE owner = ? AND app_id = ? AND expires_at > ?",
+            (owner, app_id, time.time()),
+        )
+        return [address for address, in rows]
+
+    def addresses(self, owner: str, app_id: Optional[int] = None, status: Optional[int] = None) -> List[str]:
+        """Addresses of an owner, oldest first, optionally filtered by app and status.
+
+        Closed addresses are left out unless asked for with `status=CLOSED`.
+        """
+        sql = "SELECT address, MIN(created_at) AS created FROM rekeyed_addresses WHERE owner = ?"
+        parameters: List = [owner]
+        if status is None:
+            sql += f" AND status != {CLOSED}"
+        if app_id is not None:
+            sql += " AND app_id = ?"
+            parameters.append(app_id)
+        if status is not None:
+            sql += " AND status = ?"
+            parameters.append(status)
+        sql += " GROUP BY address ORDER BY created, address"
+        return [address for address, _ in self.execute(sql, parameters)]
+
+    def memberships(self, owner: str) -> Dict[str, Dict[int, int]]:
+        """Status per app of every open address of an owner, oldest address first."""
+        rows = self.execute(
+            "SELECT address, app_id, status FROM rekeyed_addresses WHERE owner = ? AND status != ? "
+            "ORDER BY created_at, address",
+            (owner, CLOSED),
+        )
+        result: Dict[str, Dict[int, int]] = dict()
+        for address, app_id, status in rows:
+            result.setdefault(address, dict())[app_id] = status
+        return result
+
+    def mark_closed(self, addresses: Iterable[str]) -> None:
+        with self.transaction() as connection:
+            connection.executemany(
+                "UPDATE rekeyed_addresses SET status = ? WHERE address = ?", [(CLOSED, a) for a in addresses]
+            )
+
+    def is_closed(self, address: str) -> bool:
+        return bool(self.execute("SELECT 1 FROM rekeyed_addresses WHERE address = ? AND status = ? LIMIT 1",
+                                 (address, CLOSED)))
+
+    def checkpoint(self, owner: str) -> Optional[int]:
+        """Last round scanned by `rebuild` for an owner."""
+        rows = self.execute("SELECT round FROM sync_checkpoints WHERE owner = ?", (owner,))
+        return rows[0][0] if rows else None
+
+    def apply_chain(self, owners: Iterable[str], round_: int, rekeyed: Iterable[Tuple[str, str, float]],
+                    statuses: Iterable[Tuple[str, str, int, int, float]], closed: Iterable[str]) -> None:
+        """Record what `rebuild` read from blocks up to `round_` and move the owners' checkpoints, atomically.
+
+        `rekeyed` holds (owner, address, created_at) and `statuses` holds
+        (owner, address, app_id, status, created_at). An app's OCCUPIED status
+        is kept, the chain history only says the slot is opted in.
+        """
+        with self.transaction() as connection:
+            for owner, address, created_at in rekeyed:
+                connection.execute("UPDATE rekeyed_addresses SET status = ? WHERE address = ? AND status = ?",
+                                   (OPTED_OUT, address, CLOSED))
+                connection.execute(
+                    "INSERT OR IGNORE INTO rekeyed_addresses (owner, address, app_id, status, created_at) "
+                    "VALUES (?, ?, 0, ?, ?)",
+                    (owner, address, OPTED_OUT, created_at),
+                )
+            connection.executemany(
+                "INSERT INTO rekeyed_addresses (owner, address, app_id, status, created_at) VALUES (?, ?, ?, ?, ?) "
+                "ON CONFLICT (owner, address, app_id) DO UPDATE SET status = excluded.status "
+                f"WHERE excluded.status != {OPTED_IN} OR rekeyed_addresses.status != {OCCUPIED}",
+                list(statuses),
+            )
+            connection.executemany("UPDATE rekeyed_addresses SET status = ? WHERE address = ?",
+                                   [(CLOSED, address) for address in closed])
+            connection.executemany(
+                "INSERT INTO sync_checkpoints (owner, round) VALUES (?, ?) "
+                "ON CONFLICT (owner) DO UPDATE SET round = MAX(round, excluded.round)",
+                [(owner, round_) for owner in owners],
+            )
+
+    def status(self, owner: str, address: str, app_id: int = 0) -> Optional[int]:
+        rows = self.execute(
+            "SELECT status FROM rekeyed_addresses WHERE owner = ? AND address = ? AND app_id = ?",
+            (owner, address, app_id),
+        )
+        return rows[0][0] if rows else None
+
+    def owner(self, address: str) -> Optional[str]:
+        rows = self.execute("SELECT owner FROM rekeyed_addresses WHERE address = ? LIMIT 1", (address,))
+        return rows[0][0] if rows else None
+
+    def import_json(self, path: str) -> int:
+        """Import a rekeyed_addresses.json file ({owner: {address: opted_in}}) in one transaction."""
+        with open(path) as f:
+            legacy = json.load(f)
+        rows = [
+            (owner, address, 0, status, time.time())
+            for owner, addresses in legacy.items()
+            for address, status in addresses.items()
+        ]
+        with self.transaction() as connection:
+            connection.executemany(
+                "INSERT OR IGNORE INTO rekeyed_addresses (owner, address, app_id, status, created_at) "
+                "VALUES (?, ?, ?, ?, ?)",
+                rows,
+            )
+        return len(rows)
+
+    def close(self) -> None:
+        with self.lock:
+            if self.connection is not None:
+                self.connection.close()
+                self.connection = None
+
+
+rekeyed_registry = RekeyedAddressRegistry()
+
+
+# python -m registry import [rekeyed_addresses.json]
+if __name__ == "__main__":
+    if sys.argv[1:2] == ["import"]:
+        path = sys.argv[2] if len(sys.argv) > 2 else "rekeyed_addresses.json"
+        print(f"imported {rekeyed_registry.import_json(path)} addresses from {path} into {rekeyed_registry.path}")
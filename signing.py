@@ -0,0 +1,94 @@
+import base64
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Iterable, List, Optional, Tuple, Union
+
+from algosdk.future import transaction
+from nacl.signing import SigningKey
+
+from account import Account, bytes_to_sign
+
+# smaller batches are signed in the calling process, shipping them to workers costs more than it saves
+POOL_THRESHOLD = 256
+# most transactions a worker signs per task
+CHUNK_SIZE = 128
+
+pool: Optional[ProcessPoolExecutor] = None
+pool_workers = 0
+pool_lock = threading.Lock()
+
+# signing keys by seed, in the worker processes
+worker_keys: Dict[bytes, SigningKey] = dict()
+
+
+def sign_chunk(seed: bytes, txns: List[transaction.Transaction]) -> List[bytes]:
+    """Signatures of `txns`, run in a worker process."""
+    signing_key = worker_keys.get(seed)
+    if signing_key is None:
+        signing_key = worker_keys[seed] = SigningKey(seed)
+    return [signing_key.sign(bytes_to_sign(txn)).signature for txn in txns]
+
+
+def get_pool(workers: int) -> ProcessPoolExecutor:
+    """The shared process pool, restarted with `workers` processes when it has another size."""
+    global pool, pool_workers
+    with pool_lock:
+        if pool is None or pool_workers != workers:
+            if pool is not None:
+                pool.shutdown()
+            pool, pool_workers = ProcessPoolExecutor(max_workers=workers), workers
+        return pool
+
+
+def shutdown() -> None:
+    """Stop the worker processes, the next large batch starts them again."""
+    global pool, pool_workers
+    with pool_lock:
+        if pool is not None:
+            pool.shutdown()
+        pool, pool_workers = None, 0
+
+
+def sign_many(txns: Iterable[Tuple[transaction.Transaction, Union[Account, str]]],
+              workers: Optional[int] = None) -> List[transaction.SignedTransaction]:
+    """Sign `(txn, signer)` pairs, the signer being an `Account` or a private key, in order.
+
+    Each signing key is decoded once for the batch. Batches of `POOL_THRESHOLD`
+    transactions or more are split into chunks of one signer spread over a pool
+    of `workers` processes (one per CPU by default), `workers=1` signs in the
+    calling process. The signed transactions are the same as `txn.sign(key)`'s.
+    """
+    txns = list(txns)
+    accounts: Dict[str, Account] = dict()
+    signers = []
+    for _, signer in txns:
+        if not isinstance(signer, Account):
+            signer = accounts.get(signer) or accounts.setdefault(signer, Account(signer))
+        signers.append(signer)
+
+    workers = workers or os.cpu_count() or 1
+    if workers <= 1 or len(txns) < POOL_THRESHOLD:
+        return [signer.sign(txn) for (txn, _), signer in zip(txns, signers)]
+
+    by_signer: Dict[str, List[int]] = dict()
+    for i, signer in enumerate(signers):
+        by_signer.setdefault(signer.get_address(), []).append(i)
+    # enough chunks to keep every worker busy
+    size = max(1, min(CHUNK_SIZE, -(-len(txns) // workers)))
+    executor = get_pool(workers)
+    chunks = []
+    for indexes in by_signer.values():
+        seed = signers[indexes[0]].signing_key.encode()
+        for start in range(0, len(indexes), size):
+            chunk = indexes[start:start + size]
+            chunks.append((chunk, executor.submit(sign_chunk, seed, [txns[i][0] for i in chunk])))
+
+    signed: List[Optional[transaction.SignedTransaction]] = [None] * len(txns)
+    for chunk, future in chunks:
+        for i, signature in zip(chunk, future.result()):
+            txn, signer = txns[i][0], signers[i]
+            authorizing_address = signer.get_address() if txn.sender != signer.get_address() else None
+            signed[i] = transaction.SignedTransaction(txn, base64.b64encode(signature).decode(),
+                                                      authorizing_address)
+    return signed
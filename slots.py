@@ -0,0 +1,442 @@
+import threading
+from typing import Dict, List, Optional, Set, Tuple, Union
+
+from algosdk.v2client.algod import AlgodClient
+
+from account import Account
+from hooks import emit, subscribe, unsubscribe
+from registry import LEASE_TTL, OCCUPIED, OPTED_IN, rekeyed_registry
+from utils import (
+    generate_rekeyed_addresses,
+    get_app_local_state,
+    get_rekeyed_addresses,
+    is_opted_in_app,
+    optin_app_rekeyed_addresses,
+    set_rekeyed_address,
+)
+
+SlotKey = Tuple[str, int]
+
+
+class SlotIndex:
+    """Free and occupied rekeyed addresses (slots) per (owner, app_id).
+
+    An (owner, app_id) pair is loaded from the chain the first time a slot is
+    asked for, after that the operations keep it current: `take` hands out a
+    free slot and reserves it, confirmed setup/bid/trade/swap transactions
+    `occupy` it and confirmed cancel/accept/close transactions `release` it.
+    Finding a slot is then O(1) without any algod call.
+
+    Each pair also keeps the owner's slots that were never opted into the app,
+    they only need an opt-in to become usable.
+
+    The index is a per process hint, the registry decides: a slot is only
+    used once `rekeyed_registry.claim` leased it, and `occupy` and `release`
+    record the slot's status there too so other processes see it. The leases
+    this process claimed are renewed every `lease_ttl / 4` seconds until the
+    slot is occupied or released, however long its transaction takes to
+    confirm, and expire `lease_ttl` seconds after the process died.
+    """
+
+    def __init__(self) -> None:
+        self.lock = threading.RLock()
+        # dicts are used as insertion ordered sets, oldest slots are handed out first
+        self.free: Dict[SlotKey, Dict[str, None]] = dict()
+        self.unjoined: Dict[SlotKey, Dict[str, None]] = dict()
+        self.occupied: Dict[SlotKey, Set[str]] = dict()
+        self.owners: Dict[str, str] = dict()
+        # slots handed out straight from the free set, and those set up on the caller's path
+        self.hits: Dict[SlotKey, int] = dict()
+        self.misses: Dict[SlotKey, int] = dict()
+        # (address, app_id) leased by this process, kept alive by the renewer thread
+        self.leases: Set[Tuple[str, int]] = set()
+        self.lease_ttl = LEASE_TTL
+        # set to stop the renewer thread, None while there is none
+        self.renewer: Optional[threading.Event] = None
+
+    def is_loaded(self, owner: str, app_id: int) -> bool:
+        with self.lock:
+            return (owner, app_id) in self.free
+
+    def load(self, client: AlgodClient, owner: str, app_id: int, token_key: bytes) -> None:
+        """Classify the owner's slots for an app, a slot is free when `token_key` is 0."""
+        free: Dict[str, None] = dict()
+        unjoined: Dict[str, None] = dict()
+        occupied: Set[str] = set()
+        for address in get_rekeyed_addresses(owner):
+            if not is_opted_in_app(client, app_id, address):
+                unjoined[address] = None
+            elif get_app_local_state(client, app_id, address).get(token_key, 0) == 0:
+                free[address] = None
+            else:
+                occupied.add(address)
+
+        statuses = {address: OPTED_IN for address in free}
+        statuses.update((address, OCCUPIED) for address in occupied)
+        rekeyed_registry.set_statuses(owner, app_id, statuses)
+
+        with self.lock:
+            key = (owner, app_id)
+            if key in self.free:
+                return
+            self.free[key] = free
+            self.unjoined[key] = unjoined
+            self.occupied[key] = occupied
+            for address in (*free, *unjoined, *occupied):
+                self.owners[address] = owner
+
+    def take(self, owner: str, app_id: int) -> Optional[str]:
+        """Reserve a free slot, None when there is none."""
+        with self.lock:
+            free = self.free.get((owner, app_id))
+            if not free:
+                return None
+            address = next(iter(free))
+            del free[address]
+            self.occupied[(owner, app_id)].add(address)
+            return address
+
+    def take_unjoined(self, owner: str, app_id: int) -> Optional[str]:
+        """Reserve a slot that still has to opt into the app, None when there is none."""
+        with self.lock:
+            unjoined = self.unjoined.get((owner, app_id))
+            if not unjoined:
+                return None
+            address = next(iter(unjoined))
+            del unjoined[address]
+            self.occupied[(owner, app_id)].add(address)
+            return address
+
+    def put_back(self, owner: str, app_id: int, addresses: List[str], joined: bool = True) -> None:
+        """Return slots taken but not claimed, another worker leases them, to the free or unjoined set."""
+        with self.lock:
+            key = (owner, app_id)
+            if key not in self.free:
+                return
+            for address in addresses:
+                self.occupied[key].discard(address)
+                (self.free if joined else self.unjoined)[key][address] = None
+
+    def add(self, owner: str, app_id: int, address: str, free: bool = False) -> None:
+        """Record a new slot for `app_id`, reserved unless `free`, and joinable by the owner's other apps."""
+        with self.lock:
+            self.owners[address] = owner
+            for key in self.free:
+                if key[0] == owner and key[1] != app_id:
+                    self.unjoined[key][address] = None
+            self._occupy(owner, app_id, address)
+            if free:
+                self._release(app_id, address)
+
+    def occupy(self, owner: str, app_id: int, address: str) -> None:
+        """A transaction putting a listing in the slot confirmed."""
+        self._occupy(owner, app_id, address)
+        rekeyed_registry.set_slot_status(address, app_id, OCCUPIED)
+        self.unlease(address, app_id)
+
+    def release(self, app_id: int, address: str) -> None:
+        """The slot's listing was cancelled, accepted or closed, or the operation using it failed."""
+        self._release(app_id, address)
+        rekeyed_registry.set_slot_status(address, app_id, OPTED_IN)
+        self.unlease(address, app_id)
+
+    def lease(self, owner: str, address: str, app_id: int) -> bool:
+        """Claim the slot in the registry and keep the lease alive until it is occupied or released."""
+        if not rekeyed_registry.claim(owner, address, app_id, ttl=self.lease_ttl):
+            return False
+        with self.lock:
+            self.leases.add((address, app_id))
+            if self.renewer is None:
+                self.renewer = threading.Event()
+                threading.Thread(target=self._renew, args=(self.renewer,), daemon=True).start()
+        return True
+
+    def unlease(self, address: str, app_id: int) -> None:
+        with self.lock:
+            self.leases.discard((address, app_id))
+        rekeyed_registry.release(address, app_id)
+
+    def _renew(self, stopped: threading.Event) -> None:
+        while not stopped.wait(self.lease_ttl / 4):
+            with self.lock:
+                leases = list(self.leases)
+                if not leases:
+                    if self.renewer is stopped:
+                        self.renewer = None
+                    return
+            for address, app_id in leases:
+                try:
+                    renewed = rekeyed_registry.renew(address, app_id, ttl=self.lease_ttl)
+                except Exception as e:
+                    # the registry may be busy, the lease outlives a few missed renewals
+                    emit("slot_lease_error", address=address, app_id=app_id, error=e)
+                    continue
+                if not renewed:
+                    with self.lock:
+                        self.leases.discard((address, app_id))
+                    emit("slot_lease_lost", address=address, app_id=app_id)
+
+    def _occupy(self, owner: str, app_id: int, address: str) -> None:
+        with self.lock:
+            key = (owner, app_id)
+            if key not in self.free:
+                return
+            self.free[key].pop(address, None)
+            self.unjoined[key].pop(address, None)
+            self.occupied[key].add(address)
+            self.owners[address] = owner
+
+    def _release(self, app_id: int, address: str) -> None:
+        # slots of pairs that were never loaded are ignored
+        with self.lock:
+            owner = self.owners.get(address)
+            key = (owner, app_id)
+            if owner is None or key not in self.free:
+                return
+            self.occupied[key].discard(address)
+            self.unjoined[key].pop(address, None)
+            self.free[key][address] = None
+
+    def discard(self, address: str) -> None:
+        """Remove a closed slot from every pair."""
+        with self.lock:
+            owner = self.owners.pop(address, None)
+            for key in self.free:
+                if key[0] == owner:
+                    self.free[key].pop(address, None)
+                    self.unjoined[key].pop(address, None)
+                    self.occupied[key].discard(address)
+
+    def forget(self, owner: str, app_id: Optional[int] = None) -> None:
+        """Drop what is known about an owner, it is loaded from the chain again on next use."""
+        with self.lock:
+            for key in [key for key in self.free if key[0] == owner and app_id in (None, key[1])]:
+                del self.free[key], self.unjoined[key], self.occupied[key]
+
+    def counts(self, owner: str, app_id: int) -> Dict[str, int]:
+        with self.lock:
+            key = (owner, app_id)
+            return {
+                "free": len(self.free.get(key, ())),
+                "unjoined": len(self.unjoined.get(key, ())),
+                "occupied": len(self.occupied.get(key, ())),
+                "hits": self.hits.get(key, 0),
+                "misses": self.misses.get(key, 0),
+            }
+
+    def clear(self) -> None:
+        with self.lock:
+            self.free.clear()
+            self.unjoined.clear()
+            self.occupied.clear()
+            self.owners.clear()
+            self.hits.clear()
+            self.misses.clear()
+            self.leases.clear()
+            if self.renewer is not None:
+                self.renewer.set()
+                self.renewer = None
+
+
+slot_index = SlotIndex()
+
+
+def claim_slot(owner: str, app_id: int, joined: bool) -> Optional[str]:
+    """Take a free (or unjoined) slot from the index and lease it, None when none could be claimed.
+
+    Slots leased by another worker go back to their set, they are usable
+    here again once it releases them. Closed slots are dropped.
+    """
+    take = slot_index.take if joined else slot_index.take_unjoined
+    refused = []
+    slot = take(owner, app_id)
+    while slot is not None and not slot_index.lease(owner, slot, app_id):
+        if rekeyed_registry.is_closed(slot):
+            # swept by another process since this index was loaded
+            slot_index.discard(slot)
+        else:
+            refused.append(slot)
+        slot = take(owner, app_id)
+    slot_index.put_back(owner, app_id, refused, joined)
+    return slot
+
+
+def take_free_slot(client: AlgodClient, owner: Account, app_id: int, token_key: bytes, optin_price: int) -> str:
+    """Claim a slot of `owner` for `app_id`, opting in or creating one if needed.
+
+    The slot stays leased in the registry, the lease being renewed, until the
+    operation using it calls `slot_index.occupy` once confirmed, or
+    `slot_index.release` on failure. A worker that dies in between loses the
+    lease when it expires.
+    """
+    address = owner.get_address()
+    if not slot_index.is_loaded(address, app_id):
+        slot_index.load(client, address, app_id, token_key)
+
+    slot = claim_free_slot(address, app_id)
+    if slot is not None:
+        return slot
+    return set_up_slot(client, owner, app_id, optin_price)
+
+
+def claim_free_slot(owner: str, app_id: int) -> Optional[str]:
+    """Claim a free slot of a loaded owner without any algod call, None when it has to be set up (a miss)."""
+    slot = claim_slot(owner, app_id, joined=True)
+    hit = slot is not None
+    with slot_index.lock:
+        counter = slot_index.hits if hit else slot_index.misses
+        counter[(owner, app_id)] = counter.get((owner, app_id), 0) + 1
+    emit("slot_taken", owner=owner, app_id=app_id, hit=hit)
+    return slot
+
+
+def set_up_slot(client: AlgodClient, owner: Account, app_id: int, optin_price: int) -> str:
+    """Claim a slot of `owner` that still has to opt into `app_id` and opt it in, or create a new one."""
+    address = owner.get_address()
+    slot = None
+    try:
+        slot = claim_slot(address, app_id, joined=False)
+        if slot is not None:
+            # might have rekeyed address already but not optin app, we can use it
+            optin_app_rekeyed_addresses(client, app_id, owner, [slot], optin_price)
+            set_rekeyed_address(address, slot, 1, app_id)
+        else:
+            slot, = generate_rekeyed_addresses(client, owner, app_id, optin_price, 1)
+            slot_index.add(address, app_id, slot)
+            slot_index.lease(address, slot, app_id)
+    except Exception:
+        # the slot may be half set up, read it back from the chain next time
+        slot_index.forget(address, app_id)
+        if slot is not None:
+            slot_index.unlease(slot, app_id)
+        raise
+    return slot
+
+
+def take_free_slots(
+    client: AlgodClient, owner: Account, app_id: int, token_key: bytes, optin_price: int, count: int
+) -> List[Union[str, Exception]]:
+    """Claim `count` slots at once, the missing free slots are provisioned in a single round first.
+
+    Returns a slot, or the exception that prevented getting one, per requested slot.
+    """
+    address = owner.get_address()
+    if not slot_index.is_loaded(address, app_id):
+        slot_index.load(client, address, app_id, token_key)
+    missing = count - slot_index.counts(address, app_id)["free"]
+    if missing > 0:
+        try:
+            provision_slots(client, owner, app_id, optin_price, missing)
+        except Exception:
+            # take_free_slot sets up the missing slots one by one below
+            pass
+
+    slots: List[Union[str, Exception]] = []
+    for _ in range(count):
+        try:
+            slots.append(take_free_slot(client, owner, app_id, token_key, optin_price))
+        except Exception as e:
+            slots.append(e)
+    return slots
+
+
+def provision_slots(client: AlgodClient, owner: Account, app_id: int, optin_price: int, count: int) -> List[str]:
+    """Create slots opted into `app_id`, in a single round, and add them to the owner's free slots."""
+    slots = generate_rekeyed_addresses(client, owner, app_id, optin_price, count)
+    for slot in slots:
+        slot_index.add(owner.get_address(), app_id, slot, free=True)
+    return slots
+
+
+class SlotPool:
+    """Keeps free slots ready in the background so listings skip slot setup.
+
+    For every watched (owner, app_id) a thread tops the free slots up to
+    `high` as soon as they drop below `low`, all missing slots confirming in
+    a single round. A slot taken while the pool is
+    empty counts as a miss in `slot_index` and wakes the thread right away.
+    """
+
+    def __init__(self, client: AlgodClient, low: int = 2, high: int = 8, interval: float = 10) -> None:
+        assert 0 <= low <= high
+        self.client = client
+        self.low = low
+        self.high = high
+        self.interval = interval
+        self.lock = threading.Lock()
+        self.watched: Dict[SlotKey, Tuple[Account, bytes, int]] = dict()
+        self.provisioned: Dict[SlotKey, int] = dict()
+        self.errors: Dict[SlotKey, int] = dict()
+        self.wakeup = threading.Event()
+        self.stopped = threading.Event()
+        self.thread: Optional[threading.Thread] = None
+
+    def watch(self, owner: Account, app_id: int, token_key: bytes, optin_price: int) -> None:
+        """Keep slots of `owner` ready for an app, e.g. with trading.operations.SLOT_TOKEN_KEY and SLOT_OPTIN_PRICE."""
+        with self.lock:
+            self.watched[(owner.get_address(), app_id)] = (owner, token_key, optin_price)
+        self.wakeup.set()
+
+    def unwatch(self, owner: str, app_id: int) -> None:
+        with self.lock:
+            self.watched.pop((owner, app_id), None)
+
+    def start(self) -> "SlotPool":
+        if self.thread is None:
+            self.stopped.clear()
+            subscribe(self.on_event)
+            self.thread = threading.Thread(target=self._run, daemon=True)
+            self.thread.start()
+        return self
+
+    def stop(self) -> None:
+        unsubscribe(self.on_event)
+        self.stopped.set()
+        self.wakeup.set()
+        self.thread = None
+
+    def on_event(self, event: str, fields: Dict) -> None:
+        if event == "slot_taken" and (fields["owner"], fields["app_id"]) in self.watched:
+            self.wakeup.set()
+
+    def fill(self, key: SlotKey) -> int:
+        """Top up the free slots of a watched pair, returns how many were created."""
+        with self.lock:
+            owner, token_key, optin_price = self.watched[key]
+        if not slot_index.is_loaded(*key):
+            slot_index.load(self.client, key[0], key[1], token_key)
+        if slot_index.counts(*key)["free"] >= self.low:
+            return 0
+
+        missing = self.high - slot_index.counts(*key)["free"]
+        created = len(provision_slots(self.client, owner, key[1], optin_price, missing))
+        with self.lock:
+            self.provisioned[key] = self.provisioned.get(key, 0) + created
+        return created
+
+    def _run(self) -> None:
+        while not self.stopped.is_set():
+            self.wakeup.clear()
+            with self.lock:
+                keys = list(self.watched)
+            for key in keys:
+                try:
+                    self.fill(key)
+                except Exception as e:
+                    with self.lock:
+                        self.errors[key] = self.errors.get(key, 0) + 1
+                    emit("slot_pool_error", owner=key[0], app_id=key[1], error=e)
+            self.wakeup.wait(self.interval)
+
+    def stats(self) -> Dict[SlotKey, Dict[str, int]]:
+        """Free/occupied counts, hits, misses, provisioned slots and errors per watched pair."""
+        with self.lock:
+            keys = list(self.watched)
+            return {
+                key: {
+                    **slot_index.counts(*key),
+                    "provisioned": self.provisioned.get(key, 0),
+                    "errors": self.errors.get(key, 0),
+                }
+                for key in keys
+            }
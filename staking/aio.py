@@ -0,0 +1,10 @@
+from . import operations
+
+
+create_staking_app = operations.create_staking_app.aio
+setup_app = operations.setup_app.aio
+set_timelock = operations.set_timelock.aio
+stake_token = operations.stake_token.aio
+withdraw_token = operations.withdraw_token.aio
+claim_rewards = operations.claim_rewards.aio
+delete_staking_app = operations.delete_staking_app.aio
@@ -3,10 +3,17 @@ from typing import Tuple
 from algosdk.future import transaction
 from algosdk.v2client.algod import AlgodClient
 
-from utils import fully_compile_contract, get_app_address, get_app_global_state, wait_for_confirmation
+from artifacts import prebuilt_contracts
+import aio
+from utils import fully_compile_contract, get_app_address
 from account import Account
+from hooks import emit, operation
+from pending import confirm
 from time import time
-from .contracts import approval_program, clear_state_program
+
+
+GLOBAL_SCHEMA = transaction.StateSchema(num_uints=5, num_byte_slices=0)
+LOCAL_SCHEMA = transaction.StateSchema(num_uints=4, num_byte_slices=0)
 
 
 def get_contracts(client: AlgodClient) -> Tuple[bytes, bytes]:
@@ -19,38 +26,41 @@ def get_contracts(client: AlgodClient) -> Tuple[bytes, bytes]:
         A tuple of 2 byte strings. The first is the approval program, and the
         second is the clear state program.
     """
-    approval = fully_compile_contract(client, approval_program())
-    clear_state = fully_compile_contract(client, clear_state_program())
+    contracts = prebuilt_contracts("staking")
+    if contracts is not None:
+        return contracts
+
+    from .contracts import approval_program, clear_state_program
+
+    approval = fully_compile_contract(client, approval_program)
+    clear_state = fully_compile_contract(client, clear_state_program)
 
     return approval, clear_state
 
 
-def create_staking_app(client: AlgodClient, creator: Account, token_id: int, token_app_id: int) -> int:
-    approval, clear = get_contracts(client)
-    
-    global_schema = transaction.StateSchema(num_uints=5, num_byte_slices=0)
-    local_schema = transaction.StateSchema(num_uints=4, num_byte_slices=0)
+@operation
+async def create_staking_app(client: AlgodClient, creator: Account, token_id: int, token_app_id: int) -> int:
+    approval, clear = await aio.offload(get_contracts, client)
     
     txn = transaction.ApplicationCreateTxn(
         sender=creator.get_address(),
         on_complete=transaction.OnComplete.NoOpOC,
         approval_program=approval,
         clear_program=clear,
-        global_schema=global_schema,
-        local_schema=local_schema,
+        global_schema=GLOBAL_SCHEMA,
+        local_schema=LOCAL_SCHEMA,
         foreign_assets=[token_id],
         foreign_apps=[token_app_id],
-        sp=client.suggested_params()
+        sp=await aio.get_suggested_params(client)
     )
     
-    signed_txn = txn.sign(creator.get_private_key())
-    client.send_transaction(signed_txn)
+    signed_txn = creator.sign(txn)
+    await aio.call(client.send_transaction(signed_txn))
     
-    response = wait_for_confirmation(client, signed_txn.get_txid())
+    response = await aio.wait_for_confirmation(client, signed_txn.get_txid())
     assert response.application_index is not None and response.application_index > 0
     app_id = response.application_index
-    print(f"App ID: {app_id}")
-    print(f"App address: {get_app_address(app_id)}")
+    emit("app_created", app_id=app_id, address=get_app_address(app_id))
     
     funding_amount = (
         # account min balance
@@ -62,55 +72,58 @@ def create_staking_app(client: AlgodClient, creator: Account, token_id: int, tok
     )
     txn = transaction.PaymentTxn(
         sender=creator.get_address(),
-        sp=client.suggested_params(),
+        sp=await aio.get_suggested_params(client),
         receiver=get_app_address(app_id),
         amt=funding_amount,  # min balance of the application
     )
     
-    signed_txn = txn.sign(creator.get_private_key())
-    client.send_transaction(signed_txn)
+    signed_txn = creator.sign(txn)
+    await aio.call(client.send_transaction(signed_txn))
     
-    wait_for_confirmation(client, signed_txn.get_txid())
+    await confirm(client, signed_txn)
     return app_id
 
 
-def setup_app(client: AlgodClient, app_id: int, creator: Account):
-    globalState = get_app_global_state(client, app_id)
+@operation
+async def setup_app(client: AlgodClient, app_id: int, creator: Account):
+    globalState = await aio.get_app_global_state(client, app_id)
     token_id = globalState[b"TK_ID"]
     
     txn = transaction.ApplicationCallTxn(
         sender=creator.get_address(),
-        sp=client.suggested_params(),
+        sp=await aio.get_suggested_params(client),
         index=app_id,
         app_args=[b"setup"],
         foreign_assets=[token_id],
         on_complete=transaction.OnComplete.NoOpOC,
     )
     
-    signed_txn = txn.sign(creator.get_private_key())
-    client.send_transaction(signed_txn)
+    signed_txn = creator.sign(txn)
+    await aio.call(client.send_transaction(signed_txn))
     
-    wait_for_confirmation(client, signed_txn.get_txid())
+    await confirm(client, signed_txn)
 
 
-def set_timelock(client: AlgodClient, app_id: int, creator: Account):
+@operation
+async def set_timelock(client: AlgodClient, app_id: int, creator: Account):
     txn = transaction.ApplicationCallTxn(
         sender=creator.get_address(),
-        sp=client.suggested_params(),
+        sp=await aio.get_suggested_params(client),
         index=app_id,
         app_args=[b"set_timelock", int(time()).to_bytes(8, "big")],
         on_complete=transaction.OnComplete.NoOpOC,
     )
     
-    signed_txn = txn.sign(creator.get_private_key())
-    client.send_transaction(signed_txn)
+    signed_txn = creator.sign(txn)
+    await aio.call(client.send_transaction(signed_txn))
     
-    wait_for_confirmation(client, signed_txn.get_txid())
+    await confirm(client, signed_txn)
 
 
-def stake_token(client: AlgodClient, app_id: int, sender: Account, amount: int):
-    globalState = get_app_global_state(client, app_id)
-    sp = client.suggested_params()
+@operation
+async def stake_token(client: AlgodClient, app_id: int, sender: Account, amount: int):
+    globalState = await aio.get_app_global_state(client, app_id)
+    sp = await aio.get_suggested_params(client)
     
     sp.fee = 3 * 1_000
     transfer_call_txn = transaction.ApplicationCallTxn(
@@ -136,16 +149,17 @@ def stake_token(client: AlgodClient, app_id: int, sender: Account, amount: int):
     )
     transaction.assign_group_id([transfer_call_txn, call_txn])
     
-    signed_transfer_call_txn = transfer_call_txn.sign(sender.get_private_key())
-    signed_call_txn = call_txn.sign(sender.get_private_key())
-    tx_id = client.send_transactions([signed_transfer_call_txn, signed_call_txn])
+    signed_transfer_call_txn = sender.sign(transfer_call_txn)
+    signed_call_txn = sender.sign(call_txn)
+    await aio.call(client.send_transactions([signed_transfer_call_txn, signed_call_txn]))
     
-    wait_for_confirmation(client, tx_id)
+    await confirm(client, transfer_call_txn)
 
 
-def withdraw_token(client: AlgodClient, app_id: int, sender: Account, amount: int):
-    sp = client.suggested_params()
-    globalState = get_app_global_state(client, app_id)
+@operation
+async def withdraw_token(client: AlgodClient, app_id: int, sender: Account, amount: int):
+    sp = await aio.get_suggested_params(client)
+    globalState = await aio.get_app_global_state(client, app_id)
     token_id = globalState[b"TK_ID"]
     
     sp.fee = 3 * 1_000
@@ -174,20 +188,21 @@ def withdraw_token(client: AlgodClient, app_id: int, sender: Account, amount: in
     
     transaction.assign_group_id([transfer_call_txn, call_txn])
     
-    signed_transfer_call_txn = transfer_call_txn.sign(sender.get_private_key())
-    signed_call_txn = call_txn.sign(sender.get_private_key())
-    tx_id = client.send_transactions([signed_transfer_call_txn, signed_call_txn])
+    signed_transfer_call_txn = sender.sign(transfer_call_txn)
+    signed_call_txn = sender.sign(call_txn)
+    await aio.call(client.send_transactions([signed_transfer_call_txn, signed_call_txn]))
     
-    wait_for_confirmation(client, tx_id)
+    await confirm(client, transfer_call_txn)
         
 
-def claim_rewards(client: AlgodClient, app_id: int, sender: Account):
-    globalState = get_app_global_state(client, app_id)
+@operation
+async def claim_rewards(client: AlgodClient, app_id: int, sender: Account):
+    globalState = await aio.get_app_global_state(client, app_id)
     token_id = globalState[b"TK_ID"]
     
     call_txn = transaction.ApplicationCallTxn(
         sender=sender.get_address(),
-        sp=client.suggested_params(),
+        sp=await aio.get_suggested_params(client),
         index=app_id,
         on_complete=transaction.OnComplete.NoOpOC,
         app_args=[
@@ -196,19 +211,20 @@ def claim_rewards(client: AlgodClient, app_id: int, sender: Account):
         foreign_assets=[token_id]
     )
     
-    signed_call_txn = call_txn.sign(sender.get_private_key())
-    tx_id = client.send_transaction(signed_call_txn)
+    signed_call_txn = sender.sign(call_txn)
+    await aio.call(client.send_transaction(signed_call_txn))
     
-    wait_for_confirmation(client, tx_id)
+    await confirm(client, call_txn)
     
     
-def delete_staking_app(client: AlgodClient, app_id: int, closer: Account):
+@operation
+async def delete_staking_app(client: AlgodClient, app_id: int, closer: Account):
     delete_txn = transaction.ApplicationDeleteTxn(
         sender=closer.get_address(),
         index=app_id,
-        sp=client.suggested_params(),
+        sp=await aio.get_suggested_params(client),
     )
-    signed_delete_txn = delete_txn.sign(closer.get_private_key())
-    client.send_transaction(signed_delete_txn)
+    signed_delete_txn = closer.sign(delete_txn)
+    await aio.call(client.send_transaction(signed_delete_txn))
 
-    wait_for_confirmation(client, signed_delete_txn.get_txid())
+    await confirm(client, signed_delete_txn)
@@ -0,0 +1,5 @@
+from . import operations
+
+
+create_store_app = operations.create_store_app.aio
+set_up = operations.set_up.aio
@@ -1,14 +1,17 @@
-from dis import dis
 from typing import Tuple
 from algosdk.future import transaction
 from algosdk.v2client.algod import AlgodClient
-from prometheus_client import Enum
-from pyteal.ast import txn
 
-from .contracts import approval_program, clear_state_program
-
-from utils import fully_compile_contract, get_app_address, wait_for_confirmation
+from artifacts import prebuilt_contracts
+import aio
+from utils import fully_compile_contract, get_app_address
 from account import Account
+from hooks import emit, operation
+from pending import confirm
+
+GLOBAL_SCHEMA = transaction.StateSchema(num_uints=6, num_byte_slices=0)
+LOCAL_SCHEMA = transaction.StateSchema(num_uints=2, num_byte_slices=0)
+
 
 def get_contracts(client: AlgodClient) -> Tuple[bytes, bytes]:
     """Get the compiled TEAL contracts for the bidding.
@@ -20,59 +23,63 @@ def get_contracts(client: AlgodClient) -> Tuple[bytes, bytes]:
         A tuple of 2 byte strings. The first is the approval program, and the
         second is the clear state program.
     """
-    approval = fully_compile_contract(client, approval_program())
-    clear_state = fully_compile_contract(client, clear_state_program())
+    contracts = prebuilt_contracts("store")
+    if contracts is not None:
+        return contracts
+
+    from .contracts import approval_program, clear_state_program
+
+    approval = fully_compile_contract(client, approval_program)
+    clear_state = fully_compile_contract(client, clear_state_program)
 
     return approval, clear_state
 
 
-def create_store_app(client: AlgodClient, creator: Account) -> int:
-    approval, clear = get_contracts(client=client)
-    
-    global_schema = transaction.StateSchema(num_uints=6, num_byte_slices=0)
-    local_schema = transaction.StateSchema(num_uints=2, num_byte_slices=0)
+@operation
+async def create_store_app(client: AlgodClient, creator: Account) -> int:
+    approval, clear = await aio.offload(get_contracts, client)
     
     txn = transaction.ApplicationCreateTxn(
         sender=creator.get_address(),
         on_complete=transaction.OnComplete.NoOpOC,
         approval_program=approval,
         clear_program=clear,
-        global_schema=global_schema,
-        local_schema=local_schema,
-        sp=client.suggested_params()
+        global_schema=GLOBAL_SCHEMA,
+        local_schema=LOCAL_SCHEMA,
+        sp=await aio.get_suggested_params(client)
     )
     
-    signed_txn = txn.sign(creator.get_private_key())
-    client.send_transaction(signed_txn)        
-    response = wait_for_confirmation(client, signed_txn.get_txid())
+    signed_txn = creator.sign(txn)
+    await aio.call(client.send_transaction(signed_txn))        
+    response = await aio.wait_for_confirmation(client, signed_txn.get_txid())
     assert response.application_index is not None and response.application_index > 0
     app_id = response.application_index
-    print(f"Store App ID: {app_id}")
-    print(f"Store App address: {get_app_address(app_id)}")
+    emit("app_created", app_id=app_id, address=get_app_address(app_id))
     
     txn = transaction.PaymentTxn(
         sender=creator.get_address(),
-        sp=client.suggested_params(),
+        sp=await aio.get_suggested_params(client),
         receiver=get_app_address(app_id),
         amt=201_000,  # min balance of the application
     )
     
-    signed_txn = txn.sign(creator.get_private_key())
-    client.send_transaction(signed_txn)
-    wait_for_confirmation(client, signed_txn.get_txid())
+    signed_txn = creator.sign(txn)
+    await aio.call(client.send_transaction(signed_txn))
+    await confirm(client, signed_txn)
 
     return app_id
 
 
-def set_up(client: AlgodClient, creator: Account, app_id: int, trade_app_id: int, bid_app_id: int, auction_app_id: int, distribution_app_id: int):
+@operation
+async def set_up(client: AlgodClient, creator: Account, app_id: int, trade_app_id: int, bid_app_id: int, auction_app_id: int, distribution_app_id: int):
     call_txn = transaction.ApplicationCallTxn(
         sender=creator.get_address(),
-        sp=client.suggested_params(),
+        sp=await aio.get_suggested_params(client),
         index=app_id,
         on_complete=transaction.OnComplete.NoOpOC,
         foreign_apps=[trade_app_id, bid_app_id, auction_app_id, distribution_app_id],
         app_args=[b"setup"],
     )
-    signed_txn = call_txn.sign(creator.get_private_key())
-    tx_id = client.send_transaction(signed_txn)
-    wait_for_confirmation(client, tx_id)
\ No newline at end of file
+    signed_txn = creator.sign(call_txn)
+    await aio.call(client.send_transaction(signed_txn))
+    await confirm(client, call_txn)
\ No newline at end of file
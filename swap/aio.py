@@ -0,0 +1,9 @@
+from . import operations
+
+
+create_swap_app = operations.create_swap_app.aio
+setup_swap_app = operations.setup_swap_app.aio
+place_swap = operations.place_swap.aio
+cancel_swap = operations.cancel_swap.aio
+accept_swap = operations.accept_swap.aio
+close_swap = operations.close_swap.aio
@@ -9,9 +9,22 @@ from algosdk.logic import get_application_address
 from algosdk.v2client.algod import AlgodClient
 from nacl import utils
 
+import aio
 from account import Account
+from artifacts import prebuilt_contracts
+from hooks import emit, operation
+from pending import confirm
+from slots import slot_index
 from utils import *
-from .contracts import approval_program, clear_state_program
+
+
+GLOBAL_SCHEMA = transaction.StateSchema(num_uints=0, num_byte_slices=2)
+LOCAL_SCHEMA = transaction.StateSchema(num_uints=4, num_byte_slices=1)
+
+# a slot (rekeyed address) is free while its local O_TKID is 0
+SLOT_TOKEN_KEY = b"O_TKID"
+# min balance the slot needs to opt into the app
+SLOT_OPTIN_PRICE = 100000 + 28500 * 4 + 50000 * 1 + 1000
 
 
 def get_contracts(client: AlgodClient) -> Tuple[bytes, bytes]:
@@ -24,13 +37,20 @@ def get_contracts(client: AlgodClient) -> Tuple[bytes, bytes]:
         A tuple of 2 byte strings. The first is the approval program, and the
         second is the clear state program.
     """
-    approval = fully_compile_contract(client, approval_program())
-    clear_state = fully_compile_contract(client, clear_state_program())
+    contracts = prebuilt_contracts("swap")
+    if contracts is not None:
+        return contracts
+
+    from .contracts import approval_program, clear_state_program
+
+    approval = fully_compile_contract(client, approval_program)
+    clear_state = fully_compile_contract(client, clear_state_program)
 
     return approval, clear_state
 
 
-def create_swap_app(
+@operation
+async def create_swap_app(
     client: AlgodClient,
     creator: Account,
     staking_address: str,
@@ -52,27 +72,24 @@ def create_swap_app(
     Returns:
         The ID of the newly created swap app.
     """
-    approval, clear = get_contracts(client)
+    approval, clear = await aio.offload(get_contracts, client)
 
-    global_schema = transaction.StateSchema(num_uints=0, num_byte_slices=2)
-    local_schema = transaction.StateSchema(num_uints=4, num_byte_slices=1)
-    
-    sp = client.suggested_params()
+    sp = await aio.get_suggested_params(client)
 
     txn = transaction.ApplicationCreateTxn(
         sender=creator.get_address(),
         on_complete=transaction.OnComplete.NoOpOC,
         approval_program=approval,
         clear_program=clear,
-        global_schema=global_schema,
-        local_schema=local_schema,
+        global_schema=GLOBAL_SCHEMA,
+        local_schema=LOCAL_SCHEMA,
         app_args=[],
         accounts=[staking_address, team_wallet_address],
         sp=sp,
     )
-    signed_txn = txn.sign(creator.get_private_key())
-    client.send_transaction(signed_txn)
-    response = wait_for_confirmation(client, signed_txn.get_txid())
+    signed_txn = creator.sign(txn)
+    await aio.call(client.send_transaction(signed_txn))
+    response = await aio.wait_for_confirmation(client, signed_txn.get_txid())
     assert response.application_index is not None and response.application_index > 0
     
     app_id = response.application_index
@@ -87,14 +104,15 @@ def create_swap_app(
         amt=initial_funding_amount,
         sp=sp,
     )
-    signed_initial_fund_app_txn = initial_fund_app_txn.sign(creator.get_private_key())
-    client.send_transaction(signed_initial_fund_app_txn)
-    wait_for_confirmation(client, initial_fund_app_txn.get_txid())
+    signed_initial_fund_app_txn = creator.sign(initial_fund_app_txn)
+    await aio.call(client.send_transaction(signed_initial_fund_app_txn))
+    await confirm(client, initial_fund_app_txn)
     
     return app_id
 
 
-def setup_swap_app(
+@operation
+async def setup_swap_app(
     client: AlgodClient,
     app_id: int,
     funder: Account,
@@ -116,7 +134,7 @@ def setup_swap_app(
         token_id: The NFT ID.
     """
     app_address = get_application_address(app_id)
-    params = client.suggested_params()
+    params = await aio.get_suggested_params(client)
 
     funding_amount = (
         # min optin asset balance
@@ -143,14 +161,15 @@ def setup_swap_app(
 
     transaction.assign_group_id([fund_app_txn, setup_txn])
 
-    signed_fund_app_txn = fund_app_txn.sign(funder.get_private_key())
-    signed_setup_txn = setup_txn.sign(funder.get_private_key())
+    signed_fund_app_txn = funder.sign(fund_app_txn)
+    signed_setup_txn = funder.sign(setup_txn)
 
-    client.send_transactions([signed_fund_app_txn, signed_setup_txn])
-    wait_for_confirmation(client, signed_fund_app_txn.get_txid())
+    await aio.call(client.send_transactions([signed_fund_app_txn, signed_setup_txn]))
+    await confirm(client, signed_fund_app_txn)
 
     
-def place_swap(client: AlgodClient, app_id: int, offer: Account, offering_token_id: int, offering_token_amount: int, accepting_token_id: int, accepting_token_amount, swap_index: str) -> None:
+@operation
+async def place_swap(client: AlgodClient, app_id: int, offer: Account, offering_token_id: int, offering_token_amount: int, accepting_token_id: int, accepting_token_amount, swap_index: str) -> None:
     """Place or replace a swap on an active swap.
 
     Args:
@@ -162,50 +181,28 @@ def place_swap(client: AlgodClient, app_id: int, offer: Account, offering_token_
         swap_index: Index for replace swap.
     """
     app_address = get_application_address(app_id)
-    suggested_params = client.suggested_params()
+    suggested_params = await aio.get_suggested_params(client)
     
-    if (is_opted_in_asset(client, accepting_token_id, offer.get_address()) == False):
-        optin_asset(client, accepting_token_id, offer)
+    if (await aio.is_opted_in_asset(client, accepting_token_id, offer.get_address()) == False):
+        await aio.optin_asset(client, accepting_token_id, offer)
         
     tokens = [offering_token_id, accepting_token_id]
     # app optin asset for receiving the asset
-    if is_opted_in_asset(client, offering_token_id, app_address) == False and is_opted_in_asset(client, accepting_token_id, app_address) == False:
-        setup_swap_app(client=client, app_id=app_id, funder=offer, token_ids=tokens)
+    if await aio.is_opted_in_asset(client, offering_token_id, app_address) == False and await aio.is_opted_in_asset(client, accepting_token_id, app_address) == False:
+        await setup_swap_app.aio(client=client, app_id=app_id, funder=offer, token_ids=tokens)
         
-    if is_opted_in_asset(client, offering_token_id, app_address) == False:
-        setup_swap_app(client=client, app_id=app_id, funder=offer, token_ids=[offering_token_id])
+    if await aio.is_opted_in_asset(client, offering_token_id, app_address) == False:
+        await setup_swap_app.aio(client=client, app_id=app_id, funder=offer, token_ids=[offering_token_id])
         
-    if is_opted_in_asset(client, accepting_token_id, app_address) == False:
-        setup_swap_app(client=client, app_id=app_id, funder=offer, token_ids=[accepting_token_id])
+    if await aio.is_opted_in_asset(client, accepting_token_id, app_address) == False:
+        await setup_swap_app.aio(client=client, app_id=app_id, funder=offer, token_ids=[accepting_token_id])
     
     n_address = swap_index
     # if bid_index is empty, find a usable(if the bid app local state's token id is 0) rekeyed address used in the past, 
     if not n_address:
-        unused_rekeyed_address = ""
-        rekeyed_addresses = get_rekeyed_addresses(offer.get_address()) # we can get this from network
-        for rekeyed_address in rekeyed_addresses:
-            if is_opted_in_app(client, app_id, rekeyed_address):
-                state = get_app_local_state(client, app_id, rekeyed_address)
-                print(f"local state of {rekeyed_address} :", state)
-                if b"O_TKID" in state and state[b"O_TKID"] == 0:
-                    unused_rekeyed_address = rekeyed_address
-            else:
-                # might have rekeyed address already but not optin app, we can use it
-                unused_rekeyed_address = rekeyed_address
-                optin_price = 100000 + 28500 * 4 + 50000 * 1 + 1000
-                charge_optin_price(client, offer, unused_rekeyed_address, optin_price)
-                optin_app_rekeyed_address(client, app_id, offer, unused_rekeyed_address)
-                break
-        
-        # if not found, create one, and optin app for local state
-        n_address = unused_rekeyed_address
-        if not n_address:
-            optin_price = 100000 + 28500 * 4 + 50000 * 1 + 1000
-            n_address = generate_rekeyed_address(client, offer, app_id, optin_price)
-            optin_app_rekeyed_address(client, app_id, offer, n_address)
-            set_rekeyed_address(offer.get_address(), n_address, 1)
+        n_address = await aio.take_free_slot(client, offer, app_id, SLOT_TOKEN_KEY, SLOT_OPTIN_PRICE)
     else:
-        state = get_app_local_state(client, app_id, swap_index)
+        state = await aio.get_app_local_state(client, app_id, swap_index)
         if b"O_TKID" in state and state[b"O_TKID"] > 0:
             tokens.append(state[b"O_TKID"])
         
@@ -219,7 +216,6 @@ def place_swap(client: AlgodClient, app_id: int, offer: Account, offering_token_
         amt=offering_token_amount,
         sp=suggested_params,
     )
-    print(f"token_txn: {token_txn}")
     txns.append(token_txn)
 
     if len(tokens) == 3:
@@ -237,20 +233,30 @@ def place_swap(client: AlgodClient, app_id: int, offer: Account, offering_token_
     txns.append(app_call_txn)
     
     transaction.assign_group_id(txns)
+    emit("txns_built", txns=txns)
     
-    signed_token_txn = token_txn.sign(offer.get_private_key())
+    signed_token_txn = offer.sign(token_txn)
     signed_txns.append(signed_token_txn)
     
-    signed_app_call_txn = app_call_txn.sign(offer.get_private_key())
+    signed_app_call_txn = offer.sign(app_call_txn)
     signed_txns.append(signed_app_call_txn)
 
-    client.send_transactions(signed_txns)
-    wait_for_confirmation(client, app_call_txn.get_txid())
+    def on_failed(_):
+        if not swap_index:
+            slot_index.release(app_id, n_address)
+
+    try:
+        await aio.call(client.send_transactions(signed_txns))
+    except Exception as e:
+        on_failed(e)
+        raise
+    await confirm(client, app_call_txn, lambda _: slot_index.occupy(offer.get_address(), app_id, n_address), on_failed)
     
     return n_address
     
     
-def cancel_swap(client: AlgodClient, app_id: int, offer: Account, swap_index: str) -> bool:
+@operation
+async def cancel_swap(client: AlgodClient, app_id: int, offer: Account, swap_index: str) -> bool:
     """Place a swap on an active swap.
 
     Args:
@@ -258,12 +264,12 @@ def cancel_swap(client: AlgodClient, app_id: int, offer: Account, swap_index: st
         app_id: The app ID of the swap.
         offer: The account providing the swap.
     """
-    if (is_opted_in_app(client, app_id, swap_index) == False): 
+    if (await aio.is_opted_in_app(client, app_id, swap_index) == False): 
         return False
     
-    offer_app_local_state = get_app_local_state(client, app_id, swap_index)
+    offer_app_local_state = await aio.get_app_local_state(client, app_id, swap_index)
     token_id = offer_app_local_state[b"O_TKID"]
-    suggested_params = client.suggested_params()
+    suggested_params = await aio.get_suggested_params(client)
     
     suggested_params.fee = 2 * 1_000
     app_call_txn = transaction.ApplicationCallTxn(
@@ -276,9 +282,9 @@ def cancel_swap(client: AlgodClient, app_id: int, offer: Account, swap_index: st
         sp=suggested_params,
     )
     
-    signed_app_call_txn = app_call_txn.sign(offer.get_private_key())
-    client.send_transaction(signed_app_call_txn)    
-    wait_for_confirmation(client, app_call_txn.get_txid())    
+    signed_app_call_txn = offer.sign(app_call_txn)
+    await aio.call(client.send_transaction(signed_app_call_txn))    
+    await confirm(client, app_call_txn, lambda _: slot_index.release(app_id, swap_index))
     
     # #do we need this store app opt out? cause the offer might wants to swap again later ?
     # app_global_state = get_app_global_state(client, app_id)
@@ -290,7 +296,8 @@ def cancel_swap(client: AlgodClient, app_id: int, offer: Account, swap_index: st
     #     return False
 
 
-def accept_swap(client: AlgodClient, app_id: int, accepter: Account, swap_index: str) -> None:
+@operation
+async def accept_swap(client: AlgodClient, app_id: int, accepter: Account, swap_index: str) -> None:
     """Accept on an active swap.
 
     Args:
@@ -301,36 +308,31 @@ def accept_swap(client: AlgodClient, app_id: int, accepter: Account, swap_index:
         accepter: The account buying the asset.
     """
     app_address = get_application_address(app_id)
-    app_global_state = get_app_global_state(client, app_id)
-    suggested_params = client.suggested_params()
+    app_global_state = await aio.get_app_global_state(client, app_id)
+    suggested_params = await aio.get_suggested_params(client)
 
-    if (is_opted_in_app(client, app_id, swap_index) == False): 
+    if (await aio.is_opted_in_app(client, app_id, swap_index) == False): 
         return False
     
-    offer_app_local_state = get_app_local_state(client, app_id, swap_index)
+    offer_app_local_state = await aio.get_app_local_state(client, app_id, swap_index)
     offer = encoding.encode_address(offer_app_local_state[b"O_ADDR"])
     offering_token_id = offer_app_local_state[b"O_TKID"]
     offering_token_amount = offer_app_local_state[b"O_AMT"]
     accepting_token_id = offer_app_local_state[b"A_TKID"]
     accepting_token_amount = offer_app_local_state[b"A_AMT"]
-    print(f"offer address", offer)
-    print(f"offering_token_id", offering_token_id)
-    print(f"offering_token_amount", offering_token_amount)
-    print(f"accepting_token_id", accepting_token_id)
-    print(f"accepting_token_amount", accepting_token_amount)
     
     # check if accepter has enough assets
-    if get_balances(client, accepter.get_address())[accepting_token_id] < accepting_token_amount:
+    if (await aio.get_balances(client, accepter.get_address()))[accepting_token_id] < accepting_token_amount:
         return False
     
-    if is_opted_in_asset(client, offering_token_id, app_address) == False:
+    if await aio.is_opted_in_asset(client, offering_token_id, app_address) == False:
         return False
     
-    if is_opted_in_asset(client, accepting_token_id, app_address) == False:
-        setup_swap_app(client=client, app_id=app_id, funder=offer, token_ids=[accepting_token_id])
+    if await aio.is_opted_in_asset(client, accepting_token_id, app_address) == False:
+        await setup_swap_app.aio(client=client, app_id=app_id, funder=offer, token_ids=[accepting_token_id])
     
-    if (is_opted_in_asset(client, offering_token_id, accepter.get_address()) == False):
-        optin_asset(client, offering_token_id, accepter)
+    # the offering asset opt-in rides in the same group, ahead of the transfer the accept call reads
+    txns = await aio.optin_txns(client, accepter.get_address(), suggested_params, asset_ids=[offering_token_id])
     
     token_txn = transaction.AssetTransferTxn(
         sender=accepter.get_address(),
@@ -355,15 +357,14 @@ def accept_swap(client: AlgodClient, app_id: int, accepter: Account, swap_index:
         sp=suggested_params,
     )
     
-    transaction.assign_group_id([token_txn, app_call_txn])
-    signed_token_txn = token_txn.sign(accepter.get_private_key())
-    signed_app_call_txn = app_call_txn.sign(accepter.get_private_key())
-    
-    client.send_transactions([signed_token_txn, signed_app_call_txn])
-    wait_for_confirmation(client, app_call_txn.get_txid())
+    txns += [token_txn, app_call_txn]
+    transaction.assign_group_id(txns)
+    await aio.call(client.send_transactions([accepter.sign(txn) for txn in txns]))
+    await confirm(client, app_call_txn, lambda _: slot_index.release(app_id, swap_index))
 
 
-def close_swap(client: AlgodClient, app_id: int, closer: Account, assets: List[int]):
+@operation
+async def close_swap(client: AlgodClient, app_id: int, closer: Account, assets: List[int]):
     """Close an swap.
 
     This action can only happen before an swap has begun, in which case it is
@@ -380,22 +381,20 @@ def close_swap(client: AlgodClient, app_id: int, closer: Account, assets: List[i
         closer: The account initiating the close transaction. This must be
             the swap creator.
     """
-    app_global_state = get_app_global_state(client, app_id)
-
-    print(b"assets", assets)
+    app_global_state = await aio.get_app_global_state(client, app_id)
 
     accounts: List[str] = [encoding.encode_address(app_global_state[b"SA_ADDR"]), 
                            encoding.encode_address(app_global_state[b"TW_ADDR"])]
-    print(b"accounts", accounts)
     
     delete_txn = transaction.ApplicationDeleteTxn(
         sender=closer.get_address(),
         index=app_id,
         accounts=accounts,
         foreign_assets=assets,
-        sp=client.suggested_params(),
+        sp=await aio.get_suggested_params(client),
     )
-    signed_delete_txn = delete_txn.sign(closer.get_private_key())
-    client.send_transaction(signed_delete_txn)
+    emit("txns_built", txns=[delete_txn])
+    signed_delete_txn = closer.sign(delete_txn)
+    await aio.call(client.send_transaction(signed_delete_txn))
 
-    wait_for_confirmation(client, signed_delete_txn.get_txid())
+    await confirm(client, signed_delete_txn)
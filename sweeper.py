@@ -0,0 +1,183 @@
+import base64
+import math
+import threading
+from typing import Dict, List, Optional, Tuple
+
+from algosdk.future import transaction
+from algosdk.v2client.algod import AlgodClient
+
+from account import Account
+from hooks import emit
+from registry import OCCUPIED, OPTED_IN, rekeyed_registry
+from slots import slot_index
+from utils import MAX_GROUP_SIZE, get_account_snapshot, get_suggested_params, wait_for_confirmation
+
+
+class CapacityPolicy:
+    """How many free slots to keep per (owner, app_id).
+
+    The reserve follows the listings that are open now: `headroom` free slots
+    per occupied one, never fewer than `min_free` nor more than `max_free`.
+    Everything above it is returned to the owner.
+    """
+
+    def __init__(self, min_free: int = 2, headroom: float = 0.25, max_free: Optional[int] = None) -> None:
+        self.min_free = min_free
+        self.headroom = headroom
+        self.max_free = max_free
+
+    def keep(self, occupied: int) -> int:
+        keep = max(self.min_free, math.ceil(occupied * self.headroom))
+        if self.max_free is not None:
+            keep = min(keep, self.max_free)
+        return keep
+
+
+class Sweeper:
+    """Closes the idle slots of owners back to them, in bulk.
+
+    Only apps listed in `token_keys` (app_id to the slot's free-slot key, e.g.
+    trading.operations.SLOT_TOKEN_KEY) are managed: a slot is closed when all
+    the apps it joined are managed and hold more free slots than the policy
+    keeps, and when it joined none. Each closed slot gets a clear state per
+    app and a payment closing its balance to the owner, signed by the owner
+    and packed into groups of up to 16 transactions sent in the same round.
+    """
+
+    def __init__(self, client: AlgodClient, token_keys: Dict[int, bytes],
+                 policy: Optional[CapacityPolicy] = None, interval: float = 600) -> None:
+        self.client = client
+        self.token_keys = token_keys
+        self.policy = policy or CapacityPolicy()
+        self.interval = interval
+        self.owners: Dict[str, Account] = dict()
+        self.stopped = threading.Event()
+        self.thread: Optional[threading.Thread] = None
+
+    def idle_slots(self, owner: str) -> Dict[str, List[int]]:
+        """Slots above the policy's reserve, with the apps each of them joined."""
+        memberships = rekeyed_registry.memberships(owner)
+        leased = {(address, app_id) for app_id in self.token_keys for address in rekeyed_registry.leased(owner, app_id)}
+
+        surplus: Dict[int, int] = dict()
+        for app_id in self.token_keys:
+            statuses = [apps[app_id] for apps in memberships.values() if app_id in apps]
+            free = sum(1 for status in statuses if status == OPTED_IN)
+            surplus[app_id] = free - self.policy.keep(statuses.count(OCCUPIED))
+
+        idle: Dict[str, List[int]] = dict()
+        # newest slots go first, the oldest are kept
+        for address, apps in reversed(list(memberships.items())):
+            joined = [app_id for app_id, status in apps.items() if app_id and status in (OPTED_IN, OCCUPIED)]
+            if any(
+                app_id not in self.token_keys or apps[app_id] != OPTED_IN
+                or (address, app_id) in leased or surplus[app_id] <= 0
+                for app_id in joined
+            ):
+                continue
+            for app_id in joined:
+                surplus[app_id] -= 1
+            idle[address] = joined
+        return idle
+
+    @staticmethod
+    def claim(owner: str, address: str, apps: List[int]) -> bool:
+        """Lease the slot in every app it joined (app 0 when none) so no operation picks it meanwhile."""
+        claimed = []
+        for app_id in apps:
+            if not rekeyed_registry.claim(owner, address, app_id):
+                Sweeper.release(address, claimed)
+                return False
+            claimed.append(app_id)
+        return True
+
+    @staticmethod
+    def release(address: str, apps: List[int]) -> None:
+        for app_id in apps:
+            rekeyed_registry.release(address, app_id)
+
+    def is_closable(self, owner: str, address: str) -> Tuple[bool, List[int]]:
+        """Check the chain: still rekeyed to the owner, no assets and no listing in any app."""
+        account_info = get_account_snapshot(self.client, address)
+        apps = [local_state["id"] for local_state in account_info.get("apps-local-state", [])]
+        if account_info.get("auth-addr") != owner or account_info.get("assets"):
+            return False, apps
+        for local_state in account_info.get("apps-local-state", []):
+            token_key = self.token_keys.get(local_state["id"])
+            if token_key is None:
+                return False, apps
+            key = base64.b64encode(token_key).decode()
+            if any(item["key"] == key and item["value"]["uint"] for item in local_state.get("key-value", [])):
+                return False, apps
+        return True, apps
+
+    def sweep(self, owner: Account, limit: Optional[int] = None) -> List[str]:
+        """Close the owner's idle slots, returns the closed addresses."""
+        owner_address = owner.get_address()
+        leases: Dict[str, List[int]] = dict()
+        closing: List[Tuple[str, List[int]]] = []
+        for address, registered_apps in self.idle_slots(owner_address).items():
+            if limit is not None and len(closing) >= limit:
+                break
+            leased_apps = registered_apps or [0]
+            if not self.claim(owner_address, address, leased_apps):
+                continue
+            leases[address] = leased_apps
+            closable, apps = self.is_closable(owner_address, address)
+            if closable:
+                closing.append((address, apps))
+
+        sp = get_suggested_params(self.client)
+        groups: List[Tuple[List[transaction.Transaction], List[str]]] = []
+        for address, apps in closing:
+            txns = [transaction.ApplicationClearStateTxn(sender=address, sp=sp, index=app_id) for app_id in apps]
+            txns.append(transaction.PaymentTxn(sender=address, receiver=owner_address, amt=0,
+                                               close_remainder_to=owner_address, sp=sp))
+            if not groups or len(groups[-1][0]) + len(txns) > MAX_GROUP_SIZE:
+                groups.append(([], []))
+            groups[-1][0].extend(txns)
+            groups[-1][1].append(address)
+
+        closed: List[str] = []
+        sent: List[Tuple[str, List[str]]] = []
+        try:
+            for txns, addresses in groups:
+                transaction.assign_group_id(txns)
+                tx_id = self.client.send_transactions([owner.sign(txn) for txn in txns])
+                sent.append((tx_id, addresses))
+        finally:
+            try:
+                # groups already sent still confirm
+                for tx_id, addresses in sent:
+                    wait_for_confirmation(self.client, tx_id)
+                    closed.extend(addresses)
+            finally:
+                rekeyed_registry.mark_closed(closed)
+                for address in closed:
+                    slot_index.discard(address)
+                for address, leased_apps in leases.items():
+                    self.release(address, leased_apps)
+                emit("slots_swept", owner=owner_address, closed=closed)
+        return closed
+
+    def watch(self, owner: Account) -> None:
+        self.owners[owner.get_address()] = owner
+
+    def start(self) -> "Sweeper":
+        if self.thread is None:
+            self.stopped.clear()
+            self.thread = threading.Thread(target=self._run, daemon=True)
+            self.thread.start()
+        return self
+
+    def stop(self) -> None:
+        self.stopped.set()
+        self.thread = None
+
+    def _run(self) -> None:
+        while not self.stopped.wait(self.interval):
+            for owner in list(self.owners.values()):
+                try:
+                    self.sweep(owner)
+                except Exception as e:
+                    emit("slots_swept", owner=owner.get_address(), closed=[], error=e)
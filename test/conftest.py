@@ -0,0 +1,179 @@
+import asyncio
+import base64
+import os
+import sys
+import time
+from typing import Any, Callable, Dict, List, Optional, Union
+
+import msgpack
+import pytest
+from algosdk import account
+from algosdk.future import transaction
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pending  # noqa: E402
+from account import Account  # noqa: E402
+from aio import AsyncAlgodClient  # noqa: E402
+from registry import LEASE_TTL, rekeyed_registry  # noqa: E402
+from slots import slot_index  # noqa: E402
+from utils import account_caches, suggested_params_providers  # noqa: E402
+
+GENESIS_HASH = "SGO1GKSzyE7IEPItTxCByw9x8FmnrCDexi9/cOUJOiI="
+
+
+class FakeAlgod:
+    """An algod answering from dicts, every group it is sent confirms in the next round.
+
+    `accounts` holds `account_info` responses by address, `apps` the params
+    of `application_info` by app id and `blocks` the blocks returned by
+    `block_info`, the sent transactions are added to the block they confirm
+    in. `on_send` is called with every group sent, before it is recorded in
+    `sent`. Transactions it never saw count as confirmed.
+    """
+
+    def __init__(self, round_: int = 10, algod_address: str = "http://fake-algod") -> None:
+        self.round = round_
+        self.algod_address = algod_address
+        self.genesis_hash = GENESIS_HASH
+        self.accounts: Dict[str, Dict[str, Any]] = dict()
+        self.apps: Dict[int, Dict[str, Any]] = dict()
+        self.blocks: Dict[int, Dict[str, Any]] = dict()
+        self.sent: List[List[Any]] = []
+        self.confirmations: Dict[str, int] = dict()
+        self.confirmed_txns: Dict[int, List[Any]] = dict()
+        self.on_send: Optional[Callable[[List[Any]], None]] = None
+
+    def account_info(self, address: str, **kwargs) -> Dict[str, Any]:
+        info = self.accounts.get(address, {"address": address, "amount": 0})
+        return {**info, "round": self.round}
+
+    def application_info(self, app_id: int, **kwargs) -> Dict[str, Any]:
+        return {"id": app_id, "params": self.apps[app_id]}
+
+    def suggested_params(self, **kwargs) -> transaction.SuggestedParams:
+        return transaction.SuggestedParams(1000, self.round, self.round + 1000, self.genesis_hash,
+                                           "fake-v1", False, None, 1000)
+
+    def status(self, **kwargs) -> Dict[str, Any]:
+        return {"last-round": self.round}
+
+    def status_after_block(self, round_: int, **kwargs) -> Dict[str, Any]:
+        # a short block time keeps block followers from spinning
+        time.sleep(0.01)
+        return self.next_block(round_)
+
+    def next_block(self, round_: int) -> Dict[str, Any]:
+        self.round = max(self.round, round_ + 1)
+        return self.status()
+
+    def send_transactions(self, txns: List[Any], **kwargs) -> str:
+        if self.on_send is not None:
+            self.on_send(txns)
+        self.sent.append(list(txns))
+        for txn in txns:
+            self.confirmations[txn.get_txid()] = self.round + 1
+            self.confirmed_txns.setdefault(self.round + 1, []).append(txn)
+        return txns[0].get_txid()
+
+    def send_transaction(self, txn: Any, **kwargs) -> str:
+        return self.send_transactions([txn])
+
+    def pending_transaction_info(self, tx_id: str, **kwargs) -> Dict[str, Any]:
+        confirmed_round = self.confirmations.get(tx_id, self.round)
+        return {"confirmed-round": confirmed_round if confirmed_round <= self.round else 0,
+                "pool-error": "", "txn": {"txn": {}}}
+
+    def block_info(self, round_: int, response_format: str = "json", **kwargs) -> Any:
+        header = dict(self.blocks.get(round_, {"rnd": round_, "ts": 1_600_000_000 + round_}))
+        if round_ in self.confirmed_txns:
+            header.update(gh=base64.b64decode(self.genesis_hash), gen="fake-v1")
+            header["txns"] = [*header.get("txns", []),
+                              *({"txn": txn.transaction.dictify(), "hgi": True} for txn in self.confirmed_txns[round_])]
+        block = {"block": header}
+        return msgpack.packb(block, use_bin_type=True) if response_format == "msgpack" else block
+
+
+def answer(method: str):
+    async def request(self, *args, **kwargs):
+        return getattr(self.blocking, method)(*args, **kwargs)
+    return request
+
+
+class AsyncFakeAlgod(AsyncAlgodClient):
+    """The `AsyncAlgodClient` of a `FakeAlgod`, which is its blocking twin.
+
+    Only waiting for a block suspends, so concurrent operations all get to
+    send before the round passes.
+    """
+
+    def __init__(self, algod: FakeAlgod) -> None:
+        super().__init__("", algod.algod_address)
+        self.blocking = algod
+
+    account_info = answer("account_info")
+    application_info = answer("application_info")
+    suggested_params = answer("suggested_params")
+    status = answer("status")
+    send_transactions = answer("send_transactions")
+    send_transaction = answer("send_transaction")
+    pending_transaction_info = answer("pending_transaction_info")
+    block_info = answer("block_info")
+
+    async def status_after_block(self, round_: int, **kwargs) -> Dict[str, Any]:
+        await asyncio.sleep(0.01)
+        return self.blocking.next_block(round_)
+
+
+def global_state(**values: Union[int, bytes]) -> List[Dict[str, Any]]:
+    """An app's `global-state` (or an account's `key-value` local state) holding uint and bytes values."""
+    return [{"key": base64.b64encode(key.encode()).decode(),
+             "value": {"type": 1, "bytes": base64.b64encode(value).decode()} if isinstance(value, bytes)
+             else {"type": 2, "uint": value}}
+            for key, value in values.items()]
+
+
+def layout(group: List[Any]) -> List[str]:
+    """The sent transactions of a group as "pay", "axfer", "optin <asset or app id>" or "<app id> <first arg>"."""
+    described = []
+    for txn in group:
+        txn = txn.transaction
+        if txn.type == "appl":
+            optin = txn.on_complete == transaction.OnComplete.OptInOC
+            described.append(f"optin {txn.index}" if optin else f"{txn.index} {txn.app_args[0].decode()}")
+        elif txn.type == "axfer" and txn.receiver == txn.sender and not txn.amount:
+            described.append(f"optin {txn.index}")
+        else:
+            described.append(txn.type)
+    return described
+
+
+def new_account() -> Account:
+    private_key, _ = account.generate_account()
+    return Account(private_key)
+
+
+def new_address() -> str:
+    return account.generate_account()[1]
+
+
+@pytest.fixture(autouse=True)
+def registry(tmp_path):
+    """A fresh registry database and empty in-memory caches for every test."""
+    rekeyed_registry.close()
+    rekeyed_registry.path = str(tmp_path / "rekeyed_addresses.db")
+    rekeyed_registry.legacy_json = None
+    slot_index.clear()
+    slot_index.lease_ttl = LEASE_TTL
+    account_caches.clear()
+    suggested_params_providers.clear()
+    yield rekeyed_registry
+    rekeyed_registry.close()
+    for tracker in pending.trackers.values():
+        tracker.stop()
+    pending.trackers.clear()
+
+
+@pytest.fixture
+def algod() -> FakeAlgod:
+    return FakeAlgod()
@@ -0,0 +1,61 @@
+from conftest import FakeAlgod, new_address
+
+from utils import get_account_cache, get_account_snapshot, wait_for_confirmation
+
+
+def count_calls(algod):
+    calls = []
+    account_info = algod.account_info
+    algod.account_info = lambda address: calls.append((address, algod.round)) or account_info(address)
+    return calls
+
+
+def test_snapshots_are_reused_within_a_round_and_copied(algod):
+    address = new_address()
+    algod.accounts[address] = {"address": address, "amount": 5, "assets": [{"asset-id": 1, "amount": 2}]}
+    calls = count_calls(algod)
+
+    snapshot = get_account_snapshot(algod, address)
+    snapshot["amount"] = 0
+    snapshot["assets"][0]["amount"] = 0
+    assert get_account_snapshot(algod, address)["amount"] == 5
+    assert get_account_snapshot(algod, address)["assets"][0]["amount"] == 2
+    assert calls == [(address, 10)]
+
+    # a newer round makes every snapshot stale
+    get_account_cache(algod).advance(11)
+    algod.round = 11
+    assert get_account_snapshot(algod, address)["round"] == 11
+    assert calls == [(address, 10), (address, 11)]
+
+
+def test_confirmed_transaction_invalidates_the_addresses_it_touched(algod):
+    sender, receiver, bystander = new_address(), new_address(), new_address()
+    calls = count_calls(algod)
+    for address in (sender, receiver, bystander):
+        get_account_snapshot(algod, address)
+
+    pending_txn = algod.pending_transaction_info("TXID")
+    pending_txn["txn"]["txn"] = {"type": "pay", "snd": sender, "rcv": receiver}
+    algod.pending_transaction_info = lambda tx_id: pending_txn
+    wait_for_confirmation(algod, "TXID")
+
+    for address in (sender, receiver, bystander):
+        get_account_snapshot(algod, address)
+    assert [address for address, _ in calls] == [sender, receiver, bystander, sender, receiver]
+
+
+def test_clients_of_different_networks_keep_their_own_snapshots():
+    testnet = FakeAlgod(round_=20_000_000, algod_address="https://testnet-api.algonode.cloud")
+    mainnet = FakeAlgod(round_=30_000_000, algod_address="https://mainnet-api.algonode.cloud")
+    address = new_address()
+    testnet.accounts[address] = {"address": address, "amount": 1}
+    mainnet.accounts[address] = {"address": address, "amount": 2}
+
+    assert get_account_snapshot(testnet, address)["amount"] == 1
+    # the higher mainnet round neither evicts nor serves the testnet snapshot
+    assert get_account_snapshot(mainnet, address)["amount"] == 2
+    assert get_account_cache(testnet).last_round == 20_000_000
+    calls = count_calls(testnet)
+    assert get_account_snapshot(testnet, address)["amount"] == 1
+    assert calls == []
@@ -0,0 +1,62 @@
+import asyncio
+import threading
+
+from algosdk.logic import get_application_address
+from conftest import AsyncFakeAlgod, global_state, new_account, new_address
+from test_pending import pay
+
+from pending import PendingTxn
+from registry import OCCUPIED, OPTED_IN
+from slots import slot_index
+from trading import aio, operations
+
+APP_ID = 43
+STORE_APP_ID = 7
+
+
+def test_operations_run_concurrently_on_one_event_loop(algod):
+    client = AsyncFakeAlgod(algod)
+    senders = [new_account() for _ in range(20)]
+    threads = threading.active_count()
+
+    async def pay_all():
+        return await asyncio.gather(*(pay.aio(client, sender, amount) for amount, sender in enumerate(senders)))
+
+    assert asyncio.run(pay_all()) == list(range(20))
+    # every payment was sent before the first of them waited a round, they all confirmed in the next one
+    assert len(algod.sent) == 20
+    assert set(algod.confirmations.values()) == {11}
+    # and no worker thread was needed
+    assert threading.active_count() <= threads
+
+
+def test_wait_false_from_the_event_loop(algod):
+    client = AsyncFakeAlgod(algod)
+
+    async def pay_later():
+        handle = await pay.aio(client, new_account(), 5, wait=False)
+        assert isinstance(handle, PendingTxn)
+        return handle, await handle
+
+    handle, response = asyncio.run(pay_later())
+    assert handle.value == 5
+    assert response.confirmed_round == 11
+
+
+def test_place_trade_claims_a_loaded_slot_on_the_event_loop(algod, registry):
+    seller = new_account()
+    algod.apps[APP_ID] = {"creator": new_address(), "global-state": global_state(SA_ID=STORE_APP_ID)}
+    algod.accounts[seller.get_address()] = {"address": seller.get_address(), "amount": 10_000_000,
+                                            "apps-local-state": [{"id": STORE_APP_ID}]}
+    slot = new_address()
+    registry.add(seller.get_address(), slot, APP_ID, OPTED_IN)
+    algod.accounts[slot] = {"address": slot, "amount": 0, "apps-local-state": [{"id": APP_ID}]}
+    app_address = get_application_address(APP_ID)
+    algod.accounts[app_address] = {"address": app_address, "amount": 0, "assets": [{"asset-id": 100, "amount": 0}]}
+    slot_index.load(algod, seller.get_address(), APP_ID, operations.SLOT_TOKEN_KEY)
+
+    trading_index = asyncio.run(aio.place_trade(AsyncFakeAlgod(algod), APP_ID, seller, 100, 1, 5_000_000, ""))
+
+    assert trading_index == slot
+    assert registry.status(seller.get_address(), slot, APP_ID) == OCCUPIED
+    assert slot_index.counts(seller.get_address(), APP_ID)["hits"] == 1
@@ -0,0 +1,22 @@
+import os
+
+import pytest
+
+from assembler import assemble
+
+GOLDEN = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "golden")
+PROGRAMS = sorted(name[:-5] for name in os.listdir(GOLDEN) if name.endswith(".teal"))
+
+
+def test_every_app_has_golden_programs():
+    apps = ("auction", "bidding", "trading", "swap", "staking", "store")
+    assert PROGRAMS == sorted(f"{app}_{program}" for app in apps
+                              for program in ("approval_program", "clear_state_program"))
+
+
+@pytest.mark.parametrize("name", PROGRAMS)
+def test_assembler_matches_algod_bytecode(name):
+    with open(os.path.join(GOLDEN, name + ".teal")) as f:
+        teal = f.read()
+    with open(os.path.join(GOLDEN, name + ".bin"), "rb") as f:
+        assert assemble(teal) == f.read()
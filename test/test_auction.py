@@ -0,0 +1,143 @@
+import asyncio
+import time
+
+import pytest
+from algosdk import encoding
+from conftest import AsyncFakeAlgod, global_state, layout, new_account, new_address
+
+from auction import aio, operations
+from hooks import subscribe, unsubscribe
+from pending import PendingBatch
+from registry import OCCUPIED, OPTED_IN
+from slots import slot_index
+
+APP_ID = 42
+STORE_APP_ID = 7
+
+
+@pytest.fixture
+def seller(algod, registry):
+    seller = new_account()
+    algod.apps[APP_ID] = {"creator": new_address(), "global-state": global_state(SA_ID=STORE_APP_ID)}
+    algod.accounts[seller.get_address()] = {"address": seller.get_address(), "amount": 10_000_000,
+                                            "apps-local-state": [{"id": STORE_APP_ID}]}
+    for _ in range(3):
+        slot = new_address()
+        registry.add(seller.get_address(), slot, APP_ID, OPTED_IN)
+        algod.accounts[slot] = {"address": slot, "amount": 0, "apps-local-state": [{"id": APP_ID}]}
+    return seller
+
+
+def items(count):
+    return [(100 + i, 1, 1_700_000_000, 1_700_086_400, 1_000_000, 100_000) for i in range(count)]
+
+
+def test_setup_auctions_sends_every_group_then_streams_receipts(algod, registry, seller):
+    events = []
+    subscriber = subscribe(lambda event, fields: events.append(event))
+    try:
+        receipts = operations.setup_auctions(algod, APP_ID, seller, items(3))
+    finally:
+        unsubscribe(subscriber)
+
+    assert events[0] == "operation_start" and events[-1] == "operation_end"
+    # one pay + setup + asset transfer group per auction, all sent before any wait
+    assert [len(group) for group in algod.sent] == [3, 3, 3]
+
+    receipts = list(receipts)
+    assert all(receipt.ok for receipt in receipts)
+    indexes = [receipt.index for receipt in receipts]
+    assert len(set(indexes)) == 3
+    for index in indexes:
+        assert registry.status(seller.get_address(), index, APP_ID) == OCCUPIED
+    assert slot_index.counts(seller.get_address(), APP_ID)["occupied"] == 3
+
+
+def test_setup_auctions_packs_groups(algod, registry, seller):
+    receipts = list(operations.setup_auctions(algod, APP_ID, seller, items(3), pack=True))
+
+    assert [len(group) for group in algod.sent] == [9]
+    assert len({receipt.tx_id for receipt in receipts}) == 1
+
+
+def test_refused_group_releases_its_slot(algod, registry, seller):
+    calls = []
+
+    def refuse_first(txns):
+        calls.append(txns)
+        if len(calls) == 1:
+            raise Exception("overspend")
+
+    algod.on_send = refuse_first
+    receipts = list(operations.setup_auctions(algod, APP_ID, seller, items(2)))
+
+    assert [receipt.ok for receipt in receipts] == [False, True]
+    assert str(receipts[0].error) == "overspend"
+    assert registry.status(seller.get_address(), receipts[0].index, APP_ID) == OPTED_IN
+    assert registry.leased(seller.get_address(), APP_ID) == []
+
+
+def test_setup_auctions_from_the_async_layer(algod, registry, seller):
+    async def setup():
+        client = AsyncFakeAlgod(algod)
+        return [receipt async for receipt in await aio.setup_auctions(client, APP_ID, seller, items(2))]
+
+    receipts = asyncio.run(setup())
+    assert [receipt.ok for receipt in receipts] == [True, True]
+    for receipt in receipts:
+        assert registry.status(seller.get_address(), receipt.index, APP_ID) == OCCUPIED
+
+
+def test_setup_auctions_without_waiting_returns_a_batch_handle(algod, registry, seller):
+    batch = operations.setup_auctions(algod, APP_ID, seller, items(3), wait=False)
+
+    assert isinstance(batch, PendingBatch)
+    assert len(algod.sent) == 3 and len(batch.handles) == 3
+    # sent, not confirmed yet
+    assert not any(receipt.round for receipt in batch.value)
+
+    responses = batch.result(timeout=5)
+    assert [response.confirmed_round for response in responses] == [11, 11, 11]
+    assert all(receipt.ok for receipt in batch.value)
+    for receipt in batch.value:
+        assert registry.status(seller.get_address(), receipt.index, APP_ID) == OCCUPIED
+
+
+@pytest.mark.parametrize("opted_in, expected", [
+    (False, [f"optin {STORE_APP_ID}", "optin 100", "pay", f"{APP_ID} bid"]),
+    (True, ["pay", f"{APP_ID} bid"]),
+], ids=["first-bid", "opted-in"])
+def test_place_bid_folds_the_missing_opt_ins_into_its_group(algod, seller, opted_in, expected):
+    index = new_address()
+    algod.accounts[index] = {"address": index, "amount": 0, "apps-local-state": [{"id": APP_ID, "key-value": global_state(
+        S_ADDR=encoding.decode_address(seller.get_address()), TK_ID=100, LB_ADDR=bytes(32),
+    )}]}
+    bidder = new_account()
+    algod.accounts[bidder.get_address()] = {"address": bidder.get_address(), "amount": 10_000_000}
+    if opted_in:
+        algod.accounts[bidder.get_address()].update(assets=[{"asset-id": 100, "amount": 0}],
+                                                    **{"apps-local-state": [{"id": STORE_APP_ID}]})
+
+    operations.place_bid(algod, APP_ID, index, bidder, 2_000_000)
+
+    group, = algod.sent
+    # the bid call reads the payment right before it
+    assert layout(group) == expected
+    assert len({txn.transaction.group for txn in group}) == 1
+
+
+def test_closing_the_stream_early_settles_the_rest_in_the_background(algod, registry, seller):
+    receipts = operations.setup_auctions(algod, APP_ID, seller, items(3))
+    first = next(receipts)
+    receipts.close()
+
+    # the groups still in flight are left to the confirmation tracker
+    deadline = time.monotonic() + 5
+    while registry.leased(seller.get_address(), APP_ID):
+        assert time.monotonic() < deadline, "leases never released"
+        time.sleep(0.01)
+    assert first.ok
+    assert slot_index.counts(seller.get_address(), APP_ID)["occupied"] == 3
+    for group in algod.sent:
+        index = group[1].transaction.accounts[0]
+        assert registry.status(seller.get_address(), index, APP_ID) == OCCUPIED
@@ -0,0 +1,42 @@
+from algosdk import encoding
+from algosdk.future import transaction
+from conftest import FakeAlgod, new_address
+
+from evaluator import Ledger, evaluate_group
+
+
+def ledger(balances):
+    def load_account(address):
+        return {"amount": balances.get(address, 0), "min_balance": 100_000, "assets": {}, "apps": {}}
+
+    return Ledger(load_account, lambda app_id: None, round_=10, timestamp=1_600_000_010)
+
+
+def payment(sender, receiver, amount, fee=1000):
+    sp = FakeAlgod().suggested_params()
+    sp.fee, sp.flat_fee = fee, True
+    return transaction.PaymentTxn(sender, sp, receiver, amount).dictify()
+
+
+def test_payments_move_balances_and_keep_the_min_balance():
+    sender, receiver = new_address(), new_address()
+    state = ledger({sender: 1_000_000})
+
+    outcomes = evaluate_group(state, [payment(sender, receiver, 500_000), payment(sender, receiver, 500_000)])
+
+    assert outcomes[0].error is None
+    assert "overspend" in outcomes[1].error
+    assert state.account(encoding.decode_address(receiver))["amount"] == 500_000
+
+    outcomes = evaluate_group(ledger({sender: 1_000_000}), [payment(sender, receiver, 950_000)])
+    assert "below min" in outcomes[0].error
+
+
+def test_fees_are_pooled_over_the_group():
+    sender, receiver = new_address(), new_address()
+    state = ledger({sender: 1_000_000})
+
+    assert [outcome.error for outcome in evaluate_group(
+        state, [payment(sender, receiver, 1, fee=2000), payment(sender, receiver, 1, fee=0)])] == [None, None]
+    outcome, _ = evaluate_group(state, [payment(sender, receiver, 1, fee=1000), payment(sender, receiver, 1, fee=0)])
+    assert "less than the minimum" in outcome.error
@@ -0,0 +1,108 @@
+import pytest
+from algosdk import encoding
+from algosdk.error import AlgodHTTPError
+from conftest import global_state, new_account, new_address
+
+from auction import keeper as keeper_module
+from auction.keeper import AuctionKeeper
+
+APP_ID = 42
+STORE_APP_ID = 7
+NO_BIDDER = bytes(32)
+SELLER = new_account()
+
+
+@pytest.fixture
+def keeper(algod, registry):
+    algod.apps[APP_ID] = {"creator": new_address(), "global-state": global_state(
+        SA_ID=STORE_APP_ID,
+        SA_ADDR=encoding.decode_address(new_address()),
+        TW_ADDR=encoding.decode_address(new_address()),
+    )}
+    keeper = AuctionKeeper(algod, APP_ID, workers=2)
+    keeper.track(SELLER)
+    return keeper
+
+
+def add_auction(algod, keeper, end_time, bidder=True):
+    index = new_address()
+    lead_bidder = encoding.decode_address(new_address()) if bidder else NO_BIDDER
+    algod.accounts[index] = {"address": index, "amount": 0, "apps-local-state": [
+        {"id": APP_ID, "key-value": global_state(TK_ID=100, ET=end_time, LB_ADDR=lead_bidder)},
+    ]}
+    keeper.add(index, SELLER.get_address(), end_time)
+    return index
+
+
+def closed(group):
+    """The auction index closed by each close call of a sent group."""
+    return [txn.transaction.accounts[0] for txn in group if txn.transaction.app_args == [b"close"]]
+
+
+def test_due_returns_ended_auctions_in_end_time_order(algod, keeper):
+    late, early, middle = (add_auction(algod, keeper, end_time) for end_time in (30, 10, 20))
+    # the index was reused for a later auction, its first end time is outdated
+    keeper.add(early, SELLER.get_address(), 40)
+
+    assert keeper.due(20) == [middle]
+    assert keeper.due(25) == []
+    assert keeper.due(40) == [late, early]
+
+
+def test_settle_packs_close_groups_up_to_the_group_limit(algod, keeper):
+    with_bids = [add_auction(algod, keeper, 10) for _ in range(9)]
+    without_bid = add_auction(algod, keeper, 11, bidder=False)
+
+    settled, failed = keeper.settle(11)
+
+    # a close and a store call per auction with a bid, 8 of them fill a group
+    assert [len(group) for group in algod.sent] == [16, 3]
+    assert sorted(index for group in algod.sent for index in closed(group)) == sorted([*with_bids, without_bid])
+    assert sorted(settled) == sorted([*with_bids, without_bid]) and failed == {}
+    assert keeper.auctions == {}
+
+
+def test_rejected_group_is_retried_auction_by_auction(algod, keeper):
+    good, bad = add_auction(algod, keeper, 10), add_auction(algod, keeper, 10)
+
+    def reject_bad(txns):
+        if bad in closed(txns):
+            raise AlgodHTTPError("logic eval error", 400)
+
+    algod.on_send = reject_bad
+    assert keeper.settle(10) == ([], {})
+    assert keeper.solo == {good, bad}
+
+    settled, failed = keeper.settle(11)
+    # refused groups are not recorded as sent
+    assert [closed(group) for group in algod.sent] == [[good]]
+    assert settled == [good] and list(failed) == [bad]
+    # a rejected auction on its own is dropped
+    assert keeper.auctions == {} and keeper.due(100) == []
+
+
+def test_auctions_are_kept_after_a_transport_error(algod, keeper, monkeypatch):
+    index = add_auction(algod, keeper, 10)
+    get_suggested_params = keeper_module.get_suggested_params
+
+    def unreachable(client):
+        monkeypatch.setattr(keeper_module, "get_suggested_params", get_suggested_params)
+        raise ConnectionError("algod unreachable")
+
+    monkeypatch.setattr(keeper_module, "get_suggested_params", unreachable)
+    with pytest.raises(ConnectionError):
+        keeper.settle(10)
+    assert algod.sent == []
+
+    def drop_connection(txns):
+        algod.on_send = None
+        raise ConnectionError("connection reset")
+
+    # a send that did not reach the node leaves a solo auction alone as well
+    keeper.solo.add(index)
+    algod.on_send = drop_connection
+    assert keeper.settle(11) == ([], {})
+    assert index in keeper.auctions
+
+    assert keeper.settle(12) == ([index], {})
+    assert len(algod.sent) == 1
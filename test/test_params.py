@@ -0,0 +1,44 @@
+from conftest import FakeAlgod
+
+from utils import get_params_provider, get_suggested_params, wait_for_confirmation
+
+TESTNET_HASH = "SGO1GKSzyE7IEPItTxCByw9x8FmnrCDexi9/cOUJOiI="
+MAINNET_HASH = "wGHE2Pwdvd7S12BL5FaOP20EGYesN73ktiC1qzkkit8="
+
+
+def test_params_are_fetched_once_per_round_and_copied(algod):
+    calls = []
+    suggested_params = algod.suggested_params
+    algod.suggested_params = lambda: calls.append(algod.round) or suggested_params()
+
+    sp = get_suggested_params(algod)
+    sp.fee = 3000
+    assert get_suggested_params(algod).fee == 1000
+    assert calls == [10]
+
+    algod.round = 11
+    wait_for_confirmation(algod, "TXID")
+    assert get_suggested_params(algod).first == 11
+    assert calls == [10, 11]
+
+
+def test_clients_of_different_networks_get_their_own_params():
+    testnet = FakeAlgod(round_=20_000_000, algod_address="https://testnet-api.algonode.cloud")
+    testnet.genesis_hash = TESTNET_HASH
+    mainnet = FakeAlgod(round_=30_000_000, algod_address="https://mainnet-api.algonode.cloud")
+    mainnet.genesis_hash = MAINNET_HASH
+    # another client of the same node shares its provider
+    testnet_again = FakeAlgod(round_=20_000_000, algod_address="https://testnet-api.algonode.cloud")
+    testnet_again.genesis_hash = TESTNET_HASH
+
+    assert get_suggested_params(testnet).gh == TESTNET_HASH
+    assert get_suggested_params(mainnet).gh == MAINNET_HASH
+    assert get_suggested_params(testnet).first == 20_000_000
+    assert get_params_provider(testnet_again) is get_params_provider(testnet)
+    assert get_params_provider(mainnet) is not get_params_provider(testnet)
+
+    # a mainnet confirmation does not touch the testnet params
+    mainnet.round += 1
+    wait_for_confirmation(mainnet, "TXID")
+    assert get_params_provider(testnet).params is not None
+    assert get_suggested_params(mainnet).first == 30_000_001
@@ -0,0 +1,42 @@
+from algosdk.future import transaction
+from conftest import new_account
+
+import aio
+import utils
+from hooks import operation
+from pending import PendingTxn, confirm, get_tracker
+
+
+@operation
+async def pay(client, sender, amount):
+    txn = transaction.PaymentTxn(sender.get_address(), await aio.get_suggested_params(client), sender.get_address(),
+                                 amount)
+    await aio.call(client.send_transaction(sender.sign(txn)))
+    await confirm(client, txn)
+    return amount
+
+
+def test_wait_false_returns_a_handle_without_installing_a_tracker(algod):
+    sender = new_account()
+    handle = pay(algod, sender, 5, wait=False)
+
+    assert isinstance(handle, PendingTxn)
+    assert handle.value == 5
+    assert handle.tx_id == algod.sent[-1][0].get_txid()
+    assert handle.result(timeout=5).confirmed_round == algod.round
+    # other callers still wait on their own
+    assert utils.confirmation_tracker is None
+
+
+def test_wait_blocks_and_returns_the_value(algod):
+    assert pay(algod, new_account(), 7) == 7
+    assert utils.confirmation_tracker is None
+
+
+def test_handles_of_each_node_get_their_own_tracker(algod):
+    from conftest import FakeAlgod
+
+    other = FakeAlgod(algod_address="http://other-algod")
+    assert get_tracker(algod) is get_tracker(algod)
+    assert get_tracker(algod) is not get_tracker(other)
+    assert get_tracker(other).client is other
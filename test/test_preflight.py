@@ -0,0 +1,96 @@
+import asyncio
+
+import pytest
+from algosdk import encoding
+from algosdk.logic import get_application_address
+from conftest import AsyncFakeAlgod, global_state, new_account, new_address
+
+import artifacts
+from auction import operations
+from preflight import PreflightError, check, guard
+
+APP_ID = 42
+STORE_APP_ID = 7
+TOKEN_ID = 100
+RESERVE = 1_000_000
+
+
+@pytest.fixture
+def auction(algod):
+    """An auction index of APP_ID with a reserve of RESERVE and no bid yet."""
+    approval = artifacts.get_manifest()["apps"]["auction"]["approval_program"]["bytecode"]
+    algod.apps[APP_ID] = {"creator": new_address(), "approval-program": approval,
+                          "global-state": global_state(SA_ID=STORE_APP_ID),
+                          "local-state-schema": {"num-uint": 9, "num-byte-slice": 2}}
+    app_address = get_application_address(APP_ID)
+    algod.accounts[app_address] = {"address": app_address, "amount": 1_000_000,
+                                   "assets": [{"asset-id": TOKEN_ID, "amount": 1}]}
+    index = new_address()
+    algod.accounts[index] = {"address": index, "amount": 0, "apps-local-state": [{"id": APP_ID, "key-value": global_state(
+        S_ADDR=encoding.decode_address(new_address()), TK_ID=TOKEN_ID, TKA=1, RA=RESERVE, MBI=100_000,
+        LBP=0, NB=0, LB_ADDR=bytes(32),
+    )}]}
+    return index
+
+
+@pytest.fixture
+def bidder(algod):
+    bidder = new_account()
+    algod.accounts[bidder.get_address()] = {"address": bidder.get_address(), "amount": 10_000_000,
+                                            "assets": [{"asset-id": TOKEN_ID, "amount": 0}],
+                                            "apps-local-state": [{"id": STORE_APP_ID}]}
+    return bidder
+
+
+def bid_group(algod, auction, bidder, amount):
+    """The signed group `place_bid` would send."""
+    sent = []
+
+    def capture(txns):
+        sent.append(txns)
+        raise RuntimeError("not sent")
+
+    algod.on_send = capture
+    with pytest.raises(RuntimeError):
+        operations.place_bid(algod, APP_ID, auction, bidder, amount)
+    algod.on_send = None
+    return sent[0]
+
+
+def test_bid_below_the_reserve_is_rejected_locally(algod, auction, bidder):
+    with pytest.raises(PreflightError) as raised:
+        check(algod, bid_group(algod, auction, bidder, RESERVE - 1), local=True)
+
+    preflight = raised.value.preflight
+    assert preflight.evaluator == "local"
+    rejection = preflight.rejection
+    # the payment passes, the bid call fails on its assert
+    assert [report.passed for report in preflight.txns] == [True, False]
+    assert rejection.index == 1 and rejection.source == "assert" and rejection.cost > 0
+
+
+def test_valid_bid_passes_the_local_preflight(algod, auction, bidder):
+    preflight = check(algod, bid_group(algod, auction, bidder, RESERVE + 4_000), local=True)
+
+    assert preflight.ok
+    assert [report.passed for report in preflight.txns] == [True, True]
+    assert preflight.cost > 0
+
+
+def test_guarded_client_raises_before_sending(algod, auction, bidder):
+    guard(algod, local=True)
+
+    with pytest.raises(PreflightError):
+        operations.place_bid(algod, APP_ID, auction, bidder, RESERVE - 1)
+    assert algod.sent == []
+
+    operations.place_bid(algod, APP_ID, auction, bidder, RESERVE + 4_000)
+    assert len(algod.sent) == 1
+
+
+def test_guarded_async_client_preflights_off_the_loop(algod, auction, bidder):
+    client = guard(AsyncFakeAlgod(algod), local=True)
+
+    with pytest.raises(PreflightError):
+        asyncio.run(operations.place_bid.aio(client, APP_ID, auction, bidder, RESERVE - 1))
+    assert algod.sent == []
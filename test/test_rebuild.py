@@ -0,0 +1,86 @@
+from algosdk import encoding
+from conftest import new_address
+
+import rebuild as rebuild_module
+from rebuild import CLEAR_STATE, OPT_IN, rebuild
+from registry import CLOSED, OCCUPIED, OPTED_IN, OPTED_OUT
+
+APP_ID = 42
+
+
+def rekey(sender, to):
+    return {"txn": {"type": "pay", "snd": encoding.decode_address(sender), "rekey": encoding.decode_address(to)}}
+
+
+def app_call(sender, on_completion, app_id=APP_ID):
+    return {"txn": {"type": "appl", "snd": encoding.decode_address(sender), "apid": app_id, "apan": on_completion}}
+
+
+def close(sender, to):
+    return {"txn": {"type": "pay", "snd": encoding.decode_address(sender), "close": encoding.decode_address(to)}}
+
+
+def add_blocks(algod, blocks):
+    for round_, txns in blocks.items():
+        algod.blocks[round_] = {"rnd": round_, "ts": 1_600_000_000 + round_, "txns": txns}
+    algod.round = max(blocks)
+
+
+def test_rebuild_replays_slot_history_in_order(algod, registry):
+    owner, other_owner = new_address(), new_address()
+    kept, closed, moved, foreign = (new_address() for _ in range(4))
+    add_blocks(algod, {
+        2: [rekey(kept, owner), rekey(foreign, other_owner)],
+        3: [app_call(kept, OPT_IN), rekey(closed, owner)],
+        4: [app_call(closed, OPT_IN), app_call(foreign, OPT_IN)],
+        5: [rekey(moved, owner)],
+        6: [close(closed, owner), app_call(moved, OPT_IN)],
+        7: [app_call(moved, CLEAR_STATE)],
+        8: [rekey(moved, other_owner)],
+        9: [app_call(kept, OPT_IN, APP_ID + 1)],
+    })
+
+    # small chunks read by several workers are still applied in round order
+    assert rebuild(algod, [owner], first_round=1, last_round=9, workers=3, chunk=2) == 3
+
+    assert registry.addresses(owner) == [kept]
+    assert registry.status(owner, kept, APP_ID) == OPTED_IN
+    assert registry.status(owner, kept, APP_ID + 1) == OPTED_IN
+    assert registry.is_closed(closed) and registry.is_closed(moved)
+    assert registry.owner(foreign) is None
+    assert registry.checkpoint(owner) == 9
+
+
+def test_rebuild_resumes_after_its_checkpoint(algod, registry, monkeypatch):
+    owner, slot = new_address(), new_address()
+    add_blocks(algod, {3: [rekey(slot, owner)], 4: [app_call(slot, OPT_IN)]})
+    rebuild(algod, [owner], first_round=1, last_round=4)
+    # a listing the chain history cannot see is kept
+    registry.set_slot_status(slot, APP_ID, OCCUPIED)
+
+    scanned = []
+    block_events = rebuild_module.block_events
+    monkeypatch.setattr(rebuild_module, "block_events",
+                        lambda client, round_: scanned.append(round_) or block_events(client, round_))
+    add_blocks(algod, {6: [app_call(slot, OPT_IN)], 7: [app_call(slot, CLEAR_STATE, APP_ID + 1)]})
+    assert rebuild(algod, [owner], first_round=1) == 0
+
+    assert sorted(scanned) == [5, 6, 7]
+    assert registry.status(owner, slot, APP_ID) == OCCUPIED
+    assert registry.status(owner, slot, APP_ID + 1) == OPTED_OUT
+    assert registry.checkpoint(owner) == 7
+
+
+def test_rekeying_a_closed_slot_back_reopens_it(algod, registry):
+    owner, slot = new_address(), new_address()
+    add_blocks(algod, {
+        2: [rekey(slot, owner)],
+        3: [close(slot, owner)],
+    })
+    rebuild(algod, [owner], last_round=3)
+    assert registry.status(owner, slot, 0) == CLOSED
+
+    add_blocks(algod, {4: [rekey(slot, owner)]})
+    rebuild(algod, [owner])
+    assert registry.addresses(owner) == [slot]
+    assert registry.claim(owner, slot, APP_ID)
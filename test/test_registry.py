@@ -0,0 +1,74 @@
+import threading
+import time
+
+from conftest import new_address
+
+from registry import CLOSED, OCCUPIED, OPTED_IN, RekeyedAddressRegistry
+
+OWNER = new_address()
+APP_ID = 42
+
+
+def test_only_one_worker_wins_a_claim_race(registry):
+    slot = new_address()
+    registry.add(OWNER, slot, APP_ID, OPTED_IN)
+    # one registry per worker, each on its own connection like separate processes
+    workers = [RekeyedAddressRegistry(registry.path, legacy_json=None) for _ in range(8)]
+    start = threading.Barrier(len(workers))
+    won = []
+
+    def claim(index, worker):
+        start.wait()
+        if worker.claim(OWNER, slot, APP_ID, holder=f"worker-{index}"):
+            won.append(index)
+
+    threads = [threading.Thread(target=claim, args=item) for item in enumerate(workers)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(won) == 1
+    assert registry.leased(OWNER, APP_ID) == [slot]
+    for worker in workers:
+        worker.close()
+
+
+def test_lease_is_released_by_its_holder_only(registry):
+    slot = new_address()
+    assert registry.claim(OWNER, slot, APP_ID, holder="worker-1")
+    assert not registry.claim(OWNER, slot, APP_ID, holder="worker-2")
+
+    registry.release(slot, APP_ID, holder="worker-2")
+    assert not registry.claim(OWNER, slot, APP_ID, holder="worker-2")
+
+    registry.release(slot, APP_ID, holder="worker-1")
+    assert registry.claim(OWNER, slot, APP_ID, holder="worker-2")
+
+
+def test_expired_lease_can_be_taken_over(registry):
+    slot = new_address()
+    assert registry.claim(OWNER, slot, APP_ID, ttl=0.05, holder="worker-1")
+    assert registry.renew(slot, APP_ID, ttl=0.05, holder="worker-1")
+    time.sleep(0.1)
+
+    assert registry.leased(OWNER, APP_ID) == []
+    assert not registry.renew(slot, APP_ID, holder="worker-1")
+    assert registry.claim(OWNER, slot, APP_ID, holder="worker-2")
+    # the previous holder's release leaves the new lease alone
+    registry.release(slot, APP_ID, holder="worker-1")
+    assert registry.leased(OWNER, APP_ID) == [slot]
+
+
+def test_occupied_and_closed_slots_cannot_be_claimed(registry):
+    occupied, closed = new_address(), new_address()
+    registry.add(OWNER, occupied, APP_ID, OCCUPIED)
+    registry.add(OWNER, closed, APP_ID, OPTED_IN)
+    registry.mark_closed([closed])
+
+    assert not registry.claim(OWNER, occupied, APP_ID)
+    assert registry.claim(OWNER, occupied, APP_ID + 1)
+    assert not registry.claim(OWNER, closed, APP_ID)
+    assert not registry.claim(OWNER, closed, 0)
+    assert registry.status(OWNER, closed, APP_ID) == CLOSED
+    assert registry.addresses(OWNER) == [occupied]
@@ -0,0 +1,59 @@
+import pytest
+from algosdk import encoding
+from algosdk.future import transaction
+from conftest import FakeAlgod, new_account, new_address
+
+import signing
+from signing import POOL_THRESHOLD, sign_many
+
+
+@pytest.fixture(scope="module", autouse=True)
+def pool():
+    yield
+    signing.shutdown()
+
+
+def payments(senders, count):
+    sp = FakeAlgod().suggested_params()
+    receiver = new_address()
+    return [transaction.PaymentTxn(senders[i % len(senders)], sp, receiver, i) for i in range(count)]
+
+
+def encoded(signed_txns):
+    return [encoding.msgpack_encode(signed_txn) for signed_txn in signed_txns]
+
+
+def test_account_sign_matches_the_sdk():
+    owner = new_account()
+    own, = payments([owner.get_address()], 1)
+    # a slot rekeyed to the owner, signed by the owner's key
+    rekeyed, = payments([new_address()], 1)
+
+    assert encoded([owner.sign(own)]) == encoded([own.sign(owner.get_private_key())])
+    assert owner.sign(own).authorizing_address is None
+    expected = rekeyed.sign(owner.get_private_key())
+    expected.authorizing_address = owner.get_address()
+    assert encoded([owner.sign(rekeyed)]) == encoded([expected])
+
+
+@pytest.mark.parametrize("count, workers", [(10, None), (POOL_THRESHOLD + 10, 1), (POOL_THRESHOLD + 10, 2)],
+                         ids=["inline", "inline-one-worker", "process-pool"])
+def test_sign_many_matches_the_sdk_byte_for_byte(count, workers):
+    first, second = new_account(), new_account()
+    slot = new_address()
+    txns = payments([first.get_address(), second.get_address(), slot], count)
+    # the slot is rekeyed to `second`, keys given as private keys or accounts
+    signers = [first.get_private_key(), second, second] * count
+    pairs = list(zip(txns, signers))
+
+    signed = sign_many(pairs, workers=workers)
+
+    expected = []
+    for txn, signer in pairs:
+        key = signer if isinstance(signer, str) else signer.get_private_key()
+        signed_txn = txn.sign(key)
+        if txn.sender == slot:
+            signed_txn.authorizing_address = second.get_address()
+        expected.append(signed_txn)
+    assert encoded(signed) == encoded(expected)
+    assert [signed_txn.authorizing_address for signed_txn in signed[:3]] == [None, None, second.get_address()]
@@ -0,0 +1,197 @@
+import time
+
+import pytest
+from conftest import new_account, new_address
+
+from registry import OCCUPIED, OPTED_IN, RekeyedAddressRegistry
+from slots import SlotPool, slot_index, take_free_slot
+from utils import generate_rekeyed_addresses, optin_app_rekeyed_addresses
+
+APP_ID = 42
+TOKEN_KEY = b"TK_ID"
+
+
+def add_free_slots(algod, registry, owner, count):
+    slots = [new_address() for _ in range(count)]
+    for slot in slots:
+        registry.add(owner.get_address(), slot, APP_ID, OPTED_IN)
+        algod.accounts[slot] = {"address": slot, "amount": 0, "apps-local-state": [{"id": APP_ID}]}
+    return slots
+
+
+def test_free_slots_are_claimed_oldest_first(algod, registry):
+    owner = new_account()
+    first, second = add_free_slots(algod, registry, owner, 2)
+
+    assert take_free_slot(algod, owner, APP_ID, TOKEN_KEY, 0) == first
+    assert take_free_slot(algod, owner, APP_ID, TOKEN_KEY, 0) == second
+    assert registry.leased(owner.get_address(), APP_ID) == [first, second]
+    assert slot_index.counts(owner.get_address(), APP_ID)["free"] == 0
+
+
+def test_slot_leased_by_another_worker_is_usable_once_released(algod, registry):
+    owner = new_account()
+    leased, free = add_free_slots(algod, registry, owner, 2)
+    other_worker = RekeyedAddressRegistry(registry.path, legacy_json=None)
+    assert other_worker.claim(owner.get_address(), leased, APP_ID, holder="worker-2")
+
+    assert take_free_slot(algod, owner, APP_ID, TOKEN_KEY, 0) == free
+    # the refused slot is not parked as occupied
+    assert slot_index.counts(owner.get_address(), APP_ID)["free"] == 1
+
+    other_worker.release(leased, APP_ID, holder="worker-2")
+    assert take_free_slot(algod, owner, APP_ID, TOKEN_KEY, 0) == leased
+    other_worker.close()
+
+
+def test_occupy_and_release_are_shared_through_the_registry(algod, registry):
+    owner = new_account()
+    slot, = add_free_slots(algod, registry, owner, 1)
+
+    assert take_free_slot(algod, owner, APP_ID, TOKEN_KEY, 0) == slot
+    slot_index.occupy(owner.get_address(), APP_ID, slot)
+    assert registry.status(owner.get_address(), slot, APP_ID) == OCCUPIED
+    assert registry.leased(owner.get_address(), APP_ID) == []
+    assert not registry.claim(owner.get_address(), slot, APP_ID, holder="worker-2")
+
+    slot_index.release(APP_ID, slot)
+    assert registry.status(owner.get_address(), slot, APP_ID) == OPTED_IN
+    assert registry.claim(owner.get_address(), slot, APP_ID, holder="worker-2")
+
+
+def test_lease_of_a_pending_claim_is_renewed_past_its_ttl(algod, registry):
+    owner = new_account()
+    slot, = add_free_slots(algod, registry, owner, 1)
+    slot_index.lease_ttl = 0.2
+    other_worker = RekeyedAddressRegistry(registry.path, legacy_json=None)
+
+    # the transaction using the slot takes longer than the lease's ttl to confirm
+    assert take_free_slot(algod, owner, APP_ID, TOKEN_KEY, 0) == slot
+    time.sleep(0.5)
+    assert registry.leased(owner.get_address(), APP_ID) == [slot]
+    assert not other_worker.claim(owner.get_address(), slot, APP_ID, holder="worker-2")
+
+    slot_index.release(APP_ID, slot)
+    time.sleep(0.1)
+    assert other_worker.claim(owner.get_address(), slot, APP_ID, holder="worker-2")
+    # released leases are no longer renewed, nor taken back
+    assert slot_index.leases == set()
+    other_worker.close()
+
+
+def test_slots_are_generated_five_per_group_in_one_round(algod, registry):
+    funder = new_account()
+    send_rounds = []
+    algod.on_send = lambda txns: send_rounds.append(algod.round)
+
+    slots = generate_rekeyed_addresses(algod, funder, APP_ID, 50_000, 7)
+
+    # fund, rekey and opt in per slot, every group sent before the first is waited for
+    assert [len(group) for group in algod.sent] == [15, 6]
+    assert send_rounds == [10, 10]
+    txns = [txn for group in algod.sent for txn in group]
+    for slot, (fund, rekey, optin) in zip(slots, zip(*[iter(txns)] * 3)):
+        assert (fund.transaction.sender, fund.transaction.receiver, fund.transaction.amt) == \
+            (funder.get_address(), slot, 100_000 + 50_000 + 1_000)
+        assert fund.authorizing_address is None
+        # the rekey is signed by the slot's own key, the opt-in already by the funder
+        assert (rekey.transaction.sender, rekey.transaction.receiver, rekey.transaction.amt) == (slot, slot, 0)
+        assert rekey.transaction.rekey_to == funder.get_address() and rekey.authorizing_address is None
+        assert optin.transaction.sender == slot and optin.transaction.index == APP_ID
+        assert optin.authorizing_address == funder.get_address()
+    for group in algod.sent:
+        assert len({txn.transaction.group for txn in group}) == 1
+    assert registry.addresses(funder.get_address(), APP_ID, OPTED_IN) == slots
+
+
+def test_slots_of_sent_groups_are_recorded_when_a_later_group_fails(algod, registry):
+    funder = new_account()
+
+    def drop_second_group(txns):
+        if algod.sent:
+            raise ConnectionError("connection reset")
+
+    algod.on_send = drop_second_group
+
+    with pytest.raises(ConnectionError):
+        generate_rekeyed_addresses(algod, funder, APP_ID, 0, 6)
+    sent, = algod.sent
+    assert registry.addresses(funder.get_address(), APP_ID) == [txn.transaction.sender for txn in sent[1::3]]
+
+
+def test_rekeyed_slots_are_opted_in_eight_per_group(algod, registry):
+    owner = new_account()
+    slots = [new_address() for _ in range(9)]
+
+    optin_app_rekeyed_addresses(algod, APP_ID, owner, slots, 50_000)
+
+    assert [len(group) for group in algod.sent] == [16, 2]
+    txns = [txn for group in algod.sent for txn in group]
+    for slot, (charge, optin) in zip(slots, zip(*[iter(txns)] * 2)):
+        assert (charge.transaction.sender, charge.transaction.receiver, charge.transaction.amt) == \
+            (owner.get_address(), slot, 50_000)
+        assert optin.transaction.sender == slot and optin.authorizing_address == owner.get_address()
+
+
+def wait_until(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.01)
+
+
+def test_fill_tops_up_to_high_once_below_low(algod, registry):
+    owner = new_account()
+    pool = SlotPool(algod, low=2, high=5)
+    pool.watch(owner, APP_ID, TOKEN_KEY, 0)
+    key = (owner.get_address(), APP_ID)
+
+    assert pool.fill(key) == 5
+    # all the missing slots in one round
+    assert [len(group) for group in algod.sent] == [15]
+    for _ in range(3):
+        take_free_slot(algod, owner, APP_ID, TOKEN_KEY, 0)
+    assert pool.fill(key) == 0
+
+    take_free_slot(algod, owner, APP_ID, TOKEN_KEY, 0)
+    assert pool.fill(key) == 4
+    assert slot_index.counts(*key)["free"] == 5
+    assert pool.stats()[key]["provisioned"] == 9
+
+
+def test_pool_refills_in_the_background_and_counts_hits_and_misses(algod, registry):
+    owner = new_account()
+    key = (owner.get_address(), APP_ID)
+    # only a taken slot wakes the thread up after the first fill
+    pool = SlotPool(algod, low=1, high=2, interval=60).start()
+    try:
+        pool.watch(owner, APP_ID, TOKEN_KEY, 0)
+        wait_until(lambda: slot_index.counts(*key)["free"] == 2)
+
+        take_free_slot(algod, owner, APP_ID, TOKEN_KEY, 0)
+        take_free_slot(algod, owner, APP_ID, TOKEN_KEY, 0)
+        wait_until(lambda: slot_index.counts(*key)["free"] == 2)
+    finally:
+        pool.stop()
+
+    stats = pool.stats()[key]
+    assert (stats["hits"], stats["misses"], stats["errors"]) == (2, 0, 0)
+    assert stats["provisioned"] == 4
+
+    # once stopped, nothing refills the slots taken
+    take_free_slot(algod, owner, APP_ID, TOKEN_KEY, 0)
+    take_free_slot(algod, owner, APP_ID, TOKEN_KEY, 0)
+    take_free_slot(algod, owner, APP_ID, TOKEN_KEY, 0)
+    time.sleep(0.1)
+    assert slot_index.counts(*key)["free"] == 0
+    assert pool.stats()[key]["misses"] == 1
+
+
+def test_stop_ends_the_pool_thread(algod, registry):
+    pool = SlotPool(algod, interval=60).start()
+    thread = pool.thread
+    pool.stop()
+
+    thread.join(timeout=5)
+    assert not thread.is_alive()
+    assert pool.thread is None
@@ -0,0 +1,37 @@
+import pytest
+from algosdk import encoding
+from algosdk.logic import get_application_address
+from conftest import global_state, layout, new_account, new_address
+
+from swap import operations
+
+APP_ID = 44
+OFFERED, ASKED = 100, 200
+
+
+@pytest.mark.parametrize("opted_in, expected", [
+    (False, [f"optin {OFFERED}", "axfer", f"{APP_ID} accept"]),
+    (True, ["axfer", f"{APP_ID} accept"]),
+], ids=["first-swap", "opted-in"])
+def test_accept_swap_folds_the_missing_opt_in_into_its_group(algod, registry, opted_in, expected):
+    algod.apps[APP_ID] = {"creator": new_address(), "global-state": global_state(
+        SA_ADDR=encoding.decode_address(new_address()), TW_ADDR=encoding.decode_address(new_address()),
+    )}
+    app_address = get_application_address(APP_ID)
+    algod.accounts[app_address] = {"address": app_address, "amount": 1_000_000,
+                                   "assets": [{"asset-id": OFFERED, "amount": 1}, {"asset-id": ASKED, "amount": 0}]}
+    index = new_address()
+    algod.accounts[index] = {"address": index, "amount": 0, "apps-local-state": [{"id": APP_ID, "key-value": global_state(
+        O_ADDR=encoding.decode_address(new_address()), O_TKID=OFFERED, O_AMT=1, A_TKID=ASKED, A_AMT=5,
+    )}]}
+    accepter = new_account()
+    assets = [{"asset-id": ASKED, "amount": 5}] + ([{"asset-id": OFFERED, "amount": 0}] if opted_in else [])
+    algod.accounts[accepter.get_address()] = {"address": accepter.get_address(), "amount": 1_000_000,
+                                              "assets": assets}
+
+    operations.accept_swap(algod, APP_ID, accepter, index)
+
+    group, = algod.sent
+    # the accept call reads the asset transfer right before it
+    assert layout(group) == expected
+    assert len({txn.transaction.group for txn in group}) == 1
@@ -0,0 +1,71 @@
+import pytest
+from conftest import new_account, new_address
+
+import sweeper
+from registry import CLOSED, OPTED_IN, RekeyedAddressRegistry
+from slots import SlotIndex, slot_index, take_free_slot
+from sweeper import CapacityPolicy, Sweeper
+
+APP_ID = 42
+TOKEN_KEY = b"TK_ID"
+
+
+@pytest.fixture
+def slots(algod, registry):
+    """An owner with three free slots of APP_ID, rekeyed to it."""
+    owner = new_account()
+    addresses = [new_address() for _ in range(3)]
+    for address in addresses:
+        registry.add(owner.get_address(), address, APP_ID, OPTED_IN)
+        algod.accounts[address] = {"address": address, "amount": 300_000, "auth-addr": owner.get_address(),
+                                   "apps-local-state": [{"id": APP_ID}]}
+    return owner, addresses
+
+
+def test_sweep_closes_the_newest_slots_above_the_policy(algod, registry, slots):
+    owner, addresses = slots
+    closed = Sweeper(algod, {APP_ID: TOKEN_KEY}, CapacityPolicy(min_free=1)).sweep(owner)
+
+    assert sorted(closed) == sorted(addresses[1:])
+    group, = algod.sent
+    # a clear state and a closing payment per slot, signed by the owner
+    assert [txn.transaction.type for txn in group] == ["appl", "pay", "appl", "pay"]
+    assert all(txn.authorizing_address == owner.get_address() for txn in group)
+    assert registry.addresses(owner.get_address(), APP_ID) == addresses[:1]
+    assert registry.leased(owner.get_address(), APP_ID) == []
+
+
+def test_sweep_skips_slots_leased_or_holding_a_listing(algod, registry, slots):
+    owner, addresses = slots
+    assert registry.claim(owner.get_address(), addresses[2], APP_ID, holder="worker-2")
+    algod.accounts[addresses[1]]["apps-local-state"] = [
+        {"id": APP_ID, "key-value": [{"key": "VEtfSUQ=", "value": {"type": 2, "uint": 7}}]}
+    ]
+
+    assert Sweeper(algod, {APP_ID: TOKEN_KEY}, CapacityPolicy(min_free=0)).sweep(owner) == [addresses[0]]
+
+
+def test_slot_swept_by_another_process_cannot_be_claimed(algod, registry, slots, monkeypatch):
+    owner, addresses = slots
+    # this process loaded its index before the other one swept
+    slot_index.load(algod, owner.get_address(), APP_ID, TOKEN_KEY)
+    monkeypatch.setattr(sweeper, "slot_index", SlotIndex())
+    closed = Sweeper(algod, {APP_ID: TOKEN_KEY}, CapacityPolicy(min_free=1)).sweep(owner)
+    assert slot_index.counts(owner.get_address(), APP_ID)["free"] == 3
+
+    other_process = RekeyedAddressRegistry(registry.path, legacy_json=None)
+    for address in closed:
+        assert other_process.status(owner.get_address(), address, APP_ID) == CLOSED
+        assert not other_process.claim(owner.get_address(), address, APP_ID, holder="worker-2")
+        assert not other_process.claim(owner.get_address(), address, APP_ID + 1, holder="worker-2")
+    other_process.close()
+
+    assert take_free_slot(algod, owner, APP_ID, TOKEN_KEY, 0) == addresses[0]
+    algod.sent.clear()
+    # the closed slots are dropped, the next listing gets a new slot
+    slot = take_free_slot(algod, owner, APP_ID, TOKEN_KEY, 0)
+    assert slot not in addresses
+    assert algod.sent
+    assert slot_index.counts(owner.get_address(), APP_ID) == {
+        "free": 0, "unjoined": 0, "occupied": 2, "hits": 1, "misses": 1,
+    }
@@ -0,0 +1,77 @@
+import pytest
+from algosdk import encoding
+from conftest import global_state, layout, new_account, new_address
+
+from pending import PendingBatch
+from registry import OCCUPIED, OPTED_IN
+from trading import operations
+
+APP_ID = 43
+STORE_APP_ID = 7
+
+
+@pytest.fixture
+def seller(algod, registry):
+    seller = new_account()
+    algod.apps[APP_ID] = {"creator": new_address(), "global-state": global_state(SA_ID=STORE_APP_ID)}
+    algod.accounts[seller.get_address()] = {"address": seller.get_address(), "amount": 10_000_000,
+                                            "apps-local-state": [{"id": STORE_APP_ID}]}
+    for _ in range(4):
+        slot = new_address()
+        registry.add(seller.get_address(), slot, APP_ID, OPTED_IN)
+        algod.accounts[slot] = {"address": slot, "amount": 0, "apps-local-state": [{"id": APP_ID}]}
+    return seller
+
+
+ITEMS = [(100, 1, 5_000_000), (101, 1, 6_000_000), (100, 1, 7_000_000)]
+
+
+def test_place_trades_sets_up_each_token_once(algod, registry, seller):
+    receipts = operations.place_trades(algod, APP_ID, seller, ITEMS)
+
+    # two asset setups, then one group per trade
+    assert len(algod.sent) == 5
+    assert all(receipt.ok for receipt in receipts)
+    assert len({receipt.index for receipt in receipts}) == 3
+    for receipt in receipts:
+        assert registry.status(seller.get_address(), receipt.index, APP_ID) == OCCUPIED
+
+
+def test_place_trades_without_waiting_returns_once_sent(algod, registry, seller):
+    batch = operations.place_trades(algod, APP_ID, seller, ITEMS, pack=True, wait=False)
+
+    assert isinstance(batch, PendingBatch)
+    receipts = batch.value
+    assert all(receipt.tx_id is not None and receipt.round is None for receipt in receipts)
+    assert len(batch.handles) == 1
+
+    batch.result(timeout=5)
+    assert all(receipt.ok for receipt in receipts)
+    for receipt in receipts:
+        assert registry.status(seller.get_address(), receipt.index, APP_ID) == OCCUPIED
+
+
+@pytest.mark.parametrize("opted_in, expected", [
+    (False, [f"optin {STORE_APP_ID}", "optin 100", "pay", f"{APP_ID} accept", f"{STORE_APP_ID} buy"]),
+    (True, ["pay", f"{APP_ID} accept", f"{STORE_APP_ID} buy"]),
+], ids=["first-purchase", "opted-in"])
+def test_accept_trade_folds_the_missing_opt_ins_into_its_group(algod, seller, opted_in, expected):
+    algod.apps[APP_ID]["global-state"] = global_state(SA_ID=STORE_APP_ID,
+                                                      SA_ADDR=encoding.decode_address(new_address()),
+                                                      TW_ADDR=encoding.decode_address(new_address()))
+    index = new_address()
+    algod.accounts[index] = {"address": index, "amount": 0, "apps-local-state": [
+        {"id": APP_ID, "key-value": global_state(TK_ID=100, TA=1, TP=5_000_000)},
+    ]}
+    buyer = new_account()
+    algod.accounts[buyer.get_address()] = {"address": buyer.get_address(), "amount": 10_000_000}
+    if opted_in:
+        algod.accounts[buyer.get_address()].update(assets=[{"asset-id": 100, "amount": 0}],
+                                                   **{"apps-local-state": [{"id": STORE_APP_ID}]})
+
+    operations.accept_trade(algod, APP_ID, buyer, seller.get_address(), index)
+
+    group, = algod.sent
+    # the accept call reads the payment right before it, the store call the accept call
+    assert layout(group) == expected
+    assert len({txn.transaction.group for txn in group}) == 1
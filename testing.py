@@ -5,13 +5,13 @@ from algosdk.v2client.algod import AlgodClient
 from algosdk.future import transaction
 
 from account import Account
-from utils import get_algod_client, wait_for_confirmation
+from utils import get_algod_client, get_suggested_params, wait_for_confirmation
 
 
 def create_dummy_asset(client: AlgodClient, sender: Account, total: int, decimals: int, asset_name: str, unit_name: str):
     txn = transaction.AssetConfigTxn(
         sender=sender.get_address(),
-        sp=client.suggested_params(),
+        sp=get_suggested_params(client),
         total=total,
         decimals=decimals,
         asset_name=asset_name,
@@ -22,7 +22,7 @@ def create_dummy_asset(client: AlgodClient, sender: Account, total: int, decimal
         freeze=sender.get_address(),
         clawback=sender.get_address()
     )
-    signed_txn = txn.sign(sender.get_private_key())
+    signed_txn = sender.sign(txn)
 
     client.send_transaction(signed_txn)
 
@@ -0,0 +1,10 @@
+from . import operations
+
+
+create_trading_app = operations.create_trading_app.aio
+setup_trading_app = operations.setup_trading_app.aio
+place_trade = operations.place_trade.aio
+place_trades = operations.place_trades.aio
+cancel_trade = operations.cancel_trade.aio
+accept_trade = operations.accept_trade.aio
+close_trading = operations.close_trading.aio
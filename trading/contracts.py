@@ -184,16 +184,17 @@ def approval_program():
         Approve(),
     )
 
+    on_setup_pay_txn_index = Txn.group_index() - Int(1)
     on_setup = Seq(
         # opt into NFT asset -- because you can't opt in if you're already opted in, this is what
         # we'll use to make sure the contract has been set up
         Assert(
             And(
                 # the payment for optin assest is before the app call
-                Gtxn[0].type_enum() == TxnType.Payment,
-                Gtxn[0].sender() == Txn.sender(),
-                Gtxn[0].receiver() == Global.current_application_address(),
-                Gtxn[0].amount() >= Global.min_balance(),
+                Gtxn[on_setup_pay_txn_index].type_enum() == TxnType.Payment,
+                Gtxn[on_setup_pay_txn_index].sender() == Txn.sender(),
+                Gtxn[on_setup_pay_txn_index].receiver() == Global.current_application_address(),
+                Gtxn[on_setup_pay_txn_index].amount() >= Global.min_balance(),
                 
                 Txn.assets.length() == Int(1),
                 Txn.assets[0] > Int(0),
@@ -204,12 +205,13 @@ def approval_program():
         Approve(),
     )
 
+    on_trade_asset_txn_index = Txn.group_index() - Int(1)
     on_trade = Seq(
         Assert(
             And(
                 # the actual asset transfer is before the app call
-                Gtxn[0].type_enum() == TxnType.AssetTransfer,
-                Gtxn[0].asset_receiver() == Global.current_application_address(),
+                Gtxn[on_trade_asset_txn_index].type_enum() == TxnType.AssetTransfer,
+                Gtxn[on_trade_asset_txn_index].asset_receiver() == Global.current_application_address(),
                 
                 # price
                 Txn.application_args.length() == Int(2),
@@ -220,11 +222,11 @@ def approval_program():
                 Or(
                     And(
                         Txn.assets.length() == Int(1),
-                        Gtxn[0].fee() >= Int(2) * Global.min_txn_fee()
+                        Gtxn[on_trade_asset_txn_index].fee() >= Int(2) * Global.min_txn_fee()
                     ),
                     And(
                         Txn.assets.length() == Int(2),
-                        Gtxn[0].fee() >= Int(3) * Global.min_txn_fee()
+                        Gtxn[on_trade_asset_txn_index].fee() >= Int(3) * Global.min_txn_fee()
                     )
                 ),
                 
@@ -233,7 +235,7 @@ def approval_program():
             )
         ),
         handle_trading(Txn.sender(), Txn.accounts[1], Txn.assets[0], 
-                       Gtxn[0].asset_amount(), Btoi(Txn.application_args[1])),
+                       Gtxn[on_trade_asset_txn_index].asset_amount(), Btoi(Txn.application_args[1])),
         Approve(),
     )
     
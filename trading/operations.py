@@ -1,6 +1,7 @@
+import copy
 import os
 
-from typing import Tuple, List
+from typing import Iterable, List, Tuple
 
 from algosdk import encoding
 from algosdk.constants import MIN_TXN_FEE
@@ -9,9 +10,24 @@ from algosdk.logic import get_application_address
 from algosdk.v2client.algod import AlgodClient
 from nacl import utils
 
+import aio
 from account import Account
+from artifacts import prebuilt_contracts
+from hooks import emit, operation
+from packer import GroupPacker
+from pending import confirm
+from receipts import Receipt
+from slots import slot_index
 from utils import *
-from .contracts import approval_program, clear_state_program
+
+
+GLOBAL_SCHEMA = transaction.StateSchema(num_uints=1, num_byte_slices=2)
+LOCAL_SCHEMA = transaction.StateSchema(num_uints=3, num_byte_slices=1)
+
+# a slot (rekeyed address) is free while its local TK_ID is 0
+SLOT_TOKEN_KEY = b"TK_ID"
+# min balance the slot needs to opt into the app
+SLOT_OPTIN_PRICE = 100000 + 28500 * 3 + 50000 * 1 + 1000
 
 
 def get_contracts(client: AlgodClient) -> Tuple[bytes, bytes]:
@@ -24,13 +40,20 @@ def get_contracts(client: AlgodClient) -> Tuple[bytes, bytes]:
         A tuple of 2 byte strings. The first is the approval program, and the
         second is the clear state program.
     """
-    approval = fully_compile_contract(client, approval_program())
-    clear_state = fully_compile_contract(client, clear_state_program())
+    contracts = prebuilt_contracts("trading")
+    if contracts is not None:
+        return contracts
+
+    from .contracts import approval_program, clear_state_program
+
+    approval = fully_compile_contract(client, approval_program)
+    clear_state = fully_compile_contract(client, clear_state_program)
 
     return approval, clear_state
 
 
-def create_trading_app(
+@operation
+async def create_trading_app(
     client: AlgodClient,
     creator: Account,
     store_app_id: int,
@@ -53,28 +76,25 @@ def create_trading_app(
     Returns:
         The ID of the newly created trading app.
     """
-    approval, clear = get_contracts(client)
+    approval, clear = await aio.offload(get_contracts, client)
 
-    global_schema = transaction.StateSchema(num_uints=1, num_byte_slices=2)
-    local_schema = transaction.StateSchema(num_uints=3, num_byte_slices=1)
-    
-    sp = client.suggested_params()
+    sp = await aio.get_suggested_params(client)
 
     txn = transaction.ApplicationCreateTxn(
         sender=creator.get_address(),
         on_complete=transaction.OnComplete.NoOpOC,
         approval_program=approval,
         clear_program=clear,
-        global_schema=global_schema,
-        local_schema=local_schema,
+        global_schema=GLOBAL_SCHEMA,
+        local_schema=LOCAL_SCHEMA,
         app_args=[],
         foreign_apps=[store_app_id],
         accounts=[staking_address, team_wallet_address],
         sp=sp,
     )
-    signed_txn = txn.sign(creator.get_private_key())
-    client.send_transaction(signed_txn)
-    response = wait_for_confirmation(client, signed_txn.get_txid())
+    signed_txn = creator.sign(txn)
+    await aio.call(client.send_transaction(signed_txn))
+    response = await aio.wait_for_confirmation(client, signed_txn.get_txid())
     assert response.application_index is not None and response.application_index > 0
     
     app_id = response.application_index
@@ -93,14 +113,44 @@ def create_trading_app(
         amt=initial_funding_amount,
         sp=sp,
     )
-    signed_initial_fund_app_txn = initial_fund_app_txn.sign(creator.get_private_key())
-    client.send_transaction(signed_initial_fund_app_txn)
-    wait_for_confirmation(client, initial_fund_app_txn.get_txid())
+    signed_initial_fund_app_txn = creator.sign(initial_fund_app_txn)
+    await aio.call(client.send_transaction(signed_initial_fund_app_txn))
+    await confirm(client, initial_fund_app_txn)
     
     return app_id
 
 
-def setup_trading_app(
+def setup_trading_txns(app_id: int, funder: str, token_id: int, sp: transaction.SuggestedParams) -> List[transaction.Transaction]:
+    """The grouped payment and setup call opting the trading app into `token_id`."""
+    app_address = get_application_address(app_id)
+    params = copy.copy(sp)
+    
+    funding_amount = (
+        # opt into asset min balance
+        + 100_000
+    )
+    pay_txn = transaction.PaymentTxn(
+        sender=funder,
+        receiver=app_address,
+        amt=funding_amount,
+        sp=params,
+    )
+    params.fee = 2000 # including min txn fee for in app opt into asset
+        
+    setup_txn = transaction.ApplicationCallTxn(
+        sender=funder,
+        index=app_id,
+        on_complete=transaction.OnComplete.NoOpOC,
+        app_args=[b"setup"],
+        foreign_assets=[token_id],
+        sp=params,
+    )
+
+    return transaction.assign_group_id([pay_txn, setup_txn])
+
+
+@operation
+async def setup_trading_app(
     client: AlgodClient,
     app_id: int,
     funder: Account,
@@ -122,40 +172,61 @@ def setup_trading_app(
         token_id: The NFT ID.
     """
     
+    pay_txn, setup_txn = setup_trading_txns(app_id, funder.get_address(), token_id, await aio.get_suggested_params(client))
+    signed_pay_txn = funder.sign(pay_txn)
+    signed_setup_txn = funder.sign(setup_txn)
+    
+    await aio.call(client.send_transactions([signed_pay_txn, signed_setup_txn]))
+    await confirm(client, signed_setup_txn)
+    
+    
+def trade_txns(
+    app_id: int,
+    seller: str,
+    token_id: int,
+    token_amount: int,
+    price: int,
+    trading_index: str,
+    sp: transaction.SuggestedParams,
+    replaced_token_id: int = 0,
+) -> List[transaction.Transaction]:
+    """The grouped asset transfer and trade call listing `token_amount` of `token_id` in `trading_index`.
+
+    `replaced_token_id` is the token of the trade being replaced, if any, the
+    app returns it with an inner transaction paid by the asset transfer.
+    """
     app_address = get_application_address(app_id)
-    params = client.suggested_params()
+    suggested_params = copy.copy(sp)
+    suggested_params.fee = 2 * 1_000
+    tokens = [token_id]
+    if replaced_token_id:
+        tokens.append(replaced_token_id)
+        suggested_params.fee = 3 * 1_000 # add inner returning asset txn fee    
     
-    funding_amount = (
-        # opt into asset min balance
-        + 100_000
-    )
-    pay_txn = transaction.PaymentTxn(
-        sender=funder.get_address(),
+    token_txn = transaction.AssetTransferTxn(
+        sender=seller,
         receiver=app_address,
-        amt=funding_amount,
-        sp=params,
+        index=token_id,
+        amt=token_amount,
+        sp=suggested_params,
     )
-    params.fee = 2000 # including min txn fee for in app opt into asset
-        
-    setup_txn = transaction.ApplicationCallTxn(
-        sender=funder.get_address(),
+
+    suggested_params.fee = 0
+    app_call_txn = transaction.ApplicationCallTxn(
+        sender=seller,
         index=app_id,
         on_complete=transaction.OnComplete.NoOpOC,
-        app_args=[b"setup"],
-        foreign_assets=[token_id],
-        sp=params,
+        app_args=[b"trade", price.to_bytes(8, "big")],
+        accounts=[trading_index],
+        foreign_assets=tokens,
+        sp=suggested_params,
     )
 
-    transaction.assign_group_id([pay_txn, setup_txn])
-    
-    signed_pay_txn = pay_txn.sign(funder.get_private_key())
-    signed_setup_txn = setup_txn.sign(funder.get_private_key())
-    
-    client.send_transactions([signed_pay_txn, signed_setup_txn])
-    wait_for_confirmation(client, signed_setup_txn.get_txid())
-    
-    
-def place_trade(client: AlgodClient, app_id: int, seller: Account, token_id: int, token_amount: int, price: int, trading_index: str) -> None:
+    return transaction.assign_group_id([token_txn, app_call_txn])
+
+
+@operation
+async def place_trade(client: AlgodClient, app_id: int, seller: Account, token_id: int, token_amount: int, price: int, trading_index: str) -> None:
     """Place or replace a trade on an active trading.
 
     Args:
@@ -167,90 +238,137 @@ def place_trade(client: AlgodClient, app_id: int, seller: Account, token_id: int
         trading_index: Index for replace trade.
     """
     app_address = get_application_address(app_id)
-    app_global_state = get_app_global_state(client, app_id)
-    suggested_params = client.suggested_params()
+    app_global_state = await aio.get_app_global_state(client, app_id)
+    suggested_params = await aio.get_suggested_params(client)
     
     # optin store app for saving information    
     store_app_id = app_global_state[b"SA_ID"]
-    print(f"store_app_id", store_app_id)
-    if is_opted_in_app(client, store_app_id, seller.get_address()) == False:
-        print(f"seller {seller.get_address()} opt in app {store_app_id}")
-        optin_app(client, store_app_id, seller)
+    if await aio.is_opted_in_app(client, store_app_id, seller.get_address()) == False:
+        await aio.optin_app(client, store_app_id, seller)
         
     # app optin asset for receiving the asset
-    if is_opted_in_asset(client, token_id, app_address) == False:
-        setup_trading_app(client=client, app_id=app_id, funder=seller, token_id=token_id)
+    if await aio.is_opted_in_asset(client, token_id, app_address) == False:
+        await setup_trading_app.aio(client=client, app_id=app_id, funder=seller, token_id=token_id)
     
-    suggested_params.fee = 2 * 1_000
-    tokens = [token_id]
+    replaced_token_id = 0
     n_address = trading_index
     # if bid_index is empty, find a usable(if the bid app local state's token id is 0) rekeyed address used in the past, 
     if not n_address:
-        unused_rekeyed_address = ""
-        rekeyed_addresses = get_rekeyed_addresses(seller.get_address()) # we can get this from network
-        for rekeyed_address in rekeyed_addresses:
-            if is_opted_in_app(client, app_id, rekeyed_address):
-                state = get_app_local_state(client, app_id, rekeyed_address)
-                print(f"local state of {rekeyed_address} :", state)
-                if b"TK_ID" in state and state[b"TK_ID"] == 0:
-                    unused_rekeyed_address = rekeyed_address
-                    
-                if state[b"TK_ID"] > 0 and state[b"TA"] > 0:
-                    suggested_params.fee = 3 * 1_000 # add inner returning asset txn fee
-                    
-            else:
-                # might have rekeyed address already but not optin app, we can use it
-                unused_rekeyed_address = rekeyed_address
-                optin_price = 100000 + 28500 * 3 + 50000 * 1 + 1000
-                charge_optin_price(client, seller, unused_rekeyed_address, optin_price)
-                optin_app_rekeyed_address(client, app_id, seller, unused_rekeyed_address)
-                break
-        
-        # if not found, create one, and optin app for local state
-        n_address = unused_rekeyed_address
-        if not n_address:
-            optin_price = 100000 + 28500 * 3 + 50000 * 1 + 1000
-            n_address = generate_rekeyed_address(client, seller, app_id, optin_price)
-            optin_app_rekeyed_address(client, app_id, seller, n_address)
-            set_rekeyed_address(seller.get_address(), n_address, 1)
+        n_address = await aio.take_free_slot(client, seller, app_id, SLOT_TOKEN_KEY, SLOT_OPTIN_PRICE)
     else:
-        state = get_app_local_state(client, app_id, trading_index)
+        state = await aio.get_app_local_state(client, app_id, trading_index)
         if b"TK_ID" in state and state[b"TK_ID"] > 0 and state[b"TA"] > 0:
-            tokens.append(state[b"TK_ID"])
-            suggested_params.fee = 3 * 1_000 # add inner returning asset txn fee    
+            replaced_token_id = state[b"TK_ID"]
     
-    token_txn = transaction.AssetTransferTxn(
-        sender=seller.get_address(),
-        receiver=app_address,
-        index=token_id,
-        amt=token_amount,
-        sp=suggested_params,
+    token_txn, app_call_txn = trade_txns(
+        app_id, seller.get_address(), token_id, token_amount, price, n_address, suggested_params, replaced_token_id
     )
-    print(f"token_txn: {token_txn}")
+    emit("txns_built", txns=[token_txn, app_call_txn])
+    
+    signed_token_txn = seller.sign(token_txn)
+    signed_app_call_txn = seller.sign(app_call_txn)
 
-    suggested_params.fee = 0
-    app_call_txn = transaction.ApplicationCallTxn(
-        sender=seller.get_address(),
-        index=app_id,
-        on_complete=transaction.OnComplete.NoOpOC,
-        app_args=[b"trade", price.to_bytes(8, "big")],
-        accounts=[n_address],
-        foreign_assets=tokens,
-        sp=suggested_params,
-    )
+    def on_failed(_):
+        if not trading_index:
+            slot_index.release(app_id, n_address)
 
-    transaction.assign_group_id([token_txn, app_call_txn])
-    
-    signed_token_txn = token_txn.sign(seller.get_private_key())
-    signed_app_call_txn = app_call_txn.sign(seller.get_private_key())
+    try:
+        await aio.call(client.send_transactions([signed_token_txn, signed_app_call_txn]))
+    except Exception as e:
+        on_failed(e)
+        raise
+    await confirm(client, app_call_txn, lambda _: slot_index.occupy(seller.get_address(), app_id, n_address), on_failed)
 
-    client.send_transactions([signed_token_txn, signed_app_call_txn])
-    wait_for_confirmation(client, app_call_txn.get_txid())
-    
     return n_address
-    
-    
-def cancel_trade(client: AlgodClient, app_id: int, seller: Account, trading_index: str) -> bool:
+
+
+@operation
+async def place_trades(
+    client: AlgodClient,
+    app_id: int,
+    seller: Account,
+    items: Iterable[Tuple[int, int, int]],
+    pack: bool = False,
+) -> List[Receipt]:
+    """Place many new trades at once.
+
+    The store app opt-in, the app's asset opt-ins and the slots are resolved
+    for the whole batch first: the missing asset opt-ins are sent together,
+    and the missing slots are provisioned in a single round. Each trade then
+    gets its own group and all of them are sent before waiting, so most land
+    in the same round.
+
+    With `pack`, the setups and the trades are packed 8 per group instead,
+    which needs an app created from the current contract (older ones read
+    the asset transfer at Gtxn[0]). A failed group fails all its trades.
+
+    Args:
+        client: An Algod client.
+        app_id: The app ID of the trading.
+        seller: The account providing the trades.
+        items: (token_id, token_amount, price) of each trade.
+        pack: Share groups between trades.
+
+    Returns:
+        One receipt per item, in order, with the trading index of the trade.
+        A failed item keeps its error in its receipt and the others go on.
+        With `wait=False`, the `pending.PendingBatch` of the trade groups is
+        returned once they are sent (the asset opt-ins still wait), its
+        value is the receipts, filled in as their groups settle.
+    """
+    seller_address = seller.get_address()
+    app_address = get_application_address(app_id)
+    receipts = [Receipt(item=item) for item in items]
+
+    store_app_id = (await aio.get_app_global_state(client, app_id))[b"SA_ID"]
+    if await aio.is_opted_in_app(client, store_app_id, seller_address) == False:
+        await aio.optin_app(client, store_app_id, seller)
+
+    # app optin asset for receiving the assets, one setup per token
+    sp = await aio.get_suggested_params(client)
+    max_size = MAX_GROUP_SIZE if pack else 1
+    setups = GroupPacker(max_size)
+    setup_receipts = dict()
+    for token_id in dict.fromkeys(receipt.item[0] for receipt in receipts):
+        if await aio.is_opted_in_asset(client, token_id, app_address) == False:
+            setup_receipts[token_id] = Receipt(item=token_id)
+            setups.add(setup_receipts[token_id], setup_trading_txns(app_id, seller_address, token_id, sp),
+                       seller)
+    await setups.submit(client)
+    for receipt in receipts:
+        setup = setup_receipts.get(receipt.item[0])
+        if setup is not None and setup.error is not None:
+            receipt.error = setup.error
+
+    pending = [receipt for receipt in receipts if receipt.error is None]
+    slots = await aio.take_free_slots(client, seller, app_id, SLOT_TOKEN_KEY, SLOT_OPTIN_PRICE, len(pending))
+    for receipt, slot in zip(pending, slots):
+        if isinstance(slot, Exception):
+            receipt.error = slot
+        else:
+            receipt.index = slot
+
+    trades = GroupPacker(max_size)
+    for receipt in receipts:
+        if receipt.index is None:
+            continue
+        token_id, token_amount, price = receipt.item
+        txns = trade_txns(app_id, seller_address, token_id, token_amount, price, receipt.index, sp)
+        emit("txns_built", txns=txns)
+        trades.add(receipt, txns, seller)
+
+    def on_settled(receipt: Receipt) -> None:
+        if receipt.ok:
+            slot_index.occupy(seller_address, app_id, receipt.index)
+        else:
+            slot_index.release(app_id, receipt.index)
+
+    await trades.confirm(client, on_settled)
+    return receipts
+
+
+@operation
+async def cancel_trade(client: AlgodClient, app_id: int, seller: Account, trading_index: str) -> bool:
     """Place a trade on an active trading.
 
     Args:
@@ -258,12 +376,12 @@ def cancel_trade(client: AlgodClient, app_id: int, seller: Account, trading_inde
         app_id: The app ID of the trading.
         seller: The account providing the trade.
     """
-    if (is_opted_in_app(client, app_id, trading_index) == False): 
+    if (await aio.is_opted_in_app(client, app_id, trading_index) == False): 
         return False
     
-    seller_app_local_state = get_app_local_state(client, app_id, trading_index)
+    seller_app_local_state = await aio.get_app_local_state(client, app_id, trading_index)
     token_id = seller_app_local_state[b"TK_ID"]
-    suggested_params = client.suggested_params()
+    suggested_params = await aio.get_suggested_params(client)
     suggested_params.fee = 2_000
         
     app_call_txn = transaction.ApplicationCallTxn(
@@ -276,9 +394,9 @@ def cancel_trade(client: AlgodClient, app_id: int, seller: Account, trading_inde
         sp=suggested_params,
     )
     
-    signed_app_call_txn = app_call_txn.sign(seller.get_private_key())
-    client.send_transaction(signed_app_call_txn)
-    wait_for_confirmation(client, app_call_txn.get_txid())    
+    signed_app_call_txn = seller.sign(app_call_txn)
+    await aio.call(client.send_transaction(signed_app_call_txn))
+    await confirm(client, app_call_txn, lambda _: slot_index.release(app_id, trading_index))
     
     # #do we need this store app opt out? cause the seller might wants to trade again later ?
     # app_global_state = get_app_global_state(client, app_id)
@@ -290,7 +408,8 @@ def cancel_trade(client: AlgodClient, app_id: int, seller: Account, trading_inde
     #     return False
 
 
-def accept_trade(client: AlgodClient, app_id: int, buyer: Account, seller: str, trading_index: str) -> None:
+@operation
+async def accept_trade(client: AlgodClient, app_id: int, buyer: Account, seller: str, trading_index: str) -> None:
     """Accept on an active trading.
 
     Args:
@@ -301,29 +420,22 @@ def accept_trade(client: AlgodClient, app_id: int, buyer: Account, seller: str,
         buyer: The account buying the asset.
     """
     app_address = get_application_address(app_id)
-    app_global_state = get_app_global_state(client, app_id)
-    suggested_params = client.suggested_params()
+    app_global_state = await aio.get_app_global_state(client, app_id)
+    suggested_params = await aio.get_suggested_params(client)
 
-    if (is_opted_in_app(client, app_id, trading_index) == False): 
+    if (await aio.is_opted_in_app(client, app_id, trading_index) == False): 
         return False
     
-    seller_app_local_state = get_app_local_state(client, app_id, trading_index)
+    seller_app_local_state = await aio.get_app_local_state(client, app_id, trading_index)
     token_id = seller_app_local_state[b"TK_ID"]
     token_amount = seller_app_local_state[b"TA"]
     trading_price = seller_app_local_state[b"TP"]
-    print(f"token_amount", token_amount)
-    print(f"price", trading_price)
     
     # check if buyer has enough algo
-    if get_balances(client, buyer.get_address())[0] < trading_price:
+    if (await aio.get_balances(client, buyer.get_address()))[0] < trading_price:
         return False
     
     store_app_id = app_global_state[b"SA_ID"]
-    if is_opted_in_app(client, store_app_id, buyer.get_address()) == False:
-        optin_app(client, store_app_id, buyer)
-        
-    if (is_opted_in_asset(client, token_id, buyer.get_address()) == False):
-        optin_asset(client, token_id, buyer)
     
     pay_txn = transaction.PaymentTxn(
         sender=buyer.get_address(),
@@ -355,16 +467,17 @@ def accept_trade(client: AlgodClient, app_id: int, buyer: Account, seller: str,
         accounts=[seller]
     )
     
-    transaction.assign_group_id([pay_txn, app_call_txn, store_app_call_txn])
-    signed_pay_txn = pay_txn.sign(buyer.get_private_key())
-    signed_app_call_txn = app_call_txn.sign(buyer.get_private_key())
-    signed_store_app_call_txn = store_app_call_txn.sign(buyer.get_private_key())
-    
-    client.send_transactions([signed_pay_txn, signed_app_call_txn, signed_store_app_call_txn])
-    wait_for_confirmation(client, app_call_txn.get_txid())
+    # the missing opt-ins ride in the same group, ahead of the calls that need them
+    txns = await aio.optin_txns(client, buyer.get_address(), suggested_params,
+                                app_ids=[store_app_id], asset_ids=[token_id])
+    txns += [pay_txn, app_call_txn, store_app_call_txn]
+    transaction.assign_group_id(txns)
+    await aio.call(client.send_transactions([buyer.sign(txn) for txn in txns]))
+    await confirm(client, app_call_txn, lambda _: slot_index.release(app_id, trading_index))
 
 
-def close_trading(client: AlgodClient, app_id: int, closer: Account, assets: List[int]):
+@operation
+async def close_trading(client: AlgodClient, app_id: int, closer: Account, assets: List[int]):
     """Close an trading.
 
     This action can only happen before an trading has begun, in which case it is
@@ -381,22 +494,20 @@ def close_trading(client: AlgodClient, app_id: int, closer: Account, assets: Lis
         closer: The account initiating the close transaction. This must be
             the trading creator.
     """
-    app_global_state = get_app_global_state(client, app_id)
-
-    print(b"assets", assets)
+    app_global_state = await aio.get_app_global_state(client, app_id)
 
     accounts: List[str] = [encoding.encode_address(app_global_state[b"SA_ADDR"]), 
                            encoding.encode_address(app_global_state[b"TW_ADDR"])]
-    print(b"accounts", accounts)
     
     delete_txn = transaction.ApplicationDeleteTxn(
         sender=closer.get_address(),
         index=app_id,
         accounts=accounts,
         foreign_assets=assets,
-        sp=client.suggested_params(),
+        sp=await aio.get_suggested_params(client),
     )
-    signed_delete_txn = delete_txn.sign(closer.get_private_key())
-    client.send_transaction(signed_delete_txn)
+    emit("txns_built", txns=[delete_txn])
+    signed_delete_txn = closer.sign(delete_txn)
+    await aio.call(client.send_transaction(signed_delete_txn))
 
-    wait_for_confirmation(client, signed_delete_txn.get_txid())
+    await confirm(client, signed_delete_txn)
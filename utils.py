@@ -1,28 +1,101 @@
 from base64 import b64decode, b64encode
-from typing import Dict, Tuple, Union, List, Any, Optional
+from typing import TYPE_CHECKING, Callable, Dict, Tuple, Union, List, Any, Optional
 from algosdk.future import transaction
 
-from algosdk import encoding
-from algosdk.error import AlgodHTTPError
+from algosdk import constants, encoding
+from algosdk.error import AlgodHTTPError, AlgodResponseError
 from algosdk.future.transaction import LogicSigTransaction, assign_group_id
-from algosdk.v2client.algod import AlgodClient
-from pyteal import compileTeal, Expr, Mode
+from algosdk.v2client.algod import AlgodClient, api_version_path_prefix
 
 from account import Account
-from algosdk import account, mnemonic
+from algosdk import account
+from compile_cache import program_cache
+from hooks import emit
+from registry import rekeyed_registry
+from signing import sign_many
 import json
 
 import base64
+import copy
 import hashlib
+import requests
+import threading
+import time
 
+if TYPE_CHECKING:
+    from pyteal import Expr
 
-def get_algod_client(url, token) -> AlgodClient:
+
+def get_algod_client(url, token, pooled: bool = False, pool_size: int = 10, timeout: float = 30) -> AlgodClient:
     headers = {
         'X-API-Key': token
     }
+    if pooled:
+        return PooledAlgodClient(token, url, headers, pool_size=pool_size, timeout=timeout)
     return AlgodClient(token, url, headers)
 
 
+class PooledAlgodClient(AlgodClient):
+    """`AlgodClient` sending every request over a keep-alive connection pool.
+
+    The stock client opens a new connection (and TLS handshake) per request,
+    this one reuses up to `pool_size` connections through a requests session.
+    """
+
+    def __init__(self, algod_token, algod_address, headers=None, pool_size: int = 10, timeout: float = 30) -> None:
+        super().__init__(algod_token, algod_address, headers)
+        self.timeout = timeout
+        self.session = requests.Session()
+        adapter = requests.adapters.HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+    def algod_request(
+        self,
+        method,
+        requrl,
+        params=None,
+        data=None,
+        headers=None,
+        response_format="json",
+    ):
+        header = {"User-Agent": "py-algorand-sdk"}
+
+        if self.headers:
+            header.update(self.headers)
+
+        if headers:
+            header.update(headers)
+
+        if requrl not in constants.no_auth:
+            header.update({constants.algod_auth_header: self.algod_token})
+
+        if requrl not in constants.unversioned_paths:
+            requrl = api_version_path_prefix + requrl
+
+        resp = self.session.request(
+            method, self.algod_address + requrl, params=params, data=data, headers=header, timeout=self.timeout
+        )
+        if resp.status_code >= 400:
+            message = resp.text
+            try:
+                message = json.loads(message)["message"]
+            finally:
+                raise AlgodHTTPError(message, resp.status_code)
+
+        if response_format == "json":
+            try:
+                return resp.json()
+            except Exception as e:
+                raise AlgodResponseError(
+                    "Failed to parse JSON response from algod"
+                ) from e
+        return resp.content
+
+    def close(self) -> None:
+        self.session.close()
+
+
 class PendingTxnResponse:
     def __init__(self, response: Dict[str, Any]) -> None:
         self.poolError: str = response["pool-error"]
@@ -61,7 +134,7 @@ class TransactionGroup:
     def sign_with_private_key(self, account: Account):
         for i, txn in enumerate(self.transactions):
             if txn.sender == account.get_address():
-                self.signed_transactions[i] = txn.sign(account.get_private_key())
+                self.signed_transactions[i] = account.sign(txn)
 
     def submit(self, algod, wait=False):
         try:
@@ -73,34 +146,236 @@ class TransactionGroup:
         return {'txid': txid}
 
 
+class AccountCache:
+    """Snapshots of `account_info` responses keyed by (address, round).
+
+    Account state only changes at round boundaries, so a snapshot taken in
+    the latest round we know about can be reused by every read helper until
+    the chain moves on, or until a confirmed transaction touches the address.
+    Callers get their own copy of a snapshot and may change it freely.
+
+    Rounds belong to one network, there is one cache per algod address (see
+    `get_account_cache`).
+    """
+
+    def __init__(self, max_age: float = 4.0) -> None:
+        # seconds a snapshot is trusted without seeing a newer round, about one block
+        self.max_age = max_age
+        self.last_round = 0
+        self.snapshots: Dict[Tuple[str, int], Dict[str, Any]] = dict()
+        self.rounds: Dict[str, int] = dict()
+        self.fetched_at: Dict[str, float] = dict()
+        self.lock = threading.RLock()
+
+    def get(self, client: AlgodClient, address: str) -> Dict[str, Any]:
+        account_info = self.lookup(address)
+        if account_info is None:
+            account_info = client.account_info(address)
+            self.put(address, account_info)
+        return account_info
+
+    def lookup(self, address: str) -> Optional[Dict[str, Any]]:
+        with self.lock:
+            round_ = self.rounds.get(address)
+            if round_ is not None and round_ >= self.last_round \
+                    and time.monotonic() - self.fetched_at[address] < self.max_age:
+                return copy.deepcopy(self.snapshots[(address, round_)])
+            return None
+
+    def put(self, address: str, account_info: Dict[str, Any]) -> None:
+        with self.lock:
+            round_ = account_info.get("round", self.last_round)
+            self.invalidate(address)
+            self.snapshots[(address, round_)] = copy.deepcopy(account_info)
+            self.rounds[address] = round_
+            self.fetched_at[address] = time.monotonic()
+            self.advance(round_)
+
+    def advance(self, round_: int) -> None:
+        """Record that the chain reached `round_`, older snapshots become stale."""
+        with self.lock:
+            if round_ <= self.last_round:
+                return
+            self.last_round = round_
+            for address, snapshot_round in list(self.rounds.items()):
+                if snapshot_round < round_:
+                    self.invalidate(address)
+
+    def invalidate(self, address: str) -> None:
+        with self.lock:
+            round_ = self.rounds.pop(address, None)
+            if round_ is not None:
+                self.snapshots.pop((address, round_), None)
+                self.fetched_at.pop(address, None)
+
+    def invalidate_txn(self, pending_txn: Dict[str, Any]) -> None:
+        """Drop snapshots of every address touched by a confirmed transaction."""
+        for address in touched_addresses(pending_txn):
+            self.invalidate(address)
+        if pending_txn.get("confirmed-round"):
+            self.advance(pending_txn["confirmed-round"])
+
+    def clear(self) -> None:
+        with self.lock:
+            self.snapshots.clear()
+            self.rounds.clear()
+            self.fetched_at.clear()
+            self.last_round = 0
+
+
+# by algod address, so a client of another network never moves the rounds or serves the accounts of this one
+account_caches: Dict[str, AccountCache] = dict()
+account_caches_lock = threading.Lock()
+
+
+def get_account_cache(client: AlgodClient) -> AccountCache:
+    """The account cache of the node `client` talks to, shared by every client of that node."""
+    with account_caches_lock:
+        cache = account_caches.get(client.algod_address)
+        if cache is None:
+            cache = account_caches[client.algod_address] = AccountCache()
+        return cache
+
+
+def touched_addresses(pending_txn: Dict[str, Any]) -> List[str]:
+    """Addresses whose balances or local state a confirmed transaction may change."""
+    txn = pending_txn["txn"]["txn"]
+    addresses = [txn.get(key) for key in ("snd", "rcv", "close", "arcv", "aclose", "asnd", "rekey")]
+    addresses += txn.get("apat", [])
+    if txn.get("apid"):
+        addresses.append(get_app_address(txn["apid"]))
+
+    for inner_txn in pending_txn.get("inner-txns", []):
+        addresses += touched_addresses(inner_txn)
+    return [address for address in set(addresses) if address]
+
+
+def get_account_snapshot(client: AlgodClient, address: str) -> Dict[str, Any]:
+    return get_account_cache(client).get(client, address)
+
+
+class SuggestedParamsProvider:
+    """Fetches `suggested_params` once per round and hands out copies.
+
+    Operations mutate `sp.fee` freely, so every caller gets its own copy of
+    the cached params. Without the background refresher the params are
+    refetched when a newer round is observed or after `max_age` seconds.
+
+    Params belong to one network, there is one provider per algod address
+    (see `get_params_provider`).
+    """
+
+    def __init__(self, max_age: float = 4.0) -> None:
+        self.max_age = max_age
+        self.params: Optional[transaction.SuggestedParams] = None
+        self.fetched_at = 0.0
+        self.lock = threading.Lock()
+        self.refresher: Optional[threading.Thread] = None
+        self.stopped = threading.Event()
+
+    def get(self, client: AlgodClient) -> transaction.SuggestedParams:
+        with self.lock:
+            if self.params is None or self.is_stale():
+                self.set(client.suggested_params())
+            return self.copy()
+
+    # the helpers below expect `self.lock` to be held by the caller
+    def is_stale(self) -> bool:
+        return time.monotonic() - self.fetched_at >= self.max_age
+
+    def set(self, params: transaction.SuggestedParams) -> None:
+        self.params = params
+        self.fetched_at = time.monotonic()
+
+    def copy(self) -> transaction.SuggestedParams:
+        return copy.copy(self.params)
+
+    def advance(self, round_: int) -> None:
+        """Record that the chain reached `round_`, params of older rounds are refetched."""
+        with self.lock:
+            if self.params is not None and self.params.first < round_:
+                self.params = None
+
+    def start(self, client: AlgodClient) -> None:
+        """Refresh the params in a background thread following `status_after_block`."""
+        if self.refresher is not None:
+            return
+        self.stopped.clear()
+        self.refresher = threading.Thread(target=self._refresh, args=(client,), daemon=True)
+        self.refresher.start()
+
+    def stop(self) -> None:
+        self.stopped.set()
+        self.refresher = None
+
+    def _refresh(self, client: AlgodClient) -> None:
+        last_round = client.status()["last-round"]
+        while not self.stopped.is_set():
+            try:
+                last_round = client.status_after_block(last_round)["last-round"]
+                params = client.suggested_params()
+            except Exception:
+                time.sleep(1)
+                continue
+            with self.lock:
+                # the refresher keeps the params fresh, max_age only guards a stalled node
+                self.set(params)
+            get_account_cache(client).advance(last_round)
+
+
+# by algod address, so clients of different networks never see each other's genesis hash or rounds
+suggested_params_providers: Dict[str, SuggestedParamsProvider] = dict()
+providers_lock = threading.Lock()
+
+
+def get_params_provider(client: AlgodClient) -> SuggestedParamsProvider:
+    """The params provider of the node `client` talks to, shared by every client of that node."""
+    with providers_lock:
+        provider = suggested_params_providers.get(client.algod_address)
+        if provider is None:
+            provider = suggested_params_providers[client.algod_address] = SuggestedParamsProvider()
+        return provider
+
+
+def get_suggested_params(client: AlgodClient) -> transaction.SuggestedParams:
+    return get_params_provider(client).get(client)
+
+
+# set by `confirmation.ConfirmationTracker.install()` to share one block stream
+confirmation_tracker = None
+
+
 def wait_for_confirmation(
         client: AlgodClient, tx_id: str
 ) -> PendingTxnResponse:
+    if confirmation_tracker is not None:
+        return confirmation_tracker.wait(tx_id)
+
+    start = time.perf_counter()
     last_status = client.status()
     last_round = last_status.get("last-round")
     pending_txn = client.pending_transaction_info(tx_id)
     while not (pending_txn.get("confirmed-round") and pending_txn.get("confirmed-round") > 0):
-        print("Waiting for confirmation...")
+        emit("round_waited", tx_id=tx_id, round=last_round, elapsed=time.perf_counter() - start)
         last_round += 1
         client.status_after_block(last_round)
         pending_txn = client.pending_transaction_info(tx_id)
-    print(
-        "Transaction {} confirmed in round {}.".format(
-            tx_id, pending_txn.get("confirmed-round")
-        )
-    )
+    emit("confirmed", tx_id=tx_id, round=pending_txn.get("confirmed-round"), elapsed=time.perf_counter() - start)
+    get_account_cache(client).invalidate_txn(pending_txn)
+    get_params_provider(client).advance(pending_txn.get("confirmed-round"))
     return PendingTxnResponse(pending_txn)
 
 
-def fully_compile_contract(client: AlgodClient, contract: Expr) -> bytes:
-    teal = compileTeal(contract, mode=Mode.Application, version=5)
-    response = client.compile(teal)
-    return b64decode(response["result"])
+def fully_compile_contract(client: Optional[AlgodClient], contract: Union["Expr", Callable[[], "Expr"]]) -> bytes:
+    """Compile a PyTeal contract, or a builder returning one, through the program cache.
+
+    Without a client the program is assembled offline.
+    """
+    return program_cache.compile(client, contract)
 
 
 def compile_teal(client: AlgodClient, teal) -> bytes:
-    response = client.compile(teal)
-    return b64decode(response["result"])
+    return program_cache.compile_teal(client, teal)
 
 
 def int_to_bytes(num):
@@ -146,19 +421,23 @@ def get_app_global_state(
         client: AlgodClient, app_id: int
 ) -> Dict[bytes, Union[int, bytes]]:
     app_info = client.application_info(app_id)
-    return decode_state(app_info["params"]["global-state"])
+    state = decode_state(app_info["params"]["global-state"])
+    emit("state_decoded", app_id=app_id, address=None, state=state)
+    return state
 
 
 def get_app_local_state(
         client: AlgodClient, app_id: int, sender_address: str
 ) -> Dict[bytes, Union[int, bytes]]:
-    account_info = client.account_info(sender_address)
+    account_info = get_account_snapshot(client, sender_address)
     for local_state in account_info["apps-local-state"]:
         if local_state["id"] == app_id:
             if "key-value" not in local_state:
                 return {}
 
-            return decode_state(local_state["key-value"])
+            state = decode_state(local_state["key-value"])
+            emit("state_decoded", app_id=app_id, address=sender_address, state=state)
+            return state
     return {}
 
 
@@ -170,7 +449,7 @@ def get_app_address(app_id: int) -> str:
 def get_balances(client: AlgodClient, account: str) -> Dict[int, int]:
     balances: Dict[int, int] = dict()
 
-    account_info = client.account_info(account)
+    account_info = get_account_snapshot(client, account)
 
     # set key 0 to Algo balance
     balances[0] = account_info["amount"]
@@ -198,7 +477,7 @@ def get_last_block_timestamp(client: AlgodClient) -> Tuple[int, int]:
 
 
 def is_opted_in_app(client: AlgodClient, app_id: int, user_address: str):
-    account_info = client.account_info(user_address)  
+    account_info = get_account_snapshot(client, user_address)
     for a in account_info.get('apps-local-state', []):
         if a['id'] == app_id:
             return True
@@ -206,24 +485,26 @@ def is_opted_in_app(client: AlgodClient, app_id: int, user_address: str):
 
 
 def optin_app(client: AlgodClient, app_id: int, sender: Account):
+    emit("optin", address=sender.get_address(), app_id=app_id)
     txn = transaction.ApplicationOptInTxn(
         sender=sender.get_address(),
-        sp=client.suggested_params(),
+        sp=get_suggested_params(client),
         index=app_id
     )
-    signed_txn = txn.sign(sender.get_private_key())
+    signed_txn = sender.sign(txn)
     client.send_transaction(signed_txn)
     
     wait_for_confirmation(client, signed_txn.get_txid())
     
     
 def optin_app_rekeyed_address(client: AlgodClient, app_id: int, sender: Account, rekeyed_adr: str):
+    emit("optin", address=rekeyed_adr, app_id=app_id)
     txn = transaction.ApplicationOptInTxn(
         sender=rekeyed_adr,
-        sp=client.suggested_params(),
+        sp=get_suggested_params(client),
         index=app_id
     )
-    signed_txn = txn.sign(sender.get_private_key())
+    signed_txn = sender.sign(txn)
     client.send_transaction(signed_txn)
     wait_for_confirmation(client, signed_txn.get_txid())
     
@@ -231,16 +512,16 @@ def optin_app_rekeyed_address(client: AlgodClient, app_id: int, sender: Account,
 def optout_app(client: AlgodClient, app_id: int, sender: Account):
     txn = transaction.ApplicationClearStateTxn(
         sender=sender.get_address(),
-        sp=client.suggested_params(),
+        sp=get_suggested_params(client),
         index=app_id
     )
-    signed_txn = txn.sign(sender.get_private_key())
+    signed_txn = sender.sign(txn)
     client.send_transaction(signed_txn)
     wait_for_confirmation(client, signed_txn.get_txid())
     
     
 def is_opted_in_asset(client: AlgodClient, asset_id: int, user_address: str):
-    account_info = client.account_info(user_address)  
+    account_info = get_account_snapshot(client, user_address)
     for a in account_info.get('assets', []):
         if a['asset-id'] == asset_id:
             return True
@@ -248,21 +529,43 @@ def is_opted_in_asset(client: AlgodClient, asset_id: int, user_address: str):
     
     
 def optin_asset(client: AlgodClient, asset_id: int, sender: Account):
+    emit("optin", address=sender.get_address(), asset_id=asset_id)
     txn = transaction.AssetOptInTxn(
         sender=sender.get_address(),
-        sp=client.suggested_params(),
+        sp=get_suggested_params(client),
         index=asset_id
     )
-    signed_txn = txn.sign(sender.get_private_key())
+    signed_txn = sender.sign(txn)
     client.send_transaction(signed_txn)
     wait_for_confirmation(client, signed_txn.get_txid())
     
     
+def optin_txns(client: AlgodClient,
+               address: str,
+               sp: transaction.SuggestedParams,
+               app_ids: List[int] = [],
+               asset_ids: List[int] = []) -> List[transaction.Transaction]:
+    """Opt-in transactions for the apps and assets `address` is not opted into yet.
+
+    They are meant to go at the head of the group that needs them, so a first
+    time buyer confirms once instead of once per opt-in. The app opt-ins come
+    first, which is what the store calls of the group expect.
+    """
+    txns = []
+    for app_id in app_ids:
+        if not is_opted_in_app(client, app_id, address):
+            emit("optin", address=address, app_id=app_id)
+            txns.append(transaction.ApplicationOptInTxn(sender=address, sp=sp, index=app_id))
+    for asset_id in asset_ids:
+        if not is_opted_in_asset(client, asset_id, address):
+            emit("optin", address=address, asset_id=asset_id)
+            txns.append(transaction.AssetOptInTxn(sender=address, sp=sp, index=asset_id))
+    return txns
+
+
 def generate_account_keypair():
     private_key, address = account.generate_account()
-    print("new address: {}".format(address))
-    print("new private_key: {}".format(private_key))
-    print("new passphrase: {}".format(mnemonic.from_private_key(private_key)))
+    emit("account_generated", address=address)
     return private_key, address
     
 
@@ -290,9 +593,9 @@ def generate_rekeyed_address(client: AlgodClient, funder: Account, app_id: int,
         sender=funder.get_address(),
         receiver=address,
         amt=funding_amount,
-        sp=client.suggested_params(),
+        sp=get_suggested_params(client),
     )
-    signed_fund_txn = fund_account_txn.sign(funder.get_private_key())
+    signed_fund_txn = funder.sign(fund_account_txn)
     client.send_transaction(signed_fund_txn)
     wait_for_confirmation(client, signed_fund_txn.get_txid())
     
@@ -301,7 +604,7 @@ def generate_rekeyed_address(client: AlgodClient, funder: Account, app_id: int,
         receiver=address,
         amt=0,
         rekey_to=funder.get_address(),  #get_app_address(app_id),
-        sp=client.suggested_params(),
+        sp=get_suggested_params(client),
     )
     
     signed_txn = txn.sign(private_key)
@@ -316,52 +619,107 @@ def charge_optin_price(client: AlgodClient, sender: Account, receiver: str, opti
         sender=sender.get_address(),
         receiver=receiver,
         amt=optin_price,
-        sp=client.suggested_params(),
+        sp=get_suggested_params(client),
     )
-    signed_fund_txn = fund_account_txn.sign(sender.get_private_key())
+    signed_fund_txn = sender.sign(fund_account_txn)
     client.send_transaction(signed_fund_txn)
     wait_for_confirmation(client, signed_fund_txn.get_txid())
 
 
-def get_rekeyed_addresses(sender: str) -> List:
-    result = []
-    obj = read_rekeyed_addresses()
-    for key in obj:
-        if (key == sender):
-            for address in obj[key]:
-                result.append(address)
-        return result
-    return []
+# an atomic group holds at most 16 transactions
+MAX_GROUP_SIZE = 16
 
 
-def write_rekeyed_addresses(obj):
-    with open("rekeyed_addresses.json", 'w') as f:
-        json.dump(obj, f)
-        
+def generate_rekeyed_addresses(client: AlgodClient, funder: Account, app_id: int, optin_price: int, count: int) -> List[str]:
+    """Generate rekeyed addresses opted into an app, all confirmed in one round.
 
-def read_rekeyed_addresses():
-    with open("rekeyed_addresses.json", 'r') as f:
-        return json.load(f)
-        
+    Every address takes three transactions: the funding payment, a 0 amount
+    self payment rekeying it to `funder`, signed with its ephemeral key, and
+    the app opt-in, signed with `funder`'s key as the rekey already applies.
+    Five addresses fit in a group and all groups are sent before waiting.
+    The addresses are recorded with `set_rekeyed_address` once confirmed.
 
-def set_rekeyed_address(sender: str, new_address: str, optedin: int = 0):
-    obj = read_rekeyed_addresses()
-    #print("obj", obj)
-    for key in obj:
-        if (key == sender):
-            obj[key][new_address] = optedin
-            write_rekeyed_addresses(obj)
-            return
-    
-    no = {}
-    no[new_address] = optedin
-    obj[sender] = no
-    write_rekeyed_addresses(obj)
+    Args:
+        client: An algod client.
+        funder: Auth address of the new addresses.
+        app_id: App id to optin.
+        optin_price: Additional min balance to optin app.
+        count: Number of addresses to generate.
+    """
+    sp = get_suggested_params(client)
+    per_group = MAX_GROUP_SIZE // 3
+    groups: List[Tuple[str, List[str]]] = []
+    try:
+        for start in range(0, count, per_group):
+            txns, keys, addresses = [], [], []
+            for _ in range(min(per_group, count - start)):
+                private_key, address = generate_account_keypair()
+                emit("optin", address=address, app_id=app_id)
+                txns += [
+                    transaction.PaymentTxn(
+                        sender=funder.get_address(),
+                        receiver=address,
+                        # min account balance, app optin balance and the rekey txn fee
+                        amt=100_000 + optin_price + 1_000,
+                        sp=sp,
+                    ),
+                    transaction.PaymentTxn(
+                        sender=address,
+                        receiver=address,
+                        amt=0,
+                        rekey_to=funder.get_address(),
+                        sp=sp,
+                    ),
+                    transaction.ApplicationOptInTxn(sender=address, sp=sp, index=app_id),
+                ]
+                keys += [funder, private_key, funder]
+                addresses.append(address)
+            assign_group_id(txns)
+            tx_id = client.send_transactions(sign_many(zip(txns, keys)))
+            groups.append((tx_id, addresses))
+    finally:
+        # groups already sent still confirm, keep track of their addresses
+        for tx_id, addresses in groups:
+            wait_for_confirmation(client, tx_id)
+            for address in addresses:
+                set_rekeyed_address(funder.get_address(), address, 1, app_id)
+    return [address for _, addresses in groups for address in addresses]
+
+
+def optin_app_rekeyed_addresses(client: AlgodClient, app_id: int, funder: Account, addresses: List[str], optin_price: int):
+    """Charge the optin price of rekeyed addresses and opt them into an app in one round.
+
+    Each address takes the payment and the opt-in signed by `funder`, eight
+    addresses per group.
+    """
+    sp = get_suggested_params(client)
+    per_group = MAX_GROUP_SIZE // 2
+    tx_ids = []
+    for start in range(0, len(addresses), per_group):
+        txns = []
+        for address in addresses[start:start + per_group]:
+            emit("optin", address=address, app_id=app_id)
+            txns += [
+                transaction.PaymentTxn(sender=funder.get_address(), receiver=address, amt=optin_price, sp=sp),
+                transaction.ApplicationOptInTxn(sender=address, sp=sp, index=app_id),
+            ]
+        assign_group_id(txns)
+        tx_ids.append(client.send_transactions([funder.sign(txn) for txn in txns]))
+    for tx_id in tx_ids:
+        wait_for_confirmation(client, tx_id)
+
+
+def get_rekeyed_addresses(sender: str, app_id: Optional[int] = None) -> List[str]:
+    """Addresses rekeyed to `sender`, oldest first, optionally only those known for `app_id`."""
+    return rekeyed_registry.addresses(sender, app_id)
+
+
+def set_rekeyed_address(sender: str, new_address: str, optedin: int = 0, app_id: int = 0):
+    rekeyed_registry.add(sender, new_address, app_id, optedin)
 
 
 def get_account_info(client: AlgodClient, sender_address: str):
-    account_info = client.account_info(sender_address)
-    print("account_info", account_info)
+    return client.account_info(sender_address)
 
 
 # for testing purpose
@@ -370,9 +728,9 @@ def deleteApps(client: AlgodClient, app_ids: List[int], sender: Account):
         delete_txn = transaction.ApplicationDeleteTxn(
             sender=sender.get_address(),
             index=app_id,
-            sp=client.suggested_params(),
+            sp=get_suggested_params(client),
         )
-        signed_delete_txn = delete_txn.sign(sender.get_private_key())
+        signed_delete_txn = sender.sign(delete_txn)
         client.send_transaction(signed_delete_txn)
         wait_for_confirmation(client, signed_delete_txn.get_txid())
     
@@ -391,7 +749,7 @@ def send_asset(client: AlgodClient, asset_id: int, asset_amount: int, sender: Ac
         receiver=receiver.get_address,
         index=asset_id,
         amt=asset_amount,
-        sp=client.suggested_params(),
+        sp=get_suggested_params(client),
     )
     
     signed_txn = txn.sign(sender.get_address())